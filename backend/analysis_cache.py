@@ -0,0 +1,166 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from embedding_cache import normalize_query
+
+
+class AnalysisCache:
+    """Memoised job analyses, keyed per normalised query and per matched occupation.
+
+    Two levels share one byte budget: a query entry holds a complete
+    ``analyze_job_role`` result, and an occupation entry holds the parts that
+    depend only on the matched ``onet_soc_code``. Many titles map to one
+    occupation, so a new title for a known occupation only costs the vector
+    search. Every key includes the data/index generation, so a rebuild
+    invalidates all entries without explicit purging.
+
+    Entries live in an in-process LRU bounded by ``max_bytes`` of serialised
+    JSON and expire after ``ttl_seconds`` (0 disables expiry). Values are
+    returned as the cached objects themselves and must be treated as read-only.
+    ``remote`` optionally adds a shared second level. It can be any
+    Redis-compatible client (``get(key)`` / ``set(key, value, ex=ttl)``), or a
+    plain dict in tests.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 3600,
+                 remote=None, namespace: str = 'analysis'):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.remote = remote
+        self.namespace = namespace
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.query_hits = 0
+        self.occupation_hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.remote_errors = 0
+
+    def _key(self, generation: str, kind: str, name: str) -> str:
+        return f"{self.namespace}:{generation}:{kind}:{name}"
+
+    def get_query(self, generation: str, query: str) -> Optional[Dict[str, Any]]:
+        """Complete analysis previously stored for ``query``, or None"""
+        value = self._get(self._key(generation, 'q', normalize_query(query)))
+        if value is not None:
+            with self._lock:
+                self.query_hits += 1
+        return value
+
+    def put_query(self, generation: str, query: str, analysis: Dict[str, Any]):
+        self._put(self._key(generation, 'q', normalize_query(query)), analysis)
+
+    def get_occupation(self, generation: str, onet_soc_code: str) -> Optional[Dict[str, Any]]:
+        """Occupation-only parts of an analysis (framework, recommendations, summary, diagram), or None"""
+        value = self._get(self._key(generation, 'o', onet_soc_code))
+        if value is not None:
+            with self._lock:
+                self.occupation_hits += 1
+        return value
+
+    def put_occupation(self, generation: str, onet_soc_code: str, parts: Dict[str, Any]):
+        self._put(self._key(generation, 'o', onet_soc_code), parts)
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, size, stored_at = entry
+                if self.ttl_seconds and now - stored_at > self.ttl_seconds:
+                    self._remove(key)
+                    self.expirations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    return value
+
+        payload = self._remote_get(key)
+        if payload is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        value = json.loads(payload)
+        with self._lock:
+            self.remote_hits += 1
+        self._store_local(key, value, len(payload))
+        return value
+
+    def _put(self, key: str, value: Dict[str, Any]):
+        payload = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        self._store_local(key, value, len(payload))
+        self._remote_set(key, payload)
+
+    def _store_local(self, key: str, value: Dict[str, Any], size: int):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _remote_get(self, key: str) -> Optional[bytes]:
+        if self.remote is None:
+            return None
+        try:
+            return self.remote.get(key)
+        except Exception as e:
+            # A shared cache outage must not fail the request
+            with self._lock:
+                self.remote_errors += 1
+            print(f"Analysis cache read failed: {e}")
+            return None
+
+    def _remote_set(self, key: str, payload: bytes):
+        if self.remote is None:
+            return
+        try:
+            if isinstance(self.remote, dict):
+                self.remote[key] = payload
+            else:
+                self.remote.set(key, payload, ex=int(self.ttl_seconds) or None)
+        except Exception as e:
+            with self._lock:
+                self.remote_errors += 1
+            print(f"Analysis cache write failed: {e}")
+
+    def clear(self):
+        """Drop every in-process entry (counters and the remote store are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current occupancy"""
+        with self._lock:
+            hits = self.query_hits + self.occupation_hits
+            lookups = hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'remote': type(self.remote).__name__ if self.remote is not None else None,
+                'query_hits': self.query_hits,
+                'occupation_hits': self.occupation_hits,
+                'remote_hits': self.remote_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'remote_errors': self.remote_errors,
+                'hit_rate': hits / lookups if lookups else 0.0
+            }
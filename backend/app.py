@@ -1,38 +1,157 @@
-from flask import Flask, request, jsonify
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import os
 import json
+import codecs
+import inspect
+import threading
 from vector_db import CompetencyVectorDB, CompetencyAnalyzer  # Updated import
+from encoding_scheduler import EncoderOverloaded
+from startup_timing import StartupTimer
+from background_jobs import JobManager, JobAlreadyRunning
+from chat_responses import (
+    SSE_HEADERS, is_job_title_message, analysis_reply, search_reply, sse_event, analysis_event, search_event,
+    analysis_log_fields, search_log_fields
+)
+from batch_analysis import BatchAnalyzer, read_titles_csv
+from request_tracing import RequestTracer, span
+from structured_logging import configure_logging, restart_logging_after_fork
 from dotenv import load_dotenv
 import logging
 
+# Cold-start breakdown, reported by /ready and scripts/startup_report.py
+startup_timer = StartupTimer(_import_started)
+startup_timer.record('imports', time.perf_counter() - _import_started)
+
 # Load environment variables
 load_dotenv()
 
+class TracedJSONProvider(DefaultJSONProvider):
+    """Times response serialisation as the 'serialization' stage of the request trace"""
+
+    def dumps(self, obj, **kwargs):
+        with span("serialization"):
+            return super().dumps(obj, **kwargs)
+
 # Initialize Flask app
 app = Flask(__name__)
+app.json = TracedJSONProvider(app)
 CORS(app)  # Enable CORS for all routes
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Per-stage request timings: Server-Timing headers and the /metrics histograms
+tracer = RequestTracer()
+
+# Configure logging: written off-thread, level from LOG_LEVEL
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize global components
 vector_db = None
 analyzer = None
 
-def initialize_components():
-    """Initialize vector database and analyzer"""
+# Long-running vector builds run as background jobs; initialize and rebuild
+# share one de-duplication key so only one build writes the index at a time
+job_manager = JobManager()
+VECTOR_BUILD_JOB = 'vector-build'
+
+# 'background' (default) loads the embedding model in a thread after start-up,
+# 'eager' blocks start-up until it is loaded, 'lazy' waits for the first request
+model_load_mode = os.getenv('MODEL_LOAD', 'background').lower()
+model_load_error = None
+model_loading_started = False
+
+def initialize_components(start_model: bool = True):
+    """Initialize vector database and analyzer, then start loading the model per MODEL_LOAD"""
     global vector_db, analyzer
     try:
-        vector_db = CompetencyVectorDB()
-        vector_db.initialize_pinecone()
+        with startup_timer.phase('vector_db'):
+            vector_db = CompetencyVectorDB()
+        with startup_timer.phase('index'):
+            vector_db.initialize_index()
+        with startup_timer.phase('profile_store'):
+            vector_db.initialize_profile_store()
         analyzer = CompetencyAnalyzer(vector_db)
-        logger.info("Components initialized successfully")
+        logger.info(f"Components initialized successfully: {startup_timer.report()}")
     except Exception as e:
         logger.error(f"Error initializing components: {e}")
         raise
 
+    if start_model:
+        start_model_loading()
+
+def load_model():
+    """Load and warm up the embedding model, timed as the 'model' start-up phase"""
+    global model_load_error
+    try:
+        with startup_timer.phase('model'):
+            vector_db.warm_up()
+        logger.info(f"Embedding model ready: {startup_timer.report()}")
+    except Exception as e:
+        model_load_error = str(e)
+        logger.error(f"Error loading embedding model: {e}")
+        raise
+
+def start_model_loading():
+    """Load the model now, in a background thread, or not at all, according to MODEL_LOAD.
+
+    Runs once per process; later calls (e.g. the ASGI lifespan after gunicorn's
+    post_worker_init hook) do nothing.
+    """
+    global model_loading_started
+    if model_loading_started:
+        return
+    model_loading_started = True
+    if model_load_mode == 'eager':
+        load_model()
+    elif model_load_mode == 'background':
+        def run():
+            try:
+                load_model()
+            except Exception:
+                pass  # already logged; /ready keeps reporting not ready
+        threading.Thread(target=run, name='model-warm-up', daemon=True).start()
+    elif model_load_mode != 'lazy':
+        raise ValueError(f"Unknown MODEL_LOAD: {model_load_mode}")
+
+def after_fork():
+    """Per-worker set-up after a (possibly preloading) gunicorn master has forked"""
+    restart_logging_after_fork()
+    vector_db.after_fork()
+    start_model_loading()
+
+@app.before_request
+def start_trace():
+    if request.path != "/metrics":
+        g.trace = tracer.start()
+
+@app.after_request
+def add_server_timing(response):
+    """Report the request's stage timings in Server-Timing and close its trace.
+
+    When the body is a generator (a streamed response), the trace closes with
+    the response instead. Its header then covers the work done before the
+    first byte, while the histograms also include the rest of the stream.
+    """
+    trace = g.pop("trace", None)
+    if trace is not None:
+        response.headers["Server-Timing"] = trace.server_timing()
+        method, status = request.method, response.status_code
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        if inspect.isgenerator(response.response):
+            response.call_on_close(lambda: tracer.finish(trace, method, route, status))
+        else:
+            tracer.finish(trace, method, route, status)
+    return response
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Request and per-stage latency histograms in the Prometheus text format (this worker only)"""
+    return Response(tracer.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/health", methods=["GET"])
 def health_check():
     """Health check endpoint"""
@@ -41,6 +160,51 @@ def health_check():
         "message": "Competency Model Chatbot API is running"
     })
 
+def readiness_report():
+    """(ready, body) for the readiness probe; shared with the ASGI app"""
+    checks = {
+        "components": vector_db is not None and analyzer is not None,
+        "index": vector_db is not None and vector_db.index is not None,
+        "model": vector_db is not None and (vector_db.model_loaded or model_load_mode == 'lazy')
+    }
+    ready = all(checks.values())
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "checks": checks,
+        "startup": startup_timer.report()
+    }
+    if model_load_error:
+        body["error"] = model_load_error
+    return ready, body
+
+def runtime_stats():
+    """Cache, pool and start-up statistics reported by /api/stats"""
+    return {
+        **vector_db.get_stats(),
+        "analysis_cache": analyzer.get_cache_stats(),
+        "tracing": tracer.stats(),
+        "startup": startup_timer.report()
+    }
+
+@app.route("/ready", methods=["GET"])
+def readiness_check():
+    """Readiness probe: 503 until the index is attached and the model is loaded.
+
+    Unlike /health (liveness), this only succeeds once the worker can serve
+    queries without a cold-start stall. With MODEL_LOAD=lazy the model is not
+    required.
+    """
+    ready, body = readiness_report()
+    return jsonify(body), 200 if ready else 503
+
+@app.route("/api/stats", methods=["GET"])
+def stats():
+    """Runtime statistics (caches, pools) for monitoring"""
+    return jsonify({
+        "success": True,
+        "data": runtime_stats()
+    })
+
 @app.route("/api/analyze-job", methods=["POST"])
 def analyze_job():
     """Analyze a job role and return competency framework"""
@@ -67,6 +231,12 @@ def analyze_job():
             "data": result 
         })
         
+    except EncoderOverloaded as e:
+        logger.warning(f"Shedding load: {e}")
+        return jsonify({
+            "error": "Service overloaded",
+            "message": str(e)
+        }), 503
     except Exception as e:
         logger.error(f"Error analyzing job: {e}")
         return jsonify({
@@ -74,6 +244,64 @@ def analyze_job():
             "message": str(e)
         }), 500
 
+# Upper bound on results per search, so a request cannot ask the index for arbitrarily many
+MAX_TOP_K = 50
+
+def parse_top_k(value, default: int) -> int:
+    """``top_k`` from a request clamped to 1..MAX_TOP_K; ValueError if it is not an integer"""
+    if value is None:
+        return default
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError("top_k must be an integer")
+    try:
+        top_k = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("top_k must be an integer")
+    return min(max(top_k, 1), MAX_TOP_K)
+
+@app.route("/api/analyze-jobs/batch", methods=["POST"])
+def analyze_jobs_batch():
+    """Map many job titles onto occupations, streamed back as NDJSON (one line per title).
+
+    Accepts JSON ``{"job_titles": [...], "top_k": 3, "include_analysis": false}``
+    or a multipart upload with a CSV ``file`` (plus optional ``column``,
+    ``top_k`` and ``include_analysis`` form fields). The last line is a summary.
+    """
+    try:
+        if "file" in request.files:
+            options = request.form
+            titles = read_titles_csv(
+                codecs.iterdecode(request.files["file"].stream, "utf-8-sig"), options.get("column")
+            )
+        else:
+            options = request.get_json(silent=True) or {}
+            titles = options.get("job_titles")
+            if not isinstance(titles, list):
+                return jsonify({
+                    "error": "job_titles (a list) or a CSV file upload is required"
+                }), 400
+            titles = [title if isinstance(title, str) else "" for title in titles]
+
+        top_k = parse_top_k(options.get("top_k"), 3)
+        include_analysis = str(options.get("include_analysis", "false")).lower() in ("true", "1", "yes")
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({
+            "error": str(e)
+        }), 400
+
+    batch = BatchAnalyzer(vector_db, analyzer, top_k=top_k, include_analysis=include_analysis)
+
+    def generate():
+        try:
+            for record in batch.run(titles):
+                yield json.dumps(record, separators=(",", ":")) + "\n"
+        except Exception as e:
+            # Headers are already sent; report the failure as the last line
+            logger.error(f"Error in batch analysis after {batch.rows} rows: {e}")
+            yield json.dumps({"type": "error", "error": "Internal server error", "message": str(e)}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
 @app.route("/api/search-jobs", methods=["POST"])
 def search_jobs():
     """Search for similar jobs based on query"""
@@ -86,12 +314,18 @@ def search_jobs():
             }), 400
         
         query = data["query"].strip()
-        top_k = data.get("top_k", 5)
         
         if not query:
             return jsonify({
                 "error": "query cannot be empty"
             }), 400
+
+        try:
+            top_k = parse_top_k(data.get("top_k"), 5)
+        except ValueError as e:
+            return jsonify({
+                "error": str(e)
+            }), 400
         
         # Search for similar jobs (now based on vectors enriched with abilities)
         similar_jobs = vector_db.search_similar_jobs(query, top_k)
@@ -104,6 +338,12 @@ def search_jobs():
             }
         })
         
+    except EncoderOverloaded as e:
+        logger.warning(f"Shedding load: {e}")
+        return jsonify({
+            "error": "Service overloaded",
+            "message": str(e)
+        }), 503
     except Exception as e:
         logger.error(f"Error searching jobs: {e}")
         return jsonify({
@@ -151,35 +391,18 @@ def chat():
                 "error": "message cannot be empty"
             }), 400
         
+        started = time.perf_counter()
+
         # Simple chat logic - analyze if it looks like a job title
-        if any(keyword in message.lower() for keyword in ["engineer", "manager", "analyst", "developer", "specialist", "coordinator", "director"]):
+        if is_job_title_message(message):
             # Treat as job analysis request
             result = analyzer.analyze_job_role(message)
-            
-            response = f"I found information about {message}. Here's a summary of the competency analysis:\n\n"
-            
-            if "job_analysis" in result:
-                best_match = result["job_analysis"]["best_match"]
-                response += f"Best match: {best_match['title']} (similarity: {best_match['score']:.2f})\n\n"
-            
-            if "recommendations" in result:
-                # The recommendations are already pre-formatted in _generate_recommendations
-                for rec in result["recommendations"]:
-                    response += f"{rec}\n"
-            
-            # NEW: Add the detailed formatted framework summary from the backend
-            if "formatted_framework_summary" in result:
-                response += result["formatted_framework_summary"]
-
-            response += "\nFor a full, structured breakdown of all skills and abilities, please refer to the 'analysis' field in the JSON response."
-
-            print(f"Response: {response}") 
-            print(f"Result: {result}")
-            print(f"Type: job_analysis")
-
-            logger.info(f"first block ======== Chat response: {response}")
-            logger.info(f"first block ======== Analysis result: {result}")
-            logger.info(f"first block ======== Type: job_analysis")
+            response = analysis_reply(message, result)
+
+            if logger.isEnabledFor(logging.INFO):
+                fields = analysis_log_fields(result, response)
+                fields["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                logger.info("Chat reply", extra={"fields": fields})
             return jsonify({
                 "success": True,
                 "data": {
@@ -191,21 +414,12 @@ def chat():
         else:
             # General search
             similar_jobs = vector_db.search_similar_jobs(message, 3)
-            
-            if similar_jobs:
-                response = f"I found {len(similar_jobs)} jobs related to {message}:\n\n"
-                for i, job in enumerate(similar_jobs, 1):
-                    response += f"{i}. {job['title']} (similarity: {job['score']:.2f})\n"
-                response += "\nWould you like me to analyze any of these roles in detail?"
-            else:
-                response = f"I couldn't find any jobs directly related to {message}. Try being more specific or use job titles like 'Software Engineer' or 'Data Analyst'."
-            
-            print(f"Response: {response}")
-            print(f"Similar Jobs: {similar_jobs}")
-            print(f"Type: search")
-            logger.info(f"Chat response: {response}")
-            logger.info(f"Similar jobs: {similar_jobs}")
-            logger.info(f"Type: search")
+            response = search_reply(message, similar_jobs)
+
+            if logger.isEnabledFor(logging.INFO):
+                fields = search_log_fields(similar_jobs, response)
+                fields["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                logger.info("Chat reply", extra={"fields": fields})
             return jsonify({
                 "success": True,
                 "data": {
@@ -215,6 +429,12 @@ def chat():
                 }
             })
         
+    except EncoderOverloaded as e:
+        logger.warning(f"Shedding load: {e}")
+        return jsonify({
+            "error": "Service overloaded",
+            "message": str(e)
+        }), 503
     except Exception as e:
         logger.error(f"Error in chat: {e}")
         return jsonify({
@@ -222,22 +442,108 @@ def chat():
             "message": str(e)
         }), 500
 
+@app.route("/api/chat/stream", methods=["POST"])
+def chat_stream():
+    """/api/chat as Server-Sent Events, so the client can render each part as soon as it is ready.
+
+    Job titles stream ``match`` (best match and similar jobs, sent right after
+    the vector search), then ``recommendations``, ``summary`` and ``diagram``.
+    Other messages stream a single ``search`` event. A ``done`` event with the
+    full chat text ends the stream. The search runs before the response
+    starts, so its failures get the usual 400/503/500 status; later failures
+    arrive as an ``error`` event.
+    """
+    try:
+        data = request.get_json(silent=True)
+
+        if not data or "message" not in data:
+            return jsonify({
+                "error": "message is required"
+            }), 400
+
+        message = data["message"].strip()
+
+        if not message:
+            return jsonify({
+                "error": "message cannot be empty"
+            }), 400
+
+        if not is_job_title_message(message):
+            similar_jobs = vector_db.search_similar_jobs(message, 3)
+
+            def search_events():
+                yield search_event(message, similar_jobs)
+                yield sse_event("done", {"type": "search", "response": search_reply(message, similar_jobs)})
+
+            return Response(search_events(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+        stages = analyzer.iter_job_analysis(message)
+        first = next(stages)
+
+    except EncoderOverloaded as e:
+        logger.warning(f"Shedding load: {e}")
+        return jsonify({
+            "error": "Service overloaded",
+            "message": str(e)
+        }), 503
+    except Exception as e:
+        logger.error(f"Error in chat stream: {e}")
+        return jsonify({
+            "error": "Internal server error",
+            "message": str(e)
+        }), 500
+
+    def analysis_events():
+        result = {}
+        try:
+            yield analysis_event(message, *first, result)
+            for stage, payload in stages:
+                yield analysis_event(message, stage, payload, result)
+            yield sse_event("done", {"type": "job_analysis", "response": analysis_reply(message, result)})
+        except Exception as e:
+            logger.error(f"Error in chat stream: {e}")
+            yield sse_event("error", {"error": "Internal server error", "message": str(e)})
+
+    return Response(stream_with_context(analysis_events()), mimetype="text/event-stream", headers=SSE_HEADERS)
+
 
 
+def _job_accepted(job, created: bool, message: str):
+    """202 response pointing at a background job's status endpoint"""
+    if not created:
+        message = f"A vector build ({job.kind}) is already running; returning its status"
+    return jsonify({
+        "success": True,
+        "data": {
+            "message": message,
+            "job_id": job.id,
+            "status_url": f"/api/jobs/{job.id}",
+            "deduplicated": not created,
+            "job": job.to_dict()
+        }
+    }), 202
+
 @app.route("/api/initialize-vectors", methods=["POST"])
 def initialize_vectors():
-    """Initialize vector database with job competency data"""
+    """Start building job competency vectors in the background and return a job ID"""
     try:
-        count = vector_db.create_job_competency_vectors()
-        
+        data = request.get_json(silent=True) or {}
+        incremental = bool(data.get("incremental", False))
+
+        def run(report):
+            count = vector_db.create_job_competency_vectors(incremental=incremental, progress=report)
+            return {"count": count}
+
+        job, created = job_manager.submit(
+            "initialize-vectors", run, dedup_key=VECTOR_BUILD_JOB, params={"incremental": incremental}
+        )
+        return _job_accepted(job, created, "Vector initialization started")
+
+    except JobAlreadyRunning as e:
         return jsonify({
-            "success": True,
-            "data": {
-                "message": f"Successfully created {count} job competency vectors",
-                "count": count
-            }
-        })
-        
+            "error": "Vector build in progress",
+            "message": str(e)
+        }), 409
     except Exception as e:
         logger.error(f"Error initializing vectors: {e}")
         return jsonify({
@@ -245,6 +551,45 @@ def initialize_vectors():
             "message": str(e)
         }), 500
 
+@app.route("/api/rebuild-vectors", methods=["POST"])
+def rebuild_vectors():
+    """Rebuild the vector index blue/green in the background and switch when done"""
+    try:
+        def run(report):
+            vector_db.rebuild_index_blue_green(background=False, progress=report)
+            return {"active_index": vector_db.active_index_name}
+
+        job, created = job_manager.submit("rebuild-vectors", run, dedup_key=VECTOR_BUILD_JOB)
+        return _job_accepted(
+            job, created,
+            "Vector index rebuild started; queries are served from the current index until it completes"
+        )
+
+    except JobAlreadyRunning as e:
+        return jsonify({
+            "error": "Vector build in progress",
+            "message": str(e)
+        }), 409
+    except Exception as e:
+        logger.error(f"Error starting vector rebuild: {e}")
+        return jsonify({
+            "error": "Internal server error",
+            "message": str(e)
+        }), 500
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Phase, progress, throughput and ETA of a background job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            "error": "Job not found"
+        }), 404
+    return jsonify({
+        "success": True,
+        "data": job.to_dict()
+    })
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({
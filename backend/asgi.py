@@ -0,0 +1,315 @@
+"""
+ASGI entry point: the query routes run on an event loop, so concurrent
+requests wait on Pinecone, PostgreSQL and the encoder without holding a
+thread each.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 2
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+
+/api/chat, /api/chat/stream, /api/search-jobs, /api/analyze-job and
+/api/job-competencies/<code> (plus /health, /ready and /api/stats) are served natively with the same
+request and response shapes as app.py; every other route (vector builds, job
+status) is passed through to the Flask app. Both share one set of components.
+"""
+import time
+import logging
+import contextlib
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse as _JSONResponse, StreamingResponse
+from starlette.routing import Match, Route, Mount
+import app as flask_app
+from async_service import AsyncCompetencyService
+from encoding_scheduler import EncoderOverloaded
+from request_tracing import span
+from chat_responses import (
+    SSE_HEADERS, is_job_title_message, analysis_reply, search_reply, sse_event, analysis_event, search_event,
+    analysis_log_fields, search_log_fields
+)
+
+logger = logging.getLogger(__name__)
+
+# Components are initialised at import (once in the master with preload_app);
+# the lifespan below attaches the event-loop resources in each worker
+flask_app.initialize_components(start_model=False)
+service = None
+
+
+class JSONResponse(_JSONResponse):
+    """Times response serialisation as the 'serialization' stage of the request trace"""
+
+    def render(self, content) -> bytes:
+        with span("serialization"):
+            return super().render(content)
+
+
+class TracingMiddleware:
+    """Request traces and Server-Timing for the natively served routes.
+
+    Routes passed through to Flask are traced by the Flask app's own hooks.
+    Both use the same tracer, so /metrics reports them together.
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    def _route(self, scope):
+        """Path template of the native route Starlette will dispatch to, or None for Flask"""
+        partial = None
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path if isinstance(route, Route) else None
+            if match == Match.PARTIAL and partial is None:
+                partial = route
+        # Only a method mismatch (405) leaves a partial match as the handler
+        return partial.path if isinstance(partial, Route) else None
+
+    async def __call__(self, scope, receive, send):
+        route = self._route(scope) if scope["type"] == "http" else None
+        trace = flask_app.tracer.start() if route is not None else None
+        if trace is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = (b"server-timing", trace.server_timing().encode("latin-1"))
+                message = {**message, "headers": list(message.get("headers", [])) + [timing]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            flask_app.tracer.finish(trace, scope["method"], route, status)
+
+
+async def _json_body(request: Request):
+    """Parsed JSON body, or None when it is missing or invalid"""
+    try:
+        return await request.json()
+    except Exception:
+        return None
+
+
+def _failure(e: Exception, action: str) -> JSONResponse:
+    """503 when the encoder is shedding load, otherwise 500; same bodies as the Flask routes"""
+    if isinstance(e, EncoderOverloaded):
+        logger.warning(f"Shedding load: {e}")
+        return JSONResponse({"error": "Service overloaded", "message": str(e)}, status_code=503)
+    logger.error(f"Error {action}: {e}")
+    return JSONResponse({"error": "Internal server error", "message": str(e)}, status_code=500)
+
+
+async def health_check(request: Request):
+    return JSONResponse({
+        "status": "healthy",
+        "message": "Competency Model Chatbot API is running"
+    })
+
+
+async def readiness_check(request: Request):
+    ready, body = flask_app.readiness_report()
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+async def stats(request: Request):
+    return JSONResponse({
+        "success": True,
+        "data": {**flask_app.runtime_stats(), "asgi": service.stats()}
+    })
+
+
+async def analyze_job(request: Request):
+    """Analyze a job role and return competency framework"""
+    try:
+        data = await _json_body(request)
+        if not data or "job_title" not in data:
+            return JSONResponse({"error": "job_title is required"}, status_code=400)
+
+        job_title = data["job_title"].strip()
+        if not job_title:
+            return JSONResponse({"error": "job_title cannot be empty"}, status_code=400)
+
+        result = await service.analyze_job_role(job_title)
+        return JSONResponse({"success": True, "data": result})
+
+    except Exception as e:
+        return _failure(e, "analyzing job")
+
+
+async def search_jobs(request: Request):
+    """Search for similar jobs based on query"""
+    try:
+        data = await _json_body(request)
+        if not data or "query" not in data:
+            return JSONResponse({"error": "query is required"}, status_code=400)
+
+        query = data["query"].strip()
+        if not query:
+            return JSONResponse({"error": "query cannot be empty"}, status_code=400)
+        try:
+            top_k = flask_app.parse_top_k(data.get("top_k"), 5)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+        similar_jobs = await service.search_similar_jobs(query, top_k)
+        return JSONResponse({
+            "success": True,
+            "data": {
+                "query": query,
+                "similar_jobs": similar_jobs
+            }
+        })
+
+    except Exception as e:
+        return _failure(e, "searching jobs")
+
+
+async def get_job_competencies(request: Request):
+    """Get detailed competencies for a specific job"""
+    onet_soc_code = request.path_params["onet_soc_code"]
+    try:
+        competencies = await service.get_job_competencies(onet_soc_code)
+        return JSONResponse({
+            "success": True,
+            "data": {
+                "onet_soc_code": onet_soc_code,
+                "competencies": competencies
+            }
+        })
+
+    except Exception as e:
+        return _failure(e, "getting job competencies")
+
+
+async def chat(request: Request):
+    """Chat endpoint for conversational interface"""
+    try:
+        data = await _json_body(request)
+        if not data or "message" not in data:
+            return JSONResponse({"error": "message is required"}, status_code=400)
+
+        message = data["message"].strip()
+        if not message:
+            return JSONResponse({"error": "message cannot be empty"}, status_code=400)
+
+        started = time.perf_counter()
+        if is_job_title_message(message):
+            result = await service.analyze_job_role(message)
+            response = analysis_reply(message, result)
+            if logger.isEnabledFor(logging.INFO):
+                fields = analysis_log_fields(result, response)
+                fields["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                logger.info("Chat reply", extra={"fields": fields})
+            return JSONResponse({
+                "success": True,
+                "data": {
+                    "response": response,
+                    "analysis": result,
+                    "type": "job_analysis"
+                }
+            })
+
+        similar_jobs = await service.search_similar_jobs(message, 3)
+        response = search_reply(message, similar_jobs)
+        if logger.isEnabledFor(logging.INFO):
+            fields = search_log_fields(similar_jobs, response)
+            fields["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            logger.info("Chat reply", extra={"fields": fields})
+        return JSONResponse({
+            "success": True,
+            "data": {
+                "response": response,
+                "similar_jobs": similar_jobs,
+                "type": "search"
+            }
+        })
+
+    except Exception as e:
+        return _failure(e, "in chat")
+
+
+async def chat_stream(request: Request):
+    """/api/chat as Server-Sent Events; same events as the Flask route"""
+    try:
+        data = await _json_body(request)
+        if not data or "message" not in data:
+            return JSONResponse({"error": "message is required"}, status_code=400)
+
+        message = data["message"].strip()
+        if not message:
+            return JSONResponse({"error": "message cannot be empty"}, status_code=400)
+
+        if not is_job_title_message(message):
+            similar_jobs = await service.search_similar_jobs(message, 3)
+
+            async def search_events():
+                yield search_event(message, similar_jobs)
+                yield sse_event("done", {"type": "search", "response": search_reply(message, similar_jobs)})
+
+            return StreamingResponse(search_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+        stages = service.iter_job_analysis(message)
+        first = await stages.__anext__()
+
+    except Exception as e:
+        return _failure(e, "in chat stream")
+
+    async def analysis_events():
+        result = {}
+        try:
+            yield analysis_event(message, *first, result)
+            async for stage, payload in stages:
+                yield analysis_event(message, stage, payload, result)
+            yield sse_event("done", {"type": "job_analysis", "response": analysis_reply(message, result)})
+        except Exception as e:
+            logger.error(f"Error in chat stream: {e}")
+            yield sse_event("error", {"error": "Internal server error", "message": str(e)})
+
+    return StreamingResponse(analysis_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    """Per-worker start-up: model loading (unless a gunicorn hook started it) and async clients"""
+    global service
+    flask_app.start_model_loading()
+    service = AsyncCompetencyService(flask_app.vector_db, flask_app.analyzer)
+    await service.start()
+    try:
+        yield
+    finally:
+        await service.close()
+
+
+routes = [
+    Route("/health", health_check, methods=["GET"]),
+    Route("/ready", readiness_check, methods=["GET"]),
+    Route("/api/stats", stats, methods=["GET"]),
+    Route("/api/analyze-job", analyze_job, methods=["POST"]),
+    Route("/api/search-jobs", search_jobs, methods=["POST"]),
+    Route("/api/job-competencies/{onet_soc_code}", get_job_competencies, methods=["GET"]),
+    Route("/api/chat", chat, methods=["POST"]),
+    Route("/api/chat/stream", chat_stream, methods=["POST"]),
+    # Admin and job-status routes stay synchronous (they start background threads anyway)
+    Mount("/", app=WSGIMiddleware(flask_app.app))
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        # Same policy as CORS(app) in app.py, so the static frontend can call either server
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]),
+        Middleware(TracingMiddleware, routes=routes)
+    ],
+    lifespan=lifespan
+)
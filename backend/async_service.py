@@ -0,0 +1,263 @@
+import os
+import asyncio
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, List, Dict, Any, Tuple
+import numpy as np
+from embedding_cache import normalize_query
+from encoding_scheduler import EncoderOverloaded
+from competency_profiles import structured_competencies_from_rows
+from competency_framework import analysis_stages
+from request_tracing import span
+
+# Same columns and order as CompetencyVectorDB.get_job_competencies, with a named parameter
+COMPETENCY_QUERY = """
+SELECT
+    element_name,
+    element_type,
+    scale_name,
+    data_value,
+    element_id,
+    scale_id
+FROM job_competencies
+WHERE onet_soc_code = :onet_soc_code
+ORDER BY element_type, scale_name, data_value DESC
+"""
+
+PINECONE_API_VERSION = '2024-07'
+
+
+class AsyncCompetencyService:
+    """Non-blocking request path over a ``CompetencyVectorDB`` and ``CompetencyAnalyzer``.
+
+    Used by the ASGI app (asgi.py) so a waiting request holds a coroutine
+    rather than a thread:
+
+    - Pinecone queries go over a shared ``httpx.AsyncClient`` to the index's
+      data-plane REST endpoint.
+    - The PostgreSQL fallback for competencies uses an asyncpg engine.
+    - Query encodes are awaited on the encoding scheduler's futures. With
+      batching disabled they run on the offload executor.
+    - Other blocking work runs on the offload executor, which has a fixed
+      size of ``ASGI_EXECUTOR_WORKERS`` threads. This covers local index
+      queries, the Pinecone host lookup and a Redis analysis cache.
+
+    Caches, the profile store and the analysis steps are the ones the Flask
+    routes use, so both serving modes return the same results.
+    ``start``/``close`` must run on the serving event loop (the ASGI lifespan).
+    """
+
+    def __init__(self, vector_db, analyzer):
+        self.vector_db = vector_db
+        self.analyzer = analyzer
+        self.executor_workers = int(os.getenv('ASGI_EXECUTOR_WORKERS', '4'))
+        self.http_max_connections = int(os.getenv('ASGI_HTTP_MAX_CONNECTIONS', '100'))
+        self.http_timeout = float(os.getenv('ASGI_HTTP_TIMEOUT', '10'))
+        self.executor = None
+        self.http = None
+        self.engine = None
+        self._pinecone_hosts: Dict[str, str] = {}
+
+    async def start(self):
+        """Create the executor, HTTP client and async database engine for this event loop"""
+        import httpx
+
+        self.executor = ThreadPoolExecutor(self.executor_workers, thread_name_prefix='asgi-offload')
+        self.http = httpx.AsyncClient(
+            timeout=self.http_timeout,
+            limits=httpx.Limits(
+                max_connections=self.http_max_connections,
+                max_keepalive_connections=self.http_max_connections
+            )
+        )
+        vector_db = self.vector_db
+        if vector_db.database_url and vector_db.profile_store is None:
+            from sqlalchemy.engine import make_url
+            from sqlalchemy.ext.asyncio import create_async_engine
+
+            self.engine = create_async_engine(
+                make_url(vector_db.database_url).set(drivername='postgresql+asyncpg'),
+                pool_size=vector_db.db_pool_size,
+                max_overflow=vector_db.db_max_overflow,
+                pool_timeout=vector_db.db_pool_timeout,
+                pool_recycle=vector_db.db_pool_recycle,
+                pool_pre_ping=vector_db.db_pool_pre_ping
+            )
+
+    async def close(self):
+        if self.http is not None:
+            await self.http.aclose()
+        if self.engine is not None:
+            await self.engine.dispose()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    async def _offload(self, fn: Callable, *args, **kwargs):
+        """Run blocking ``fn`` on the fixed-size offload executor, in the caller's context (request trace)"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, context.run, partial(fn, *args, **kwargs))
+
+    async def embed_query(self, text: str) -> np.ndarray:
+        """Query embedding through the shared cache and encoding scheduler, without blocking the loop"""
+        vector_db = self.vector_db
+        cache = vector_db.embedding_cache
+        key = normalize_query(text)
+        if cache is not None:
+            embedding = cache.get(key)
+            if embedding is not None:
+                return embedding
+
+        scheduler = vector_db.get_encoding_scheduler()
+        if scheduler is None:
+            # Property access may load the model, so it happens on the executor too
+            embedding = (await self._offload(lambda: vector_db.model.encode([text])))[0]
+        else:
+            future = scheduler.submit([text])[0]
+            try:
+                # A timed-out wait cancels the future, so the scheduler skips the text
+                embedding = await asyncio.wait_for(asyncio.wrap_future(future), vector_db.encode_timeout)
+            except asyncio.TimeoutError:
+                raise EncoderOverloaded(f"Encoding did not complete within {vector_db.encode_timeout}s")
+
+        if cache is not None:
+            cache.put(key, embedding)
+        return embedding
+
+    async def _pinecone_host(self, index_name: str) -> str:
+        """Data-plane host of a Pinecone index, looked up once per index name"""
+        host = self._pinecone_hosts.get(index_name)
+        if host is None:
+            description = await self._offload(self.vector_db.pc.describe_index, index_name)
+            host = description.host
+            self._pinecone_hosts[index_name] = host
+        return host
+
+    async def query_index(self, vector: List[float], top_k: int) -> List[Dict[str, Any]]:
+        """Nearest-neighbour matches (``id``, ``score``, ``metadata``) from the active index"""
+        vector_db = self.vector_db
+        if vector_db.index_backend == 'pinecone':
+            # Read the name once: a blue/green switch may change it while we wait
+            host = await self._pinecone_host(vector_db.active_index_name)
+            response = await self.http.post(
+                f"https://{host}/query",
+                json={'vector': vector, 'topK': top_k, 'includeMetadata': True},
+                headers={'Api-Key': vector_db.pinecone_api_key, 'X-Pinecone-API-Version': PINECONE_API_VERSION}
+            )
+            response.raise_for_status()
+            return response.json().get('matches', [])
+
+        results = await self._offload(vector_db.index.query, vector=vector, top_k=top_k, include_metadata=True)
+        return results['matches']
+
+    async def refresh_index(self):
+        """``CompetencyVectorDB.refresh_if_stale`` on the executor, only when a check is due"""
+        if self.vector_db.index_refresh_due():
+            await self._offload(self.vector_db.refresh_if_stale)
+
+    async def search_similar_jobs(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Async ``CompetencyVectorDB.search_similar_jobs``, with the same lexical fast path and fusion"""
+        vector_db = self.vector_db
+        try:
+            await self.refresh_index()
+            with span('lexical'):
+                similar_jobs = vector_db.lexical_fast_path(query, top_k)
+            if similar_jobs is not None:
+                return similar_jobs
+            with span('embedding'):
+                query_embedding = await self.embed_query(query)
+            with span('index_query'):
+                matches = await self.query_index(query_embedding.tolist(), vector_db.dense_candidates(top_k))
+            with span('lexical'):
+                return vector_db.merge_lexical(query, matches, top_k)
+        except Exception as e:
+            print(f"Error searching similar jobs: {e}")
+            raise
+
+    async def get_job_competencies(self, onet_soc_code: str) -> Dict[str, Any]:
+        """Async ``CompetencyVectorDB.get_job_competencies``"""
+        if self.vector_db.profile_store is None and self.engine is None:
+            # No DATABASE_URL: let the synchronous path raise its usual error
+            return await self._offload(self.vector_db.get_job_competencies, onet_soc_code)
+
+        with span('competency_fetch'):
+            if self.vector_db.profile_store is not None:
+                return self.vector_db.profile_store.get(onet_soc_code) or {}
+
+            try:
+                from sqlalchemy import text
+
+                async with self.engine.connect() as connection:
+                    result = await connection.execute(text(COMPETENCY_QUERY), {'onet_soc_code': onet_soc_code})
+                    rows = result.all()
+                return structured_competencies_from_rows(rows)
+            except Exception as e:
+                print(f"Error getting job competencies: {e}")
+                raise
+
+    async def _cached(self, fn: Callable, *args):
+        """Run an analysis-cache step, on the executor when a remote (networked) cache is configured"""
+        cache = self.analyzer.cache
+        if cache is not None and cache.remote is not None and not isinstance(cache.remote, dict):
+            return await self._offload(fn, *args)
+        return fn(*args)
+
+    async def analyze_job_role(self, job_title: str) -> Dict[str, Any]:
+        """Async ``CompetencyAnalyzer.analyze_job_role``, sharing its caches"""
+        analyzer = self.analyzer
+        try:
+            await self.refresh_index()
+            generation = self.vector_db.data_generation
+            cached = await self._cached(analyzer.cached_analysis, generation, job_title)
+            if cached is not None:
+                return cached
+
+            similar_jobs = await self.search_similar_jobs(job_title, top_k=3)
+            if not similar_jobs:
+                return {"error": "No similar jobs found"}
+
+            onet_soc_code = similar_jobs[0]['onet_soc_code']
+            occupation = await self._cached(analyzer.cached_occupation, generation, onet_soc_code)
+            if occupation is None:
+                competencies = await self.get_job_competencies(onet_soc_code)
+                occupation = await self._cached(analyzer.analyze_occupation, generation, onet_soc_code, competencies)
+            return await self._cached(analyzer.complete_analysis, generation, job_title, similar_jobs, occupation)
+
+        except Exception as e:
+            print(f"Error analyzing job role: {e}")
+            raise
+
+    async def iter_job_analysis(self, job_title: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Async ``CompetencyAnalyzer.iter_job_analysis``: the same stages, sharing its caches"""
+        analyzer = self.analyzer
+        await self.refresh_index()
+        generation = self.vector_db.data_generation
+        analysis = await self._cached(analyzer.cached_analysis, generation, job_title)
+        if analysis is None:
+            similar_jobs = await self.search_similar_jobs(job_title, top_k=3)
+            if not similar_jobs:
+                yield 'error', {"error": "No similar jobs found"}
+                return
+            yield 'match', {'query': job_title, 'best_match': similar_jobs[0], 'similar_jobs': similar_jobs}
+
+            onet_soc_code = similar_jobs[0]['onet_soc_code']
+            occupation = await self._cached(analyzer.cached_occupation, generation, onet_soc_code)
+            if occupation is None:
+                competencies = await self.get_job_competencies(onet_soc_code)
+                occupation = await self._cached(analyzer.analyze_occupation, generation, onet_soc_code, competencies)
+            analysis = await self._cached(analyzer.complete_analysis, generation, job_title, similar_jobs, occupation)
+        else:
+            yield 'match', analysis['job_analysis']
+
+        for stage in analysis_stages(analysis):
+            yield stage
+
+    def stats(self) -> Dict[str, Any]:
+        """Sizes of the executor, HTTP client and async database pool"""
+        return {
+            'executor_workers': self.executor_workers,
+            'http_max_connections': self.http_max_connections,
+            'async_db_pool': self.engine.pool.status() if self.engine is not None else None,
+            'pinecone_hosts': dict(self._pinecone_hosts)
+        }
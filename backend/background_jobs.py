@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: jobs are deduplicated within the process only
+    fcntl = None
+
+# Minimum seconds between progress writes to a job's shared state file
+STATE_WRITE_INTERVAL = 1.0
+
+# How long to wait for another process that holds a key to publish its job's status
+STORED_JOB_WAIT = 1.0
+
+
+class JobAlreadyRunning(RuntimeError):
+    """Another process holds the job's key, but its job status could not be read"""
+
+
+class Job:
+    """State and progress of one background job.
+
+    The job function receives ``job.report(phase, processed, total)`` as its
+    progress callback. Throughput and ETA are computed over the current phase.
+    """
+
+    def __init__(self, kind: str, params: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.state = 'queued'
+        self.phase = None
+        self.processed = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._phase_started = None
+        self._lock = threading.Lock()
+        # Set by JobManager when job state is shared between processes
+        self._on_change: Optional[Callable[['Job', bool], None]] = None
+
+    @property
+    def active(self) -> bool:
+        return self.state in ('queued', 'running')
+
+    def report(self, phase: str, processed: int = 0, total: Optional[int] = None):
+        """Progress callback: ``processed`` of ``total`` items done in ``phase``"""
+        with self._lock:
+            new_phase = phase != self.phase
+            if new_phase:
+                self.phase = phase
+                self._phase_started = time.monotonic()
+            self.processed = processed
+            self.total = total
+        if self._on_change is not None:
+            self._on_change(self, new_phase)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            throughput = None
+            eta_seconds = None
+            if self.state == 'running' and self._phase_started is not None and self.processed:
+                elapsed = time.monotonic() - self._phase_started
+                if elapsed > 0:
+                    throughput = self.processed / elapsed
+                    if self.total:
+                        eta_seconds = max(self.total - self.processed, 0) / throughput
+            end = self.finished_at or time.time()
+            return {
+                'job_id': self.id,
+                'kind': self.kind,
+                'params': self.params,
+                'state': self.state,
+                'phase': self.phase,
+                'processed': self.processed,
+                'total': self.total,
+                'throughput_per_second': round(throughput, 2) if throughput is not None else None,
+                'eta_seconds': round(eta_seconds, 1) if eta_seconds is not None else None,
+                'elapsed_seconds': round(end - self.started_at, 1) if self.started_at else None,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at,
+                'result': self.result,
+                'error': self.error
+            }
+
+
+class StoredJob:
+    """Status of a job run by another process, as last written to its state file"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.id = data['job_id']
+        self.kind = data['kind']
+
+    @property
+    def active(self) -> bool:
+        return self.data['state'] in ('queued', 'running')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.data)
+
+
+class JobManager:
+    """Runs long jobs on daemon threads and keeps their status for polling.
+
+    Jobs submitted under the same ``dedup_key`` while one is still queued or
+    running are not started again; the running job is returned instead. The
+    most recent ``max_history`` jobs are kept for status queries.
+
+    With a ``state_dir`` (``JOB_STATE_DIR``, default ``../data/jobs``) this
+    holds across gunicorn workers sharing the directory. A job holds an
+    exclusive ``fcntl`` lock on ``<dedup_key>.lock`` while it runs, so no other
+    process starts a job under the same key. Its status is written to
+    ``<job_id>.json``, so any worker can answer a status query. The lock is
+    released by the OS if the worker dies. A job it leaves marked running is
+    reported as failed by the next job under that key.
+    """
+
+    def __init__(self, max_history: int = 50, state_dir: Optional[str] = None):
+        self.max_history = max_history
+        if state_dir is None:
+            state_dir = os.getenv('JOB_STATE_DIR', '../data/jobs')
+        self.state_dir = state_dir or None
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._lock_files: Dict[str, Any] = {}
+        self._last_write: Dict[str, float] = {}
+
+    def submit(self, kind: str, fn: Callable[[Callable], Any], dedup_key: Optional[str] = None,
+               params: Optional[Dict[str, Any]] = None) -> Tuple[Any, bool]:
+        """Start ``fn(report)`` in the background; returns (job, created).
+
+        ``job`` is a ``StoredJob`` when the running job belongs to another process.
+        Raises ``JobAlreadyRunning`` when another process holds the key but
+        publishes no active job within ``STORED_JOB_WAIT`` seconds. That
+        happens while it is starting a job or releasing the key after one.
+        """
+        dedup_key = dedup_key or kind
+        with self._lock:
+            running = self._active.get(dedup_key)
+            if running is not None and running.active:
+                return running, False
+
+            lock_file = None
+            if self.state_dir and fcntl is not None:
+                lock_file = self._acquire_key(dedup_key)
+                if lock_file is None:
+                    running = self._wait_for_stored_job(dedup_key)
+                    if running is not None:
+                        return running, False
+                    raise JobAlreadyRunning(
+                        f"A {dedup_key} job is starting or finishing in another worker; retry shortly"
+                    )
+
+            job = Job(kind, params)
+            self._jobs[job.id] = job
+            self._active[dedup_key] = job
+            if lock_file is not None:
+                self._lock_files[job.id] = lock_file
+            while len(self._jobs) > self.max_history:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if oldest.active:
+                    break
+                del self._jobs[oldest_id]
+
+        if self.state_dir:
+            job._on_change = self._save
+            self._save(job, True)
+            self._write_json(self._key_path(dedup_key, '.json'), {'job_id': job.id, 'pid': os.getpid()})
+            self._prune_state_files()
+
+        thread = threading.Thread(target=self._run, args=(job, fn), name=f'job-{kind}', daemon=True)
+        thread.start()
+        return job, True
+
+    def _run(self, job: Job, fn: Callable[[Callable], Any]):
+        job.started_at = time.time()
+        job.state = 'running'
+        self._save(job, True)
+        try:
+            job.result = fn(job.report)
+            job.state = 'succeeded'
+        except Exception as e:
+            print(f"Background job {job.kind} ({job.id}) failed: {e}")
+            job.error = str(e)
+            job.state = 'failed'
+        finally:
+            job.finished_at = time.time()
+            self._save(job, True)
+            lock_file = self._lock_files.pop(job.id, None)
+            if lock_file is not None:
+                # Closing the file releases the flock
+                lock_file.close()
+
+    def get(self, job_id: str) -> Optional[Any]:
+        """The job with ``job_id``, from this process or (as a ``StoredJob``) from the shared state"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None or not self.state_dir:
+            return job
+        data = self._read_json(self._job_path(job_id))
+        return StoredJob(data) if data is not None else None
+
+    # Shared state (state_dir)
+
+    def _key_path(self, dedup_key: str, suffix: str) -> str:
+        return os.path.join(self.state_dir, f"{dedup_key}{suffix}")
+
+    def _job_path(self, job_id: str) -> str:
+        # Job IDs are uuid4 hex; anything else cannot name a state file
+        return os.path.join(self.state_dir, f"job-{job_id if job_id.isalnum() else 'invalid'}.json")
+
+    def _acquire_key(self, dedup_key: str):
+        """Open and exclusively lock ``<dedup_key>.lock``; None if another process holds it"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        lock_file = open(self._key_path(dedup_key, '.lock'), 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+
+        # We hold the lock, so a job the pointer still shows as running lost its process
+        pointer = self._read_json(self._key_path(dedup_key, '.json'))
+        if pointer is not None:
+            data = self._read_json(self._job_path(pointer['job_id']))
+            if data is not None and data['state'] in ('queued', 'running'):
+                data.update(state='failed', error="Worker process exited before the job finished",
+                            finished_at=time.time())
+                self._write_json(self._job_path(data['job_id']), data)
+        return lock_file
+
+    def _stored_active_job(self, dedup_key: str) -> Optional[StoredJob]:
+        pointer = self._read_json(self._key_path(dedup_key, '.json'))
+        data = self._read_json(self._job_path(pointer['job_id'])) if pointer else None
+        return StoredJob(data) if data is not None else None
+
+    def _wait_for_stored_job(self, dedup_key: str) -> Optional[StoredJob]:
+        """The active job another process runs under ``dedup_key``, polled until ``STORED_JOB_WAIT``"""
+        deadline = time.monotonic() + STORED_JOB_WAIT
+        while True:
+            running = self._stored_active_job(dedup_key)
+            if running is not None and running.active:
+                return running
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.05)
+
+    def _save(self, job: Job, force: bool):
+        """Write the job's status, at most every STATE_WRITE_INTERVAL seconds unless ``force``"""
+        if not self.state_dir:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_write.get(job.id, 0.0) < STATE_WRITE_INTERVAL:
+            return
+        self._last_write[job.id] = now
+        try:
+            self._write_json(self._job_path(job.id), job.to_dict())
+        except OSError as e:
+            print(f"Could not write state of job {job.id}: {e}")
+        if not job.active:
+            self._last_write.pop(job.id, None)
+
+    def _prune_state_files(self):
+        """Delete the state files of finished jobs beyond the newest ``max_history``"""
+        try:
+            paths = [
+                os.path.join(self.state_dir, name) for name in os.listdir(self.state_dir)
+                if name.startswith('job-') and name.endswith('.json')
+            ]
+            paths.sort(key=os.path.getmtime, reverse=True)
+            for path in paths[self.max_history:]:
+                data = self._read_json(path)
+                if data is None or data['state'] not in ('queued', 'running'):
+                    os.remove(path)
+        except OSError as e:
+            print(f"Could not prune job state files: {e}")
+
+    def _write_json(self, path: str, data: Dict[str, Any]):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_json(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
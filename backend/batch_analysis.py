@@ -0,0 +1,157 @@
+import os
+import csv
+import time
+from itertools import islice
+from typing import Iterable, Iterator, List, Dict, Any, Optional
+from embedding_cache import normalize_query
+
+# Header names recognised as the job-title column of a CSV (compared case-insensitively)
+TITLE_COLUMNS = ('job_title', 'job title', 'title')
+
+
+def read_titles_csv(lines: Iterable[str], column: Optional[str] = None) -> Iterator[str]:
+    """Job titles from CSV lines, one per row.
+
+    The title column is ``column`` when given, otherwise the first header
+    named like a title (``TITLE_COLUMNS``). Without such a header the first
+    column is used and the first row counts as data. The header is read
+    immediately, so a missing ``column`` raises ``ValueError`` before any
+    rows are consumed.
+    """
+    reader = csv.reader(lines)
+    first = next(reader, None)
+    if first is None:
+        return iter(())
+
+    names = [name.strip().lower() for name in first]
+    first_is_data = False
+    if column is not None:
+        if column.strip().lower() not in names:
+            raise ValueError(f"Column {column!r} not found in CSV header")
+        position = names.index(column.strip().lower())
+    else:
+        position = next((names.index(name) for name in TITLE_COLUMNS if name in names), None)
+        if position is None:
+            position = 0
+            first_is_data = True
+
+    def titles():
+        if first_is_data:
+            yield first[position] if len(first) > position else ''
+        for row in reader:
+            yield row[position] if len(row) > position else ''
+
+    return titles()
+
+
+class BatchAnalyzer:
+    """Maps many job titles onto occupations, yielding one result per title in input order.
+
+    Input is consumed ``chunk_size`` titles at a time, so memory depends on
+    the chunk size rather than the input size. Within a chunk, titles are
+    de-duplicated by normalised text. The new ones are searched together with
+    ``search_similar_jobs_batch``. With ``include_analysis``, the competency
+    profiles of the matched occupations are fetched in one call and analysed
+    once per occupation. Searches are also memoised across chunks, for up to
+    ``max_memo`` distinct titles.
+
+    Each result has the ``best_match`` and ``similar_jobs`` of
+    ``analyze_job_role``'s ``job_analysis``. With ``include_analysis`` it also
+    has the occupation parts (framework, recommendations, summary, diagram).
+    A final ``summary`` record reports counts and throughput.
+    """
+
+    def __init__(self, vector_db, analyzer, top_k: int = 3, include_analysis: bool = False,
+                 chunk_size: Optional[int] = None, max_memo: Optional[int] = None):
+        self.vector_db = vector_db
+        self.analyzer = analyzer
+        self.top_k = top_k
+        self.include_analysis = include_analysis
+        self.chunk_size = chunk_size or int(os.getenv('BATCH_CHUNK_SIZE', '1000'))
+        self.max_memo = max_memo if max_memo is not None else int(os.getenv('BATCH_MEMO_SIZE', '100000'))
+        self._memo: Dict[str, List[Dict[str, Any]]] = {}
+        self.rows = 0
+        self.searched = 0
+        self.matched = 0
+        self.errors = 0
+
+    def run(self, titles: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        start = time.perf_counter()
+        iterator = iter(titles)
+        while True:
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                break
+            yield from self._analyze_chunk(self.rows, chunk)
+            self.rows += len(chunk)
+
+        elapsed = time.perf_counter() - start
+        yield {
+            'type': 'summary',
+            'rows': self.rows,
+            'unique_titles_searched': self.searched,
+            'matched': self.matched,
+            'errors': self.errors,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(self.rows / elapsed, 1) if elapsed else None
+        }
+
+    def _analyze_chunk(self, offset: int, chunk: List[str]) -> Iterator[Dict[str, Any]]:
+        keys = [normalize_query(title) if title and title.strip() else None for title in chunk]
+
+        found = {}
+        pending = {}
+        for key, title in zip(keys, chunk):
+            if key is None or key in found or key in pending:
+                continue
+            if key in self._memo:
+                found[key] = self._memo[key]
+            else:
+                pending[key] = title.strip()
+
+        if pending:
+            searched = self.vector_db.search_similar_jobs_batch(list(pending.values()), self.top_k)
+            self.searched += len(pending)
+            for key, similar_jobs in zip(pending, searched):
+                found[key] = similar_jobs
+                if len(self._memo) < self.max_memo:
+                    self._memo[key] = similar_jobs
+
+        occupations = {}
+        if self.include_analysis:
+            occupations = self._occupations({jobs[0]['onet_soc_code'] for jobs in found.values() if jobs})
+
+        for i, (key, title) in enumerate(zip(keys, chunk)):
+            record = {'type': 'result', 'row': offset + i, 'job_title': title}
+            similar_jobs = found.get(key) if key is not None else None
+            if key is None:
+                record['error'] = 'job_title cannot be empty'
+            elif not similar_jobs:
+                record['error'] = 'No similar jobs found'
+            else:
+                record['best_match'] = similar_jobs[0]
+                record['similar_jobs'] = similar_jobs
+                if self.include_analysis:
+                    record.update(occupations[similar_jobs[0]['onet_soc_code']])
+            if 'error' in record:
+                self.errors += 1
+            else:
+                self.matched += 1
+            yield record
+
+    def _occupations(self, onet_soc_codes) -> Dict[str, Dict[str, Any]]:
+        """Occupation parts per code: memoised ones reused, the rest analysed from one bulk profile fetch"""
+        generation = self.vector_db.data_generation
+        occupations = {}
+        missing = []
+        for code in onet_soc_codes:
+            cached = self.analyzer.cached_occupation(generation, code)
+            if cached is None:
+                missing.append(code)
+            else:
+                occupations[code] = cached
+        if missing:
+            competencies = self.vector_db.get_job_competencies_bulk(missing)
+            for code in missing:
+                occupations[code] = self.analyzer.analyze_occupation(generation, code, competencies[code])
+        return occupations
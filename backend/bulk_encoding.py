@@ -0,0 +1,95 @@
+import os
+from contextlib import contextmanager
+import numpy as np
+from typing import Callable, Iterator, List, Optional, Tuple
+
+
+def length_sorted_order(texts: List[str]) -> np.ndarray:
+    """Indices that order ``texts`` longest first, so each batch pads to a similar length"""
+    return np.argsort([-len(text) for text in texts], kind='stable')
+
+
+@contextmanager
+def sentence_transformer_encoder(model, batch_size: int = 64, processes: int = 1):
+    """Yield an encode function for a SentenceTransformer.
+
+    With ``processes > 1`` sentence-transformers' multi-process pool spreads
+    each call over that many CPU workers; the pool lives as long as the context,
+    so chunked callers pay its start-up cost once.
+    """
+    if processes > 1:
+        pool = model.start_multi_process_pool(target_devices=['cpu'] * processes)
+        try:
+            yield lambda texts: model.encode_multi_process(texts, pool, batch_size=batch_size)
+        finally:
+            model.stop_multi_process_pool(pool)
+    else:
+        yield lambda texts: model.encode(texts, batch_size=batch_size)
+
+
+def iter_encode_bulk(encode_fn: Callable[[List[str]], np.ndarray], texts: List[str],
+                     chunk_size: int = 1024) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Encode ``texts`` in length-sorted chunks, yielding (indices into ``texts``, embeddings)"""
+    order = length_sorted_order(texts)
+    for start in range(0, len(texts), chunk_size):
+        indices = order[start:start + chunk_size]
+        yield indices, np.asarray(encode_fn([texts[i] for i in indices]), dtype=np.float32)
+
+
+def encode_bulk(model, texts: List[str], batch_size: int = 64, processes: int = 1) -> np.ndarray:
+    """Encode many texts with a SentenceTransformer, optionally across a process pool.
+
+    Texts are length-sorted before batching and the embeddings are returned in
+    the original order.
+    """
+    embeddings = np.empty((len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32)
+    if not texts:
+        return embeddings
+    with sentence_transformer_encoder(model, batch_size, processes) as encode_fn:
+        for indices, chunk in iter_encode_bulk(encode_fn, texts, chunk_size=len(texts)):
+            embeddings[indices] = chunk
+    return embeddings
+
+
+class OnnxEncoder:
+    """all-MiniLM-L6-v2 running on ONNX Runtime, typically int8-quantised.
+
+    Reproduces the SentenceTransformer pipeline (tokenise, transformer, mean
+    pooling over the attention mask, L2 normalisation). Create the model file
+    with ``scripts/export_onnx_encoder.py``. ONNX Runtime already parallelises
+    each batch across ``threads`` cores, so no process pool is needed.
+    """
+
+    def __init__(self, model_path: str, tokenizer_name: str = 'sentence-transformers/all-MiniLM-L6-v2',
+                 threads: Optional[int] = None, max_seq_length: int = 256):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or os.cpu_count() or 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+        self.max_seq_length = max_seq_length
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Encode ``texts`` in length-sorted batches; returns L2-normalised float32 embeddings"""
+        order = length_sorted_order(texts)
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            batch = [texts[i] for i in order[start:start + batch_size]]
+            tokens = self.tokenizer(batch, padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors='np')
+            inputs = {name: value.astype(np.int64) for name, value in tokens.items() if name in self.input_names}
+            token_embeddings = self.session.run(None, inputs)[0]
+
+            mask = tokens['attention_mask'][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+
+        sorted_embeddings = np.concatenate(batches) if batches else np.empty((0, 0), dtype=np.float32)
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+        return embeddings
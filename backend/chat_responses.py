@@ -0,0 +1,124 @@
+import json
+from typing import List, Dict, Any, Optional
+from request_tracing import span
+
+# Response headers for /api/chat/stream: no caching, and no proxy buffering (nginx) so events arrive as sent
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Messages mentioning any of these are analysed as a job title; others run a plain search
+JOB_TITLE_KEYWORDS = ("engineer", "manager", "analyst", "developer", "specialist", "coordinator", "director")
+
+
+def is_job_title_message(message: str) -> bool:
+    """Whether a chat message looks like a job title to analyse"""
+    lowered = message.lower()
+    return any(keyword in lowered for keyword in JOB_TITLE_KEYWORDS)
+
+
+def similarity_text(job: Dict[str, Any]) -> str:
+    """How well a job matched: cosine similarity, or title similarity for a lexical-only match"""
+    if job.get('score') is not None:
+        return f"similarity: {job['score']:.2f}"
+    return f"title match: {job['lexical_score']:.2f}"
+
+
+def score_fields(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Both match scores of a job, rounded for logging; either may be None"""
+    return {
+        key: None if job.get(key) is None else round(job[key], 3)
+        for key in ('score', 'lexical_score')
+    }
+
+
+def match_reply(message: str, best_match: Optional[Dict[str, Any]] = None) -> str:
+    """Opening of the analysis reply: what was asked and the best-matching occupation"""
+    response = f"I found information about {message}. Here's a summary of the competency analysis:\n\n"
+    if best_match is not None:
+        response += f"Best match: {best_match['title']} ({similarity_text(best_match)})\n\n"
+    return response
+
+
+def analysis_reply(message: str, result: Dict[str, Any]) -> str:
+    """Chat text summarising an ``analyze_job_role`` result"""
+    response = match_reply(message, result["job_analysis"]["best_match"] if "job_analysis" in result else None)
+
+    if "recommendations" in result:
+        # The recommendations are already pre-formatted by the framework builder
+        for rec in result["recommendations"]:
+            response += f"{rec}\n"
+
+    if "formatted_framework_summary" in result:
+        response += result["formatted_framework_summary"]
+
+    response += "\nFor a full, structured breakdown of all skills and abilities, please refer to the 'analysis' field in the JSON response."
+    return response
+
+
+def search_reply(message: str, similar_jobs: List[Dict[str, Any]]) -> str:
+    """Chat text listing the jobs found for a general query"""
+    if not similar_jobs:
+        return f"I couldn't find any jobs directly related to {message}. Try being more specific or use job titles like 'Software Engineer' or 'Data Analyst'."
+
+    response = f"I found {len(similar_jobs)} jobs related to {message}:\n\n"
+    for i, job in enumerate(similar_jobs, 1):
+        response += f"{i}. {job['title']} ({similarity_text(job)})\n"
+    response += "\nWould you like me to analyze any of these roles in detail?"
+    return response
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """One Server-Sent Events frame with a JSON payload"""
+    with span('serialization'):
+        return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def analysis_event(message: str, stage: str, payload: Dict[str, Any], result: Dict[str, Any]) -> str:
+    """SSE frame for one ``iter_job_analysis`` stage; ``result`` accumulates the full analysis.
+
+    The ``match`` event also carries the opening chat text, so clients can
+    show it before the rest of the analysis arrives.
+    """
+    if stage == 'match':
+        result['job_analysis'] = payload
+        payload = {**payload, 'response': match_reply(message, payload['best_match'])}
+    else:
+        result.update(payload)
+    return sse_event(stage, payload)
+
+
+def search_event(message: str, similar_jobs: List[Dict[str, Any]]) -> str:
+    """SSE frame for a general (non job title) chat message"""
+    return sse_event('search', {
+        'response': search_reply(message, similar_jobs),
+        'similar_jobs': similar_jobs
+    })
+
+
+def analysis_log_fields(result: Dict[str, Any], response: str) -> Dict[str, Any]:
+    """What to log about a job analysis reply: the match, sizes and counts, not the payload"""
+    if "job_analysis" not in result:
+        return {'type': 'job_analysis', 'error': result.get('error'), 'response_chars': len(response)}
+
+    best_match = result["job_analysis"]["best_match"]
+    diagram = result.get("structural_diagram") or {}
+    return {
+        'type': 'job_analysis',
+        'onet_soc_code': best_match['onet_soc_code'],
+        **score_fields(best_match),
+        'retrieval': best_match.get('retrieval'),
+        'similar_jobs': len(result["job_analysis"]["similar_jobs"]),
+        'competencies': sum(len(scale) for scales in result.get("competency_framework", {}).values()
+                            for scale in scales.values()),
+        'diagram_nodes': len(diagram.get('nodes', ())),
+        'diagram_edges': len(diagram.get('edges', ())),
+        'response_chars': len(response)
+    }
+
+
+def search_log_fields(similar_jobs: List[Dict[str, Any]], response: str) -> Dict[str, Any]:
+    """What to log about a search reply"""
+    fields = {'type': 'search', 'results': len(similar_jobs), 'response_chars': len(response)}
+    if similar_jobs:
+        fields['onet_soc_code'] = similar_jobs[0]['onet_soc_code']
+        fields.update(score_fields(similar_jobs[0]))
+    return fields
@@ -0,0 +1,150 @@
+import heapq
+from typing import Iterator, List, Dict, Any, Tuple
+
+# Scales and element types shown in the text summary, in display order
+SUMMARY_SCALES = ('Importance', 'Level')
+SUMMARY_SECTIONS = (('Skill', '--- SKILLS ---'), ('Ability', '--- ABILITIES ---'))
+RECOMMENDATION_TYPES = ('Skill', 'Ability')
+
+
+def _by_value(competency: Dict[str, Any]) -> float:
+    return competency['data_value']
+
+
+def top_competencies(structured_competencies: Dict[str, Any], top_n: int = 3,
+                     presorted: bool = True) -> Dict[str, Dict[str, Tuple[Dict[str, Any], ...]]]:
+    """Top ``top_n`` competencies per element type and scale, highest ``data_value`` first.
+
+    Profiles from ``CompetencyProfileStore`` and ``build_structured_competencies``
+    are already ordered by ``data_value`` descending, so selection is a slice;
+    pass ``presorted=False`` for other input to select with ``heapq.nlargest``
+    (which orders ties like a full descending sort). The result is built from
+    tuples, and every view is read from it without sorting again.
+    """
+    if presorted:
+        return {
+            element_type: {scale_name: tuple(competencies[:top_n]) for scale_name, competencies in scales.items()}
+            for element_type, scales in structured_competencies.items()
+        }
+    return {
+        element_type: {
+            scale_name: tuple(heapq.nlargest(top_n, competencies, key=_by_value))
+            for scale_name, competencies in scales.items()
+        }
+        for element_type, scales in structured_competencies.items()
+    }
+
+
+def _recommendations(top: Dict[str, Dict[str, Tuple]]) -> List[str]:
+    recommendations = []
+    for element_type in RECOMMENDATION_TYPES:
+        for i, competency in enumerate(top.get(element_type, {}).get('Importance', ())[:3]):
+            recommendations.append(
+                f"{element_type} {i + 1}: {competency['element_name']} (Importance: {competency['data_value']:.1f})"
+            )
+
+    if not recommendations:
+        return ["No specific top skills or abilities by importance found for this role."]
+    return ["Key competencies for this role (top 3 by Importance):"] + recommendations
+
+
+def _summary(top: Dict[str, Dict[str, Tuple]]) -> str:
+    parts = ['\n📊 Key Competency Framework (Top 3 by Importance & Level):\n\n']
+    for element_type, heading in SUMMARY_SECTIONS:
+        if element_type not in top:
+            continue
+        parts.append(f"{heading}\n")
+        for scale_name in SUMMARY_SCALES:
+            if scale_name not in top[element_type]:
+                continue
+            parts.append(f"  {scale_name.upper()}:\n")
+            for i, competency in enumerate(top[element_type][scale_name][:3]):
+                parts.append(f"    {i + 1}. {competency['element_name']} ({competency['data_value']:.1f})\n")
+            parts.append("\n")
+    return ''.join(parts)
+
+
+def _structural_diagram(top: Dict[str, Dict[str, Tuple]]) -> Dict[str, Any]:
+    nodes = [{
+        'id': 'node_0',
+        'label': 'Job Role',
+        'type': 'job_root',
+        'level': 0,
+        'group': 'job_root'
+    }]
+    edges = []
+    scale_categories = []
+
+    for element_type, scales in top.items():
+        type_node_id = f"node_{len(nodes)}"
+        nodes.append({
+            'id': type_node_id,
+            'label': element_type,
+            'type': 'element_type',
+            'level': 1,
+            'group': 'element_type'
+        })
+        edges.append({'from': 'node_0', 'to': type_node_id, 'weight': 1})
+
+        for scale_name, competencies in scales.items():
+            scale_label = scale_name.replace('_', ' ')
+            scale_categories.append(f"{element_type} - {scale_label}")
+            scale_node_id = f"node_{len(nodes)}"
+            nodes.append({
+                'id': scale_node_id,
+                'label': scale_label,
+                'type': 'scale',
+                'level': 2,
+                'group': 'scale'
+            })
+            edges.append({'from': type_node_id, 'to': scale_node_id, 'weight': 1})
+
+            for competency in competencies:
+                node_id = f"node_{len(nodes)}"
+                nodes.append({
+                    'id': node_id,
+                    'label': f"{competency['element_name']} ({competency['data_value']:.1f})",
+                    'type': 'competency',
+                    'level': 3,
+                    'importance': competency['data_value'],
+                    'element_id': competency['element_id'],
+                    'scale_id': competency['scale_id'],
+                    'element_type': element_type,
+                    'scale_name': scale_name,
+                    'group': 'competency'
+                })
+                edges.append({'from': scale_node_id, 'to': node_id, 'weight': competency['data_value']})
+
+    return {
+        'nodes': nodes,
+        'edges': edges,
+        'categories': list(top.keys()) + scale_categories
+    }
+
+
+def build_competency_framework(structured_competencies: Dict[str, Any], top_n: int = 3) -> Dict[str, Any]:
+    """Everything ``analyze_job_role`` derives from one occupation's competencies.
+
+    The top-N selection runs once; the filtered framework, recommendations,
+    text summary and diagram graph are all read from it.
+    """
+    top = top_competencies(structured_competencies, top_n)
+    return {
+        'competency_framework': {
+            element_type: {scale_name: list(competencies) for scale_name, competencies in scales.items()}
+            for element_type, scales in top.items()
+        },
+        'recommendations': _recommendations(top),
+        'formatted_framework_summary': _summary(top),
+        'structural_diagram': _structural_diagram(top)
+    }
+
+
+def analysis_stages(analysis: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """The occupation parts of a complete analysis, in the order streaming clients render them"""
+    yield 'recommendations', {'recommendations': analysis['recommendations']}
+    yield 'summary', {
+        'formatted_framework_summary': analysis['formatted_framework_summary'],
+        'competency_framework': analysis['competency_framework']
+    }
+    yield 'diagram', {'structural_diagram': analysis['structural_diagram']}
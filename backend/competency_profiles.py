@@ -0,0 +1,214 @@
+import os
+import gzip
+import json
+import tempfile
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # Only the builders need pandas; loading saved profiles must stay import-light
+    import pandas as pd
+
+PROFILE_FORMAT_VERSION = 1
+
+# Every column a profile entry needs, in the order the SQL query selects them
+PROFILE_QUERY = """
+SELECT
+    onet_soc_code,
+    element_name,
+    element_type,
+    scale_name,
+    data_value,
+    element_id,
+    scale_id
+FROM job_competencies
+WHERE data_value IS NOT NULL
+ORDER BY onet_soc_code, element_type, scale_name, data_value DESC
+"""
+
+
+def content_hash(text: str) -> str:
+    """Hash of a generated job description, used to detect changed occupations"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _top_competency_text(df: 'pd.DataFrame', top_n: int) -> 'pd.DataFrame':
+    """``"name (scale): value; ..."`` for the top ``top_n`` rows per occupation and element type.
+
+    Returns a frame indexed by ``onet_soc_code`` with one column per element type.
+    """
+    ranked = df.sort_values(['onet_soc_code', 'data_value'], ascending=[True, False], kind='stable')
+    ranked = ranked[ranked.groupby(['onet_soc_code', 'element_type'], sort=False).cumcount() < top_n]
+    entries = (
+        ranked['element_name'].astype(str) + ' (' + ranked['scale_name'].astype(str) + '): '
+        + ranked['data_value'].astype(str)
+    )
+    return (
+        entries.groupby([ranked['onet_soc_code'], ranked['element_type']], sort=False)
+        .agg('; '.join)
+        .unstack(fill_value='')
+    )
+
+
+def build_job_descriptions(df: 'pd.DataFrame', top_n: int = 5) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Build the embedding text and vector metadata for every occupation in ``df``.
+
+    ``df`` holds one row per competency value (``onet_soc_code``, ``title``,
+    ``description``, ``element_name``, ``element_type``, ``scale_name``,
+    ``data_value``). Top-N selection is a rank within each group and the text
+    is assembled with whole-column string operations, so the cost does not
+    depend on per-group Python loops.
+    """
+    import pandas as pd
+
+    occupations = df.drop_duplicates('onet_soc_code').set_index('onet_soc_code').sort_index()
+    counts = df.groupby('onet_soc_code').size()
+    top_text = _top_competency_text(df, top_n).reindex(occupations.index, fill_value='')
+
+    def text_for(element_type: str) -> 'pd.Series':
+        if element_type in top_text.columns:
+            return top_text[element_type].fillna('')
+        return pd.Series('', index=occupations.index)
+
+    descriptions = (
+        'Job Title: ' + occupations['title'].astype(str)
+        + '. Description: ' + occupations['description'].astype(str)
+        + '. Key Skills: ' + text_for('Skill')
+        + '. Key Abilities: ' + text_for('Ability')
+    ).tolist()
+
+    job_metadata = [
+        {
+            'onet_soc_code': onet_soc_code,
+            'title': title,
+            'description': description,
+            'competency_count': int(count),
+            'content_hash': content_hash(full_description)
+        }
+        for onet_soc_code, title, description, count, full_description in zip(
+            occupations.index, occupations['title'], occupations['description'],
+            counts.reindex(occupations.index), descriptions
+        )
+    ]
+    return descriptions, job_metadata
+
+
+def _group_competencies(onet_soc_codes, element_types, scale_names, element_names,
+                        data_values, element_ids, scale_ids) -> Dict[str, Dict[str, Any]]:
+    """Nest parallel column arrays into {onet_soc_code: {element_type: {scale_name: [...]}}}"""
+    profiles = {}
+    for code, element_type, scale, name, value, element_id, scale_id in zip(
+            onet_soc_codes, element_types, scale_names, element_names,
+            data_values, element_ids, scale_ids):
+        scales = profiles.setdefault(code, {}).setdefault(element_type, {})
+        scales.setdefault(scale, []).append({
+            'element_name': name,
+            'data_value': value,
+            'element_id': element_id,
+            'scale_id': scale_id
+        })
+    return profiles
+
+
+def _sorted_columns(df: 'pd.DataFrame'):
+    """Column lists in ``element_type, scale_name, data_value DESC`` order per occupation"""
+    df = df.sort_values(
+        ['onet_soc_code', 'element_type', 'scale_name', 'data_value'],
+        ascending=[True, True, True, False],
+        kind='stable'
+    )
+    return (
+        df['onet_soc_code'].tolist(),
+        df['element_type'].tolist(),
+        df['scale_name'].tolist(),
+        df['element_name'].tolist(),
+        df['data_value'].astype(float).tolist(),
+        df['element_id'].tolist(),
+        df['scale_id'].tolist()
+    )
+
+
+def build_structured_competencies(df: 'pd.DataFrame') -> Dict[str, Any]:
+    """Group one occupation's rows into {element_type: {scale_name: [competency, ...]}}.
+
+    Lists are ordered by ``data_value`` descending within each scale.
+    """
+    if df.empty:
+        return {}
+    columns = _sorted_columns(df.assign(onet_soc_code=''))
+    return _group_competencies(*columns)['']
+
+
+def structured_competencies_from_rows(rows) -> Dict[str, Any]:
+    """Like ``build_structured_competencies``, for ``(element_name, element_type, scale_name,
+    data_value, element_id, scale_id)`` rows already in ``element_type, scale_name,
+    data_value DESC`` order (e.g. straight from an async driver, without pandas).
+    """
+    if not rows:
+        return {}
+    names, element_types, scale_names, values, element_ids, scale_ids = zip(*rows)
+    # NUMERIC columns arrive as Decimal; pandas would have coerced them to float
+    values = [float(value) if value is not None else None for value in values]
+    return _group_competencies(
+        [''] * len(rows), element_types, scale_names, names, values, element_ids, scale_ids
+    )['']
+
+
+class CompetencyProfileStore:
+    """Precomputed, already grouped and sorted competency profiles per occupation.
+
+    Built once from ``job_competencies`` (the data only changes at ingest) and
+    held in memory, so competency lookups need no database round-trip. The
+    profiles are shared between requests and must be treated as read-only.
+    ``data_generation`` records the ingest generation they were built from.
+    """
+
+    def __init__(self, profiles: Dict[str, Dict[str, Any]], data_generation: Optional[str] = None):
+        self.profiles = profiles
+        self.data_generation = data_generation
+
+    def __len__(self) -> int:
+        return len(self.profiles)
+
+    def __contains__(self, onet_soc_code: str) -> bool:
+        return onet_soc_code in self.profiles
+
+    def get(self, onet_soc_code: str) -> Optional[Dict[str, Any]]:
+        """Structured competencies for ``onet_soc_code``, or None if unknown"""
+        return self.profiles.get(onet_soc_code)
+
+    @classmethod
+    def from_dataframe(cls, df: 'pd.DataFrame', data_generation: Optional[str] = None) -> 'CompetencyProfileStore':
+        """Build profiles for every occupation in a ``PROFILE_QUERY``-shaped frame"""
+        return cls(_group_competencies(*_sorted_columns(df)), data_generation)
+
+    def save(self, path: str):
+        """Write the profiles as gzipped JSON, replacing any previous file atomically"""
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        document = {
+            'format_version': PROFILE_FORMAT_VERSION,
+            'data_generation': self.data_generation,
+            'profiles': self.profiles
+        }
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json.gz')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+                json.dump(document, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> Optional['CompetencyProfileStore']:
+        """Load profiles written by ``save``, or return None if the file does not exist"""
+        if not os.path.exists(path):
+            return None
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            document = json.load(f)
+        if document.get('format_version') != PROFILE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported profile format version: {document.get('format_version')}")
+        return cls(document['profiles'], document.get('data_generation'))
@@ -0,0 +1,84 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+import numpy as np
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query: case-folded with whitespace collapsed"""
+    return _WHITESPACE.sub(' ', text).strip().casefold()
+
+
+class EmbeddingCache:
+    """Thread-safe LRU cache of query embeddings with TTL expiry.
+
+    Entries are evicted least-recently-used once ``max_size`` is reached, and
+    treated as missing once they are older than ``ttl_seconds`` (0 disables
+    expiry).
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the cached embedding for ``key``, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            embedding, stored_at = entry
+            if self.ttl_seconds and now - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, key: str, embedding: np.ndarray):
+        """Store ``embedding`` under ``key``, evicting the least recently used entry if full"""
+        # Cached arrays are shared between requests, so make them immutable
+        embedding = np.array(embedding, copy=True)
+        embedding.setflags(write=False)
+        with self._lock:
+            self._entries[key] = (embedding, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached embedding (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,121 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+from typing import Callable, List, Dict, Any, Optional
+import numpy as np
+
+
+class EncoderOverloaded(RuntimeError):
+    """Raised when the encoding queue is full and a request is shed"""
+
+
+class EncodingScheduler:
+    """Micro-batches query encodes submitted concurrently by request threads.
+
+    A single worker thread waits for the first queued text, keeps collecting
+    for up to ``batch_window_ms`` or until ``max_batch_size`` texts are pending,
+    then runs one ``encode_fn`` call for the whole batch and resolves each
+    caller's future. At most ``max_queue_depth`` texts may be waiting; beyond
+    that ``submit`` raises ``EncoderOverloaded`` so latency stays bounded.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], max_batch_size: int = 32,
+                 batch_window_ms: float = 3.0, max_queue_depth: int = 256):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window_ms / 1000.0
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queue_depth)
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.batches = 0
+        self.encoded = 0
+        self._worker = threading.Thread(target=self._run, name='encoding-scheduler', daemon=True)
+        self._worker.start()
+
+    def submit(self, texts: List[str]) -> List[Future]:
+        """Queue ``texts`` for encoding and return one future per text"""
+        futures = []
+        for text in texts:
+            future = Future()
+            try:
+                self._queue.put_nowait((text, future))
+            except queue.Full:
+                with self._stats_lock:
+                    self.rejected += 1
+                for pending in futures:
+                    pending.cancel()
+                raise EncoderOverloaded("Encoding queue is full; try again shortly")
+            futures.append(future)
+
+        with self._stats_lock:
+            self.submitted += len(texts)
+        return futures
+
+    def encode(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        """Encode ``texts`` through the shared batch and wait for the results.
+
+        ``timeout`` bounds the wait for all of ``texts`` together, not per text.
+        """
+        futures = self.submit(texts)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        try:
+            return np.stack([
+                future.result(timeout=max(deadline - time.monotonic(), 0) if deadline is not None else None)
+                for future in futures
+            ])
+        except TimeoutError:
+            for future in futures:
+                future.cancel()
+            raise EncoderOverloaded(f"Encoding did not complete within {timeout}s")
+
+    def _collect_batch(self) -> List[tuple]:
+        """Block for the first item, then gather more until the window closes or the batch is full"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            # Skip callers that gave up (cancelled) before their batch ran
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                embeddings = self.encode_fn([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+            with self._stats_lock:
+                self.batches += 1
+                self.encoded += len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, batch counts and load-shedding counters"""
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._queue.maxsize,
+                'max_batch_size': self.max_batch_size,
+                'batch_window_ms': self.batch_window * 1000.0,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'batches': self.batches,
+                'mean_batch_size': self.encoded / self.batches if self.batches else 0.0
+            }
@@ -0,0 +1,29 @@
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+# Request threads per sync worker; ignored by the ASGI worker (-k uvicorn.workers.UvicornWorker)
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+# Import the app (and load the model) once in the master; forked workers then
+# share those pages copy-on-write instead of each holding a private copy
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def when_ready(server):
+    """Load the model in the preloading master.
+
+    Only the weights are loaded here; no inference runs before the fork, so no
+    torch/OpenMP thread pool exists yet for the workers to inherit.
+    """
+    if server.cfg.preload_app:
+        import app
+        if app.model_load_mode != 'lazy':
+            app.vector_db.load_model()
+
+
+def post_worker_init(worker):
+    """Reset per-process state and warm the model up in each worker"""
+    import app
+    app.after_fork()
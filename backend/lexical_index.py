@@ -0,0 +1,194 @@
+import re
+import math
+from collections import Counter, defaultdict
+from typing import Hashable, Iterable, List, Dict, Any, Optional, Tuple
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Connectives that O*NET titles use freely ("Cooks, Restaurant", "... Except Special Education")
+STOPWORDS = frozenset(('a', 'an', 'and', 'or', 'of', 'the', 'in', 'for', 'to', 'all', 'other', 'except'))
+
+
+def _stem(word: str) -> str:
+    """Fold plurals so "Actuaries"/"actuary" and "Nurses"/"nurse" share a term"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased, plural-folded word tokens without stopwords"""
+    return [_stem(word) for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def trigrams(text: str) -> set:
+    """Character trigrams of the space-normalised, padded lower-case text"""
+    padded = f" {' '.join(_WORD.findall(text.lower()))} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[Hashable]], k: int = 60) -> List[Tuple[Hashable, float]]:
+    """Merge ranked key lists by summing ``1 / (k + rank)``; best first"""
+    scores: Dict[Hashable, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class _TrigramIndex:
+    """Inverted trigram index over short strings, scored with the Dice coefficient"""
+
+    def __init__(self, texts: List[str]):
+        postings = defaultdict(list)
+        self.sizes = np.zeros(len(texts), dtype=np.float32)
+        for i, text in enumerate(texts):
+            grams = trigrams(text)
+            self.sizes[i] = len(grams)
+            for gram in grams:
+                postings[gram].append(i)
+        self.postings = {gram: np.array(docs, dtype=np.int32) for gram, docs in postings.items()}
+
+    def similarities(self, text: str) -> np.ndarray:
+        """Dice similarity of ``text`` against every indexed string"""
+        grams = trigrams(text)
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not hits:
+            return np.zeros(len(self.sizes), dtype=np.float32)
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.sizes))
+        return 2.0 * shared / (len(grams) + self.sizes)
+
+
+class LexicalIndex:
+    """In-memory keyword index over occupation titles and descriptions.
+
+    Two rankings are fused for each query. BM25 runs over title and
+    description terms, with the title counted ``title_weight`` times.
+    Character-trigram similarity runs over the title alone, so typos and
+    partial titles still match. Query words missing from the vocabulary are
+    replaced by their closest indexed word (trigram similarity of at least
+    ``correction_similarity``) before BM25 scoring.
+
+    ``ids`` and ``metadata`` are the vector IDs and metadata of the dense
+    index (``title``, ``description``, ``onet_soc_code``, ...). Both
+    retrieval paths therefore produce the same records.
+    """
+
+    def __init__(self, ids: List[str], metadata: List[Dict[str, Any]], k1: float = 1.2, b: float = 0.75,
+                 title_weight: int = 3, correction_similarity: float = 0.6):
+        self.ids = list(ids)
+        self.positions = {vector_id: position for position, vector_id in enumerate(self.ids)}
+        self.metadata = list(metadata)
+        self.correction_similarity = correction_similarity
+        titles = [meta.get('title') or '' for meta in self.metadata]
+
+        # BM25: one (documents, weights) posting pair per term, weights fully precomputed
+        term_counts = []
+        for meta, title in zip(self.metadata, titles):
+            counts = Counter(tokenize(title) * title_weight)
+            counts.update(tokenize(meta.get('description') or ''))
+            term_counts.append(counts)
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) else 0.0
+        postings = defaultdict(lambda: ([], []))
+        for doc, counts in enumerate(term_counts):
+            norm = k1 * (1 - b + b * lengths[doc] / average_length) if average_length else k1
+            for term, tf in counts.items():
+                docs, weights = postings[term]
+                docs.append(doc)
+                weights.append(tf * (k1 + 1) / (tf + norm))
+        total = len(self.ids)
+        self.postings = {}
+        for term, (docs, weights) in postings.items():
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            self.postings[term] = (np.array(docs, dtype=np.int32), np.array(weights, dtype=np.float32) * idf)
+
+        # Titles whose terms equal the query's terms (in any order) are exact hits
+        self.exact_titles: Dict[frozenset, int] = {}
+        for doc, title in enumerate(titles):
+            self.exact_titles.setdefault(frozenset(tokenize(title)), doc)
+
+        self.titles = _TrigramIndex(titles)
+        self.vocabulary = sorted(self.postings)
+        self.words = _TrigramIndex(self.vocabulary)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _query_terms(self, query: str) -> List[str]:
+        """Query terms, with out-of-vocabulary words mapped to their closest indexed word"""
+        terms = []
+        for term in tokenize(query):
+            if term not in self.postings and len(term) >= 4:
+                similarities = self.words.similarities(term)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.correction_similarity:
+                    term = self.vocabulary[best]
+            terms.append(term)
+        return terms
+
+    def bm25_scores(self, terms: List[str]) -> np.ndarray:
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(terms):
+            posting = self.postings.get(term)
+            if posting is not None:
+                docs, weights = posting
+                scores[docs] += weights
+        return scores
+
+    def confident_match(self, query: str, min_similarity: float = 0.85, margin: float = 0.05) -> Optional[int]:
+        """Position of the occupation ``query`` names, or None if no title clearly matches.
+
+        A query matches when its terms equal a title's terms after spelling
+        correction. It also matches when its title trigram similarity is at
+        least ``min_similarity`` and beats the runner-up by ``margin``.
+        """
+        if not self.ids:
+            return None
+        terms = self._query_terms(query)
+        if terms:
+            exact = self.exact_titles.get(frozenset(terms))
+            if exact is not None:
+                return exact
+
+        similarities = self.titles.similarities(query)
+        if len(similarities) == 1:
+            return 0 if similarities[0] >= min_similarity else None
+        second, best = np.argpartition(similarities, -2)[-2:]
+        if similarities[best] >= min_similarity and similarities[best] - similarities[second] >= margin:
+            return int(best)
+        return None
+
+    def ranking(self, query: str, depth: int = 20, rrf_k: int = 60,
+                min_title_similarity: float = 0.3) -> Tuple[List[int], np.ndarray]:
+        """Positions ranked by the reciprocal-rank fusion of BM25 and title trigrams.
+
+        Each input ranking is cut to ``depth`` before fusion. The title
+        similarity of every occupation to ``query`` is returned alongside.
+        """
+        similarities = self.titles.similarities(query)
+        fused = reciprocal_rank_fusion([
+            self._top(self.bm25_scores(self._query_terms(query)), depth, 0.0),
+            self._top(similarities, depth, min_title_similarity)
+        ], rrf_k)
+        return [position for position, _ in fused], similarities
+
+    @staticmethod
+    def _top(scores: np.ndarray, depth: int, floor: float) -> List[int]:
+        candidates = np.flatnonzero(scores > floor)
+        if len(candidates) > depth:
+            candidates = candidates[np.argpartition(scores[candidates], -depth)[-depth:]]
+        # Stable on position so ties are ordered deterministically
+        return [int(i) for i in candidates[np.lexsort((candidates, -scores[candidates]))]]
+
+    def match(self, position: int, title_similarity: float) -> Dict[str, Any]:
+        """A Pinecone-style match for one occupation found only by this index.
+
+        ``score`` is None because no cosine similarity was computed. The
+        title trigram similarity is returned as ``lexical_score``.
+        """
+        return {'id': self.ids[position], 'score': None, 'lexical_score': title_similarity,
+                'metadata': self.metadata[position]}
@@ -0,0 +1,166 @@
+import os
+import time
+import random
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets; stages are often sub-millisecond
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Trace of the request being handled; None when tracing is off or the request was not sampled
+_current: ContextVar[Optional['Trace']] = ContextVar('request_trace', default=None)
+_NO_SPAN = nullcontext()
+
+
+class Trace:
+    """Time spent per named stage while handling one request"""
+
+    __slots__ = ('started_at', 'stages', '_lock')
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        # Batch queries may time stages from several threads at once
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value: each stage so far plus the elapsed total, in milliseconds"""
+        elapsed = time.perf_counter() - self.started_at
+        with self._lock:
+            stages = list(self.stages.items())
+        return ', '.join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages + [('total', elapsed)])
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, time.perf_counter() - self.start)
+
+
+def span(name: str):
+    """Context manager timing the enclosed block as stage ``name`` of the current request.
+
+    Outside a traced request (tracing disabled, request not sampled, or
+    background work) this is a shared no-op, so instrumented code costs one
+    context-variable lookup.
+    """
+    trace = _current.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus model"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{le}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {total}')
+        lines.append(f'{name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+class RequestTracer:
+    """Per-request stage timings, aggregated into latency histograms.
+
+    ``start`` opens a trace for the request being handled. It does nothing
+    when ``REQUEST_TRACING`` is off, and otherwise samples a fraction
+    ``TRACE_SAMPLE_RATE`` of requests. While a trace is open, ``span`` blocks
+    in the request path add their durations to it. ``finish`` closes it and
+    records the request duration and each stage's total in histograms, which
+    ``render`` exposes in the Prometheus text format. Histograms cover sampled
+    requests only and are per process.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('REQUEST_TRACING', 'true').lower() == 'true'
+        self.sample_rate = min(max(float(os.getenv('TRACE_SAMPLE_RATE', '1.0')), 0.0), 1.0)
+        self.stage_seconds: Dict[str, Histogram] = {}
+        self.request_seconds: Dict[Tuple[str, str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> Optional[Trace]:
+        """Open a trace for the current request, or return None when off or not sampled"""
+        if not self.enabled or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            _current.set(None)
+            return None
+        trace = Trace()
+        _current.set(trace)
+        return trace
+
+    def finish(self, trace: Trace, method: str, route: str, status: int):
+        """Close ``trace`` and record its request and stage durations"""
+        elapsed = time.perf_counter() - trace.started_at
+        if _current.get() is trace:
+            _current.set(None)
+        self._histogram(self.request_seconds, (method, route, str(status))).observe(elapsed)
+        for name, seconds in list(trace.stages.items()):
+            self._histogram(self.stage_seconds, name).observe(seconds)
+
+    def _histogram(self, histograms: Dict, key) -> Histogram:
+        histogram = histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = histograms.setdefault(key, Histogram())
+        return histogram
+
+    def render(self) -> str:
+        """All histograms in the Prometheus text exposition format"""
+        lines = [
+            '# HELP competency_request_duration_seconds Time to handle a request, until the response is closed.',
+            '# TYPE competency_request_duration_seconds histogram'
+        ]
+        for (method, route, status), histogram in sorted(self.request_seconds.items()):
+            lines += histogram.samples(
+                'competency_request_duration_seconds',
+                f'method="{method}",route="{_escape(route)}",status="{status}"'
+            )
+        lines += [
+            '# HELP competency_stage_duration_seconds Time per request spent in each stage of the request path.',
+            '# TYPE competency_stage_duration_seconds histogram'
+        ]
+        for name, histogram in sorted(self.stage_seconds.items()):
+            lines += histogram.samples('competency_stage_duration_seconds', f'stage="{_escape(name)}"')
+        return '\n'.join(lines) + '\n'
+
+    def stats(self) -> Dict[str, object]:
+        return {'enabled': self.enabled, 'sample_rate': self.sample_rate}
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,40 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+
+class StartupTimer:
+    """Wall-clock durations of the named start-up phases of one process.
+
+    Phases are recorded in the order they finish; ``report`` gives the
+    breakdown used by ``/ready`` and ``scripts/startup_report.py`` to track
+    cold-start regressions.
+    """
+
+    def __init__(self, started_at: Optional[float] = None):
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self._phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self._phases[name] = self._phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as phase ``name``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def report(self) -> Dict[str, Any]:
+        """Phase durations in milliseconds plus time elapsed since the timer started"""
+        with self._lock:
+            phases = {name: round(seconds * 1000, 1) for name, seconds in self._phases.items()}
+        return {
+            'phases_ms': phases,
+            'since_start_ms': round((time.perf_counter() - self.started_at) * 1000, 1)
+        }
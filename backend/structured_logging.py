@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+# Listener thread that formats and writes every record; None until configure_logging runs
+_listener: Optional[QueueListener] = None
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Enqueues records as they are, so message formatting happens on the listener thread.
+
+    The queue never leaves the process, so records need no pickling.
+    Arguments must not be mutated after logging, which holds for the
+    summaries logged by the request path.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class StructuredFormatter(logging.Formatter):
+    """The usual log line plus a record's ``fields`` extra, as key=value pairs or one JSON object per line.
+
+        logger.info("Chat reply", extra={"fields": {"onet_soc_code": code, "elapsed_ms": 12.5}})
+    """
+
+    def __init__(self, json_lines: bool = False):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+        self.json_lines = json_lines
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, 'fields', None) or {}
+        if self.json_lines:
+            entry = {
+                'time': self.formatTime(record),
+                'level': record.levelname,
+                'logger': record.name,
+                'message': record.getMessage(),
+                **fields
+            }
+            if record.exc_info:
+                entry['exception'] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str)
+
+        line = super().format(record)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+def configure_logging():
+    """Send all logging through an in-memory queue drained by a listener thread.
+
+    Request threads only enqueue records. Formatting and the write to stderr
+    happen on the listener thread. ``LOG_LEVEL`` (default INFO) sets the root
+    level, and ``LOG_FORMAT=json`` switches to one JSON object per line.
+    Calling this again does nothing.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(StructuredFormatter(json_lines=os.getenv('LOG_FORMAT', 'text').lower() == 'json'))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [_DeferredQueueHandler(log_queue)]
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def restart_logging_after_fork():
+    """Replace the listener inherited over ``fork`` with one owned by this worker.
+
+    Threads do not survive ``fork``, so the inherited listener object is
+    stopped (its thread is already dead, so this returns at once). Its queue
+    is emptied without writing: those records were queued before the fork,
+    and the parent's listener writes them. The worker then logs through a
+    fresh queue and its own listener thread.
+    """
+    global _listener
+    if _listener is None:
+        return
+    inherited = _listener
+    inherited.stop()
+    while True:
+        try:
+            inherited.queue.get_nowait()
+        except queue.Empty:
+            break
+
+    log_queue = queue.SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, _DeferredQueueHandler):
+            handler.queue = log_queue
+    _listener = QueueListener(log_queue, *inherited.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Write out queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,219 @@
+import json
+import time
+import queue
+import random
+import threading
+from typing import Callable, List, Dict, Any, Optional
+
+# Pinecone rejects upsert requests above 2 MB or 1000 vectors; stay under both
+MAX_REQUEST_BYTES = 2 * 1024 * 1024
+MAX_REQUEST_VECTORS = 1000
+
+
+class UpsertFailed(RuntimeError):
+    """Raised when a batch could not be written after all retries"""
+
+
+# HTTP statuses worth retrying: request timeout, rate limiting and server-side errors
+TRANSIENT_STATUSES = {408, 429}
+
+# Network failures from the HTTP stacks behind the Pinecone clients (urllib3, httpx), matched by
+# class name so neither has to be imported here
+TRANSIENT_ERROR_NAMES = {
+    'MaxRetryError', 'ProtocolError', 'ReadTimeoutError', 'ConnectTimeoutError', 'NewConnectionError',
+    'TimeoutException', 'ConnectError', 'ReadError', 'WriteError', 'RemoteProtocolError', 'PoolTimeout'
+}
+
+
+def is_transient_error(e: Exception) -> bool:
+    """Whether an upsert failure may succeed on retry.
+
+    Errors carrying an HTTP status (Pinecone ``ApiException``, ``httpx``
+    status errors) are transient for 408, 429 and 5xx. Other 4xx errors are
+    permanent, for example a dimension mismatch or an invalid API key.
+    Errors without a status are transient for timeouts and connection
+    failures only.
+    """
+    status = getattr(e, 'status', None)
+    if status is None:
+        status = getattr(getattr(e, 'response', None), 'status_code', None)
+    if isinstance(status, int):
+        return status in TRANSIENT_STATUSES or status >= 500
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(e).__mro__)
+
+
+# Upper bound on the JSON text of one float (e.g. "-0.012345678918552399,")
+FLOAT_JSON_BYTES = 24
+
+
+def vector_payload_bytes(vector: Dict[str, Any]) -> int:
+    """Upper-bound serialised size of one ``{'id', 'values', 'metadata'}`` vector.
+
+    Only the metadata is serialised; the values are costed per float, which
+    keeps the estimate cheap enough to run for every vector.
+    """
+    metadata = json.dumps(vector.get('metadata', {}), separators=(',', ':'), default=str)
+    return 64 + len(vector['id']) + len(metadata) + FLOAT_JSON_BYTES * len(vector['values'])
+
+
+class UpsertPipeline:
+    """Streams vectors to an index through a bounded queue and concurrent writers.
+
+    ``put`` packs vectors into batches that stay under ``max_batch_bytes`` and
+    ``max_batch_size`` and hands them to ``workers`` threads over a queue of at
+    most ``queue_depth`` batches. When the writers fall behind, ``put``
+    blocks, so memory stays bounded however large the corpus is. Batches that
+    fail with a transient error (``is_transient_error``) are retried with
+    jittered exponential backoff. Other errors fail the batch at once. Once a
+    batch has failed, further ``put`` calls raise ``UpsertFailed`` so the
+    producer stops early. ``close`` flushes, waits for the writers and raises
+    if anything failed.
+
+        with UpsertPipeline(index, workers=4) as pipeline:
+            for vector in vectors:
+                pipeline.put(vector)
+    """
+
+    def __init__(self, index, workers: int = 4, max_batch_bytes: int = int(MAX_REQUEST_BYTES * 0.9),
+                 max_batch_size: int = 200, max_retries: int = 5, backoff_base: float = 0.5,
+                 backoff_max: float = 30.0, queue_depth: Optional[int] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.index = index
+        self.workers = max(1, workers)
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_size = min(max_batch_size, MAX_REQUEST_VECTORS)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(
+            maxsize=queue_depth or self.workers * 2
+        )
+        self._batch: List[Dict[str, Any]] = []
+        self._batch_bytes = 0
+        self._threads: List[threading.Thread] = []
+        self._failed = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._started_at = None
+        self._finished_at = None
+        self.vectors_queued = 0
+        self.vectors_upserted = 0
+        self.batches_upserted = 0
+        self.bytes_upserted = 0
+        self.retries = 0
+        self.failed_batches = 0
+        self.failed_vectors = 0
+        self.errors: List[str] = []
+
+    def __enter__(self) -> 'UpsertPipeline':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # The producer failed: stop writing and release the workers
+            self._failed.set()
+            self._shutdown()
+        return False
+
+    def start(self):
+        self._started_at = time.monotonic()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'upsert-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def put(self, vector: Dict[str, Any]):
+        """Add one vector, sending the current batch first if it would exceed the budget"""
+        if self._failed.is_set():
+            raise UpsertFailed(f"Upsert pipeline aborted: {self.errors[0] if self.errors else 'unknown error'}")
+        size = vector_payload_bytes(vector)
+        if self._batch and (self._batch_bytes + size > self.max_batch_bytes
+                            or len(self._batch) >= self.max_batch_size):
+            self._flush()
+        self._batch.append(vector)
+        self._batch_bytes += size
+        self.vectors_queued += 1
+
+    def _flush(self):
+        if self._batch:
+            self._queue.put((self._batch, self._batch_bytes))
+            self._batch = []
+            self._batch_bytes = 0
+
+    def close(self):
+        """Send the last batch, wait for every write and raise ``UpsertFailed`` on any failure"""
+        if not self._failed.is_set():
+            self._flush()
+        self._shutdown()
+        if self.failed_batches:
+            raise UpsertFailed(
+                f"{self.failed_batches} batches ({self.failed_vectors} vectors) could not be upserted: "
+                f"{self.errors[0]}"
+            )
+
+    def _shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._finished_at = time.monotonic()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, size = item
+            if self._failed.is_set():
+                # Already failing: drop queued work instead of writing it
+                with self._stats_lock:
+                    self.failed_vectors += len(batch)
+                continue
+            self._upsert_with_retry(batch, size)
+
+    def _upsert_with_retry(self, batch: List[Dict[str, Any]], size: int):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.index.upsert(vectors=batch)
+                with self._stats_lock:
+                    self.vectors_upserted += len(batch)
+                    self.batches_upserted += 1
+                    self.bytes_upserted += size
+                return
+            except Exception as e:
+                if attempt == self.max_retries or self._failed.is_set() or not is_transient_error(e):
+                    with self._stats_lock:
+                        self.failed_batches += 1
+                        self.failed_vectors += len(batch)
+                        self.errors.append(str(e))
+                    self._failed.set()
+                    print(f"Upsert of {len(batch)} vectors failed after {attempt + 1} attempts: {e}")
+                    return
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                with self._stats_lock:
+                    self.retries += 1
+                self._sleep(random.uniform(delay / 2, delay))
+
+    def stats(self) -> Dict[str, Any]:
+        """Throughput and failure counters for the pipeline"""
+        end = self._finished_at or time.monotonic()
+        elapsed = end - self._started_at if self._started_at else 0.0
+        with self._stats_lock:
+            return {
+                'workers': self.workers,
+                'vectors_queued': self.vectors_queued,
+                'vectors_upserted': self.vectors_upserted,
+                'batches_upserted': self.batches_upserted,
+                'bytes_upserted': self.bytes_upserted,
+                'retries': self.retries,
+                'failed_batches': self.failed_batches,
+                'failed_vectors': self.failed_vectors,
+                'elapsed_seconds': round(elapsed, 3),
+                'vectors_per_second': round(self.vectors_upserted / elapsed, 1) if elapsed else None
+            }
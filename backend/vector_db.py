@@ -1,67 +1,688 @@
 import os
+import time
+import threading
 import numpy as np
-import pandas as pd
-from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone, ServerlessSpec
-from typing import List, Dict, Any
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Dict, Any, Optional, Tuple
 import json
-from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
+from vector_index import LocalVectorIndex, save_snapshot, load_snapshot, snapshot_version, model_hash
+from embedding_cache import EmbeddingCache, normalize_query
+from encoding_scheduler import EncodingScheduler
+from analysis_cache import AnalysisCache
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from competency_framework import build_competency_framework, analysis_stages
+from request_tracing import span
+from upsert_pipeline import UpsertPipeline, MAX_REQUEST_BYTES
+from bulk_encoding import sentence_transformer_encoder, iter_encode_bulk, OnnxEncoder
+from competency_profiles import (
+    CompetencyProfileStore, PROFILE_QUERY, build_structured_competencies, build_job_descriptions
+)
+
+# torch/sentence-transformers, pinecone, pandas and SQLAlchemy are imported where
+# they are first needed, so importing this module (and answering /health) is cheap.
 
 # Load environment variables
 load_dotenv()
 
+# Bump when the vector ID/metadata layout changes so stale indexes are not attached
+INDEX_SCHEMA_VERSION = '1'
+
 class CompetencyVectorDB:
     def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.model_name = 'all-MiniLM-L6-v2'
+        # Loaded on first use (or by load_model/warm_up at start-up)
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.model_load_seconds = None
         self.pinecone_api_key = os.getenv('PINECONE_API_KEY')
         self.pinecone_environment = os.getenv('PINECONE_ENVIRONMENT', 'us-west1-gcp-free')
         self.index_name = 'competency-model'
+        self.index_backend = os.getenv('VECTOR_INDEX_BACKEND', 'pinecone').lower()
+        self.embedding_dimension = 384  # all-MiniLM-L6-v2 embedding dimension
+        self.snapshot_dir = os.getenv('EMBEDDING_SNAPSHOT_DIR', '../data/embeddings')
         self.database_url = os.getenv('DATABASE_URL')
+        self.profile_path = os.getenv('COMPETENCY_PROFILE_PATH', '../data/competency_profiles.json.gz')
+        self.profile_store = None
+        # Modification time of profile_path when this worker last loaded or saved the store
+        self._profile_file_version = None
+        # Cleaned job_competencies written by scripts/ingest_data.py; used instead of PostgreSQL
+        # when present and stamped with the ingest generation currently live in the database
+        self.competencies_parquet_path = os.getenv('COMPETENCIES_PARQUET_PATH', '../data/cache/job_competencies.parquet')
+
+        # Shared SQLAlchemy engine, created on first use
+        self.db_pool_size = int(os.getenv('DB_POOL_SIZE', '5'))
+        self.db_max_overflow = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+        self.db_pool_timeout = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+        self.db_pool_recycle = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+        self.db_pool_pre_ping = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+        self._engine = None
+        self._engine_lock = threading.Lock()
+        self.index_startup_mode = os.getenv('VECTOR_INDEX_STARTUP', 'attach').lower()
         self.pc = None
         self.index = None
+        self.active_index_name = None
+        self._rebuild_lock = threading.Lock()
+        # Other workers' index switches and snapshots are picked up by refresh_if_stale,
+        # checked at most every INDEX_REFRESH_INTERVAL seconds. Replaced Pinecone
+        # generations are deleted INDEX_RETIRE_GRACE seconds after they stop serving
+        self.index_refresh_interval = float(os.getenv('INDEX_REFRESH_INTERVAL', '5'))
+        self.index_retire_grace = float(os.getenv('INDEX_RETIRE_GRACE', '600'))
+        self.active_pointer_path = os.path.join(self.snapshot_dir, 'active-index.json')
+        self._active_pointer_version = None
+        # initialize_index has just read the current state, so the first check can wait an interval
+        self._next_refresh_check = time.monotonic() + self.index_refresh_interval
+        self._refresh_lock = threading.Lock()
+        # Changes whenever the vectors/competency data being served change (see data_generation)
+        self._data_version = None
+        # Ingest generation of the competency data read per request when there is no profile store
+        self._competency_generation = None
+
+        # Query embedding cache (EMBEDDING_CACHE_SIZE=0 disables it)
+        cache_size = int(os.getenv('EMBEDDING_CACHE_SIZE', '10000'))
+        cache_ttl = float(os.getenv('EMBEDDING_CACHE_TTL', '3600'))
+        self.embedding_cache = EmbeddingCache(cache_size, cache_ttl) if cache_size > 0 else None
+
+        # Bulk (index build) encoding: 'torch' with an optional process pool, or int8 'onnx'.
+        # Builds can run inside serving workers, so the process pool (one model copy per
+        # process) is opt-in; the default encodes in-process
+        self.bulk_encoder = os.getenv('BULK_ENCODER', 'torch').lower()
+        self.bulk_batch_size = int(os.getenv('BULK_ENCODE_BATCH_SIZE', '64'))
+        self.bulk_processes = int(os.getenv('BULK_ENCODE_PROCESSES', '1'))
+        self.bulk_chunk_size = int(os.getenv('BULK_ENCODE_CHUNK_SIZE', '512'))  # texts per progress update
+        self.onnx_model_path = os.getenv('ONNX_MODEL_PATH', '../data/models/all-MiniLM-L6-v2-int8.onnx')
+        self._onnx_encoder = None
+
+        # Index writes: concurrent upsert workers, batches sized to a payload budget
+        self.upsert_workers = int(os.getenv('UPSERT_WORKERS', '4'))
+        self.upsert_max_batch_bytes = int(os.getenv('UPSERT_MAX_BATCH_BYTES', str(int(MAX_REQUEST_BYTES * 0.9))))
+        self.upsert_max_batch_size = int(os.getenv('UPSERT_MAX_BATCH_SIZE', '200'))
+        self.upsert_max_retries = int(os.getenv('UPSERT_MAX_RETRIES', '5'))
+        self.upsert_backoff_base = float(os.getenv('UPSERT_BACKOFF_BASE', '0.5'))
+        self.last_upsert_stats = None
+
+        # Hybrid retrieval: a lexical index over the occupation metadata answers
+        # confident title matches without encoding and is fused with dense results
+        # otherwise (LEXICAL_SEARCH=false searches dense vectors only)
+        self.lexical_search = os.getenv('LEXICAL_SEARCH', 'true').lower() == 'true'
+        self.lexical_confidence = float(os.getenv('LEXICAL_CONFIDENCE', '0.85'))
+        self.hybrid_candidates = int(os.getenv('HYBRID_CANDIDATES', '20'))
+        self.rrf_k = int(os.getenv('RRF_K', '60'))
+        self.lexical_index = None
+        # Concurrent single queries per batch when the index has no query_batch (e.g. Pinecone)
+        self.batch_query_workers = int(os.getenv('BATCH_QUERY_WORKERS', '8'))
+        self.retrieval_counts = {'lexical': 0, 'hybrid': 0, 'dense': 0}
+        self._retrieval_lock = threading.Lock()
+
+        # Micro-batching of query encodes across concurrent requests
+        # (the worker thread is started on first use so it is never lost to a fork)
+        self.encode_timeout = float(os.getenv('ENCODE_TIMEOUT', '10'))
+        self.encode_batching = os.getenv('ENCODE_BATCHING', 'true').lower() == 'true'
+        self.encode_max_batch = int(os.getenv('ENCODE_MAX_BATCH', '32'))
+        self.encode_batch_window_ms = float(os.getenv('ENCODE_BATCH_WINDOW_MS', '3'))
+        self.encode_queue_depth = int(os.getenv('ENCODE_QUEUE_DEPTH', '256'))
+        self.encoding_scheduler = None
+        self._scheduler_lock = threading.Lock()
+
+    @property
+    def model(self):
+        """The SentenceTransformer, loaded on first access"""
+        if self._model is None:
+            self.load_model()
+        return self._model
+
+    @property
+    def model_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def data_generation(self) -> str:
+        """Token identifying the index and data currently served; derived caches key on it.
+
+        It covers the competency data as well as the vectors, so a re-ingest
+        that changes competency values but no embedding text still changes it.
+        """
+        store = self.profile_store
+        competencies = store.data_generation if store is not None else self._competency_generation
+        return f"{self.active_index_name or self.index_backend}:{self._data_version or 'none'}:{competencies or 'none'}"
+
+    def _refresh_competency_generation(self):
+        """Re-read the ingest generation that per-request competency queries see (no profile store)"""
+        if self.profile_store is not None:
+            return
+        try:
+            self._competency_generation = self.competency_data_generation()
+        except Exception as e:
+            print(f"Could not read the ingest generation of the competency data: {e}")
+
+    def _refresh_data_generation(self):
+        """Pick up the current snapshot version, rebuilding the lexical index when it changed"""
+        version = snapshot_version(self.snapshot_dir, self.model_name)
+        if self.lexical_search and (version != self._data_version or self.lexical_index is None):
+            self.lexical_index = self._build_lexical_index()
+        self._data_version = version
+
+    def index_refresh_due(self) -> bool:
+        return time.monotonic() >= self._next_refresh_check and not self._rebuild_lock.locked()
+
+    def refresh_if_stale(self):
+        """Switch to the index, snapshot and competency profiles another worker has made current.
+
+        Builds run in one gunicorn worker; the others notice through the
+        filesystem. The local backend reloads the embedding snapshot when its
+        version changes. The Pinecone backend re-attaches when the active-index
+        pointer written by a blue/green rebuild names another generation. The
+        competency profiles are reloaded when their file is replaced. Costs a
+        few ``stat`` calls, at most every INDEX_REFRESH_INTERVAL seconds.
+        """
+        if not self.index_refresh_due() or not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_refresh_check = time.monotonic() + self.index_refresh_interval
+            if self.index_backend == 'local':
+                if snapshot_version(self.snapshot_dir, self.model_name) != self._data_version:
+                    print("Embedding snapshot changed; reloading the local vector index")
+                    self.initialize_local_index()
+            elif self.pc is not None:
+                pointer_version = self._file_version(self.active_pointer_path)
+                if pointer_version != self._active_pointer_version:
+                    self._active_pointer_version = pointer_version
+                    name = self._read_active_pointer().get('active')
+                    if name and name != self.active_index_name:
+                        print(f"Switching to Pinecone index {name}, activated by another worker")
+                        self.index, self.active_index_name = self.pc.Index(name), name
+            self._refresh_data_generation()
+            self._reload_profiles_if_changed()
+            self._refresh_competency_generation()
+        except Exception as e:
+            print(f"Error refreshing the vector index: {e}")
+        finally:
+            self._refresh_lock.release()
+
+    @staticmethod
+    def _file_version(path: str) -> Optional[str]:
+        try:
+            return str(os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+    def _read_active_pointer(self) -> Dict[str, Any]:
+        """The active-index pointer: ``{'active': name, 'switched_at': ..., 'retired': {name: retired_at}}``"""
+        try:
+            with open(self.active_pointer_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            print(f"Ignoring unreadable active-index pointer {self.active_pointer_path}: {e}")
+            return {}
+
+    def _write_active_pointer(self, pointer: Dict[str, Any]):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        tmp_path = f"{self.active_pointer_path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(pointer, f)
+        os.replace(tmp_path, self.active_pointer_path)
+        self._active_pointer_version = self._file_version(self.active_pointer_path)
+
+    def _build_lexical_index(self) -> Optional[LexicalIndex]:
+        """Lexical index over the occupations in the embedding snapshot, or None without one"""
+        try:
+            snapshot = load_snapshot(self.snapshot_dir, self.model_name, mmap=True)
+            if snapshot is None:
+                print("No embedding snapshot found; searching dense vectors only")
+                return None
+            _, ids, metadata, _ = snapshot
+            start = time.perf_counter()
+            index = LexicalIndex(ids, metadata)
+            print(f"Built lexical index over {len(index)} occupations in {time.perf_counter() - start:.2f}s")
+            return index
+        except Exception as e:
+            print(f"Lexical index unavailable, searching dense vectors only: {e}")
+            return None
+
+    def load_model(self):
+        """Import sentence-transformers and load the embedding model, once per process"""
+        if self._model is not None:
+            return
+        with self._model_lock:
+            if self._model is None:
+                start = time.perf_counter()
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name)
+                self.model_load_seconds = time.perf_counter() - start
+                print(f"Loaded embedding model {self.model_name} in {self.model_load_seconds:.2f}s")
+
+    def warm_up(self):
+        """Load the model and run one encode so the first request pays no lazy-initialisation cost"""
+        self.load_model()
+        self._model.encode(['warm-up'])
+
+    def after_fork(self):
+        """Drop state that must not be shared with a parent process (e.g. gunicorn's preloading master).
+
+        Pooled database connections are discarded without closing them (they
+        belong to the parent), and the Pinecone client is recreated so workers
+        do not share its HTTP connections. The loaded model and memory-mapped
+        snapshot stay shared copy-on-write.
+        """
+        if self._engine is not None:
+            self._engine.dispose(close=False)
+        if self.pc is not None and self.active_index_name:
+            from pinecone import Pinecone
+            self.pc = Pinecone(api_key=self.pinecone_api_key)
+            self.index = self.pc.Index(self.active_index_name)
+
+    def initialize_index(self):
+        """Initialize the vector index selected by VECTOR_INDEX_BACKEND ('pinecone' or 'local').
+
+        VECTOR_INDEX_STARTUP=attach (default) reuses an existing index;
+        'recreate' restores the old drop-and-create behaviour.
+        """
+        if self.index_backend == 'local':
+            self.initialize_local_index()
+        elif self.index_backend == 'pinecone':
+            self.initialize_pinecone(recreate=self.index_startup_mode == 'recreate')
+        else:
+            raise ValueError(f"Unknown VECTOR_INDEX_BACKEND: {self.index_backend}")
+        self._refresh_data_generation()
+
+    def initialize_local_index(self):
+        """Initialize an in-process vector index (no network round-trip per query).
+
+        If an embedding snapshot exists it is memory-mapped, so start-up costs a
+        file open and every worker shares one page-cached copy of the matrix.
+        """
+        snapshot = load_snapshot(self.snapshot_dir, self.model_name, mmap=True)
+        if snapshot is not None:
+            matrix, ids, metadata, document = snapshot
+            self.index = LocalVectorIndex.from_arrays(matrix, ids, metadata)
+            print(f"Loaded embedding snapshot with {len(ids)} vectors (created {document['created_at']})")
+        else:
+            self.index = LocalVectorIndex(dimension=self.embedding_dimension)
+            print("No embedding snapshot found; local vector index starts empty")
+        print("Local vector index initialized successfully")
         
-    def initialize_pinecone(self):
-        """Initialize Pinecone vector database, dropping and recreating if it exists."""
+    def _index_tags(self) -> Dict[str, str]:
+        """Tags identifying which model/schema produced the vectors in an index"""
+        return {'model': model_hash(self.model_name), 'schema': INDEX_SCHEMA_VERSION}
+
+    def _create_pinecone_index(self, name: str):
+        """Create a tagged serverless Pinecone index and wait until it is ready"""
+        from pinecone import ServerlessSpec
+
+        print(f"Creating new Pinecone index: {name}")
+        self.pc.create_index(
+            name=name,
+            dimension=self.embedding_dimension,
+            metric='cosine',
+            spec=ServerlessSpec(
+                cloud='aws',  # or 'gcp' depending on your preference
+                region='us-east-1'  # adjust region as needed
+            ),
+            tags=self._index_tags()
+        )
+        while not self.pc.describe_index(name).status['ready']:
+            time.sleep(1)
+
+    def _pinecone_generations(self) -> List[str]:
+        """Names of this service's Pinecone indexes, oldest first"""
+        names = self.pc.list_indexes().names()
+        generations = sorted(name for name in names if name.startswith(f"{self.index_name}-g"))
+        if self.index_name in names:
+            generations.insert(0, self.index_name)
+        return generations
+
+    def _mark_build_complete(self, name: str):
+        """Tag a filled generation so start-up without a pointer file can tell it from a partial build"""
         try:
+            self.pc.configure_index(name, tags={**self._index_tags(), 'build': 'complete'})
+        except Exception as e:
+            print(f"Warning: could not tag Pinecone index {name} as complete: {e}")
+
+    def _completed_generation(self, generations: List[str]) -> Optional[str]:
+        """The newest generation tagged as completely built, else the legacy base index, else None"""
+        for name in reversed(generations):
+            if name == self.index_name:
+                return name
+            tags = getattr(self.pc.describe_index(name), 'tags', None) or {}
+            if tags.get('build') == 'complete':
+                return name
+        return None
+
+    def _check_pinecone_index(self, name: str):
+        """Raise if an existing index cannot serve queries embedded with this model"""
+        description = self.pc.describe_index(name)
+        if description.dimension != self.embedding_dimension:
+            raise ValueError(
+                f"Pinecone index {name} has dimension {description.dimension}, "
+                f"expected {self.embedding_dimension}"
+            )
+        if description.metric != 'cosine':
+            raise ValueError(f"Pinecone index {name} uses metric {description.metric}, expected cosine")
+
+        tags = getattr(description, 'tags', None) or {}
+        expected = self._index_tags()
+        if not tags:
+            print(f"Warning: Pinecone index {name} has no model tag; assuming it matches {self.model_name}")
+        elif any(tags.get(key) != value for key, value in expected.items()):
+            raise ValueError(
+                f"Pinecone index {name} was built with tags {dict(tags)}, expected {expected}. "
+                f"Rebuild it with VECTOR_INDEX_STARTUP=recreate or a blue/green rebuild."
+            )
+
+    def initialize_pinecone(self, recreate: bool = False):
+        """Attach to the active Pinecone index, creating one only if none is usable.
+
+        The active index is the generation named by the active-index pointer.
+        Without a pointer it is the newest generation whose build completed, or
+        the legacy base index; generations still being filled, or whose build
+        failed, are never attached.
+
+        With ``recreate`` the index is dropped and created empty instead, which
+        loses every vector until ``create_job_competency_vectors`` is run again.
+        """
+        try:
+            from pinecone import Pinecone
+
             # Initialize Pinecone client
             self.pc = Pinecone(api_key=self.pinecone_api_key)
-            
-            # Check if index exists and delete it for a clean start
-            existing_indexes = self.pc.list_indexes().names()
-            if self.index_name in existing_indexes:
-                print(f"Deleting existing Pinecone index: {self.index_name}")
-                self.pc.delete_index(self.index_name)
-                print(f"Index {self.index_name} deleted.")
-            
-            # Create index with ServerlessSpec
-            print(f"Creating new Pinecone index: {self.index_name}")
-            self.pc.create_index(
-                name=self.index_name,
-                dimension=384,  # all-MiniLM-L6-v2 embedding dimension
-                metric='cosine',
-                spec=ServerlessSpec(
-                    cloud='aws',  # or 'gcp' depending on your preference
-                    region='us-east-1'  # adjust region as needed
+
+            generations = self._pinecone_generations()
+            if recreate:
+                for name in generations:
+                    print(f"Deleting existing Pinecone index: {name}")
+                    self.pc.delete_index(name)
+                generations = []
+
+            # Prefer the generation a blue/green rebuild last switched to: a newer
+            # one may still be filling
+            self._active_pointer_version = self._file_version(self.active_pointer_path)
+            pointer = self._read_active_pointer().get('active')
+            name = pointer if pointer in generations else None
+            if name is None and generations:
+                print(
+                    f"Warning: no active-index pointer names an existing index ({self.active_pointer_path}); "
+                    f"attaching to the newest completely built Pinecone index"
                 )
-            )
-            
-            self.index = self.pc.Index(self.index_name)
+                name = self._completed_generation(generations)
+            if name is not None:
+                self.active_index_name = name
+                self._check_pinecone_index(self.active_index_name)
+                print(f"Attaching to existing Pinecone index: {self.active_index_name}")
+            else:
+                self.active_index_name = self.index_name
+                self._create_pinecone_index(self.active_index_name)
+
+            self.index = self.pc.Index(self.active_index_name)
             print("Pinecone initialized successfully")
             
         except Exception as e:
             print(f"Error initializing Pinecone: {e}")
             raise
+
+    def rebuild_index_blue_green(self, background: bool = True, progress: Optional[Callable[..., None]] = None):
+        """Rebuild all vectors into a fresh index and switch to it atomically.
+
+        Queries keep being served from the current index while the new one is
+        filled. For Pinecone the new index is a new generation
+        (``<index_name>-g<timestamp>``). The switch is recorded in the
+        active-index pointer file, which other workers follow (see
+        ``refresh_if_stale``). The generation being replaced is kept for
+        rollback; older ones are deleted once they have been out of service
+        for INDEX_RETIRE_GRACE seconds. For the local backend a new in-process
+        index is filled and the snapshot on disk is replaced, which other
+        workers reload.
+        Returns the worker thread when ``background`` is set. ``progress`` is
+        passed through to ``create_job_competency_vectors``.
+        """
+        if not self._rebuild_lock.acquire(blocking=False):
+            raise RuntimeError("A vector index rebuild is already in progress")
+
+        def run():
+            try:
+                if self.index_backend == 'local':
+                    target = LocalVectorIndex(dimension=self.embedding_dimension)
+                    self.create_job_competency_vectors(target_index=target, progress=progress)
+                    self.index = target
+                    self._refresh_data_generation()
+                else:
+                    previous = self._pinecone_generations()
+                    name = f"{self.index_name}-g{time.strftime('%Y%m%d%H%M%S', time.gmtime())}"
+                    self._create_pinecone_index(name)
+                    target = self.pc.Index(name)
+                    self.create_job_competency_vectors(target_index=target, progress=progress)
+                    self._mark_build_complete(name)
+
+                    # Single reference assignment: in-flight queries finish on the old index
+                    replaced = self.active_index_name
+                    self.index, self.active_index_name = target, name
+                    self._refresh_data_generation()
+                    self._retire_pinecone_generations(name, replaced, previous)
+                print("Blue/green index rebuild completed")
+            except Exception as e:
+                print(f"Error during blue/green index rebuild: {e}")
+                raise
+            finally:
+                self._rebuild_lock.release()
+
+        if not background:
+            run()
+            return None
+
+        thread = threading.Thread(target=run, name='index-rebuild', daemon=True)
+        thread.start()
+        return thread
     
-    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
-        """Generate embeddings for a list of texts"""
-        return self.model.encode(texts)
+    def _retire_pinecone_generations(self, active: str, replaced: Optional[str], previous: List[str]):
+        """Point other workers at ``active`` and delete generations retired long enough ago.
+
+        Retirement times live in the pointer file. A generation with no
+        recorded time is treated as retired now. ``replaced`` is always kept.
+        """
+        now = time.time()
+        retired = self._read_active_pointer().get('retired', {})
+        retired = {name: retired.get(name, now) for name in previous if name != active}
+        if replaced:
+            retired[replaced] = now
+        expired = [
+            name for name, retired_at in retired.items()
+            if name != replaced and now - retired_at >= self.index_retire_grace
+        ]
+        for name in expired:
+            del retired[name]
+        self._write_active_pointer({'active': active, 'switched_at': now, 'retired': retired})
+
+        for name in expired:
+            print(f"Deleting retired Pinecone index: {name}")
+            self.pc.delete_index(name)
+
+    def generate_embeddings(self, texts: List[str], use_cache: bool = True) -> np.ndarray:
+        """Generate embeddings for a list of texts.
+
+        Query embeddings go through the LRU/TTL cache, keyed on the normalised
+        text; all misses in one call are still encoded as a single batch.
+        ``use_cache=False`` encodes directly, bypassing both the cache and the
+        request-time encoding scheduler (index builds use ``encode_bulk``).
+        """
+        if not use_cache:
+            return self.model.encode(texts)
+        return self._cached_encode(texts, self._encode_queries)
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Embeddings for a large batch of queries (batch analysis).
+
+        Cached embeddings are reused. The rest are encoded in one direct call
+        of ``bulk_batch_size`` batches rather than through the request-time
+        scheduler, whose queue is sized for single queries. Results are not
+        written back, so a big batch does not evict interactive queries.
+        """
+        return self._cached_encode(
+            texts, lambda misses: self.model.encode(misses, batch_size=self.bulk_batch_size), store=False
+        )
+
+    def _cached_encode(self, texts: List[str], encode: Callable[[List[str]], np.ndarray],
+                       store: bool = True) -> np.ndarray:
+        if self.embedding_cache is None:
+            return encode(texts)
+
+        keys = [normalize_query(text) for text in texts]
+        found = {}
+        to_encode = {}
+        for key, text in zip(keys, texts):
+            if key in found or key in to_encode:
+                continue
+            embedding = self.embedding_cache.get(key)
+            if embedding is None:
+                to_encode[key] = text
+            else:
+                found[key] = embedding
+
+        if to_encode:
+            encoded = encode(list(to_encode.values()))
+            for key, embedding in zip(to_encode, encoded):
+                if store:
+                    self.embedding_cache.put(key, embedding)
+                found[key] = embedding
+
+        return np.stack([found[key] for key in keys])
+
+    @contextmanager
+    def _bulk_encode_fn(self):
+        """Yield the encode function selected by BULK_ENCODER, with any process pool kept open"""
+        if self.bulk_encoder == 'onnx':
+            if self._onnx_encoder is None:
+                self._onnx_encoder = OnnxEncoder(self.onnx_model_path)
+            yield lambda texts: self._onnx_encoder.encode(texts, batch_size=self.bulk_batch_size)
+        else:
+            with sentence_transformer_encoder(self.model, self.bulk_batch_size, self.bulk_processes) as encode_fn:
+                yield encode_fn
+
+    def iter_bulk_embeddings(self, texts: List[str]):
+        """Encode a whole corpus for an index build, using every CPU core.
+
+        Yields ``(indices into texts, embeddings)`` every BULK_ENCODE_CHUNK_SIZE
+        texts. Bypasses the query cache and scheduler. BULK_ENCODER=onnx uses
+        the int8-quantised ONNX Runtime model at ONNX_MODEL_PATH instead of PyTorch.
+        """
+        if not texts:
+            return
+        with self._bulk_encode_fn() as encode_fn:
+            yield from iter_encode_bulk(encode_fn, texts, self.bulk_chunk_size)
+
+    def encode_bulk(self, texts: List[str], progress: Optional[Callable[[int, int], None]] = None) -> np.ndarray:
+        """``iter_bulk_embeddings`` collected into one matrix; ``progress(done, total)`` follows each chunk"""
+        embeddings = np.zeros((len(texts), self.embedding_dimension), dtype=np.float32)
+        done = 0
+        for indices, chunk in self.iter_bulk_embeddings(texts):
+            embeddings[indices] = chunk
+            done += len(indices)
+            if progress is not None:
+                progress(done, len(texts))
+        return embeddings
+
+    def _upsert_pipeline(self, index) -> UpsertPipeline:
+        """Concurrent, retrying upsert pipeline configured from UPSERT_*"""
+        return UpsertPipeline(
+            index,
+            workers=self.upsert_workers,
+            max_batch_bytes=self.upsert_max_batch_bytes,
+            max_batch_size=self.upsert_max_batch_size,
+            max_retries=self.upsert_max_retries,
+            backoff_base=self.upsert_backoff_base
+        )
+
+    def get_encoding_scheduler(self) -> Optional[EncodingScheduler]:
+        """The shared query-encoding scheduler, started on first use; None if batching is disabled"""
+        if self.encode_batching and self.encoding_scheduler is None:
+            with self._scheduler_lock:
+                if self.encoding_scheduler is None:
+                    self.encoding_scheduler = EncodingScheduler(
+                        lambda texts: self.model.encode(texts),
+                        max_batch_size=self.encode_max_batch,
+                        batch_window_ms=self.encode_batch_window_ms,
+                        max_queue_depth=self.encode_queue_depth
+                    )
+        return self.encoding_scheduler
+
+    def _encode_queries(self, texts: List[str]) -> np.ndarray:
+        """Encode request-time queries, micro-batched with other requests when enabled"""
+        scheduler = self.get_encoding_scheduler()
+        if scheduler is None:
+            return self.model.encode(texts)
+        return scheduler.encode(texts, timeout=self.encode_timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Runtime statistics for the caches and pools owned by this instance"""
+        return {
+            'embedding_cache': self.embedding_cache.stats() if self.embedding_cache else None,
+            'encoding_scheduler': self.encoding_scheduler.stats() if self.encoding_scheduler else None,
+            'db_pool': self.get_pool_stats(),
+            'last_upsert': self.last_upsert_stats,
+            'retrieval': {
+                'lexical_index_size': len(self.lexical_index) if self.lexical_index is not None else None,
+                **self.retrieval_counts
+            },
+            'model': {
+                'name': self.model_name,
+                'loaded': self.model_loaded,
+                'load_seconds': self.model_load_seconds
+            }
+        }
     
-    def create_job_competency_vectors(self):
-        """Create vectors for job competencies from PostgreSQL data"""
+    def _load_previous_embeddings(self, index):
+        """Return ({onet_soc_code: (row, content_hash)}, matrix) from the last snapshot.
+
+        Returns None when there is nothing to diff against: no snapshot, or an
+        index that is empty (e.g. freshly created), which needs a full build.
+        """
+        snapshot = load_snapshot(self.snapshot_dir, self.model_name, mmap=True)
+        if snapshot is None:
+            return None
+        if index.describe_index_stats()['total_vector_count'] == 0:
+            return None
+
+        matrix, ids, metadata, document = snapshot
+        rows = {
+            meta['onet_soc_code']: (row, meta.get('content_hash'))
+            for row, meta in enumerate(metadata)
+        }
+        return rows, matrix
+
+    def _stale_vector_ids(self, index, ids: List[str]) -> List[str]:
+        """IDs of occupation vectors in ``index`` that are not in ``ids`` (dropped by a re-ingest).
+
+        The IDs are listed from the index itself. Indexes that cannot list
+        them (Pinecone pod indexes) fall back to the occupations in the last
+        embedding snapshot.
+        """
+        if index.describe_index_stats()['total_vector_count'] == 0:
+            return []
         try:
-            engine = create_engine(self.database_url)
-            
+            indexed = [vector_id for page in index.list(prefix='job_') for vector_id in page]
+        except Exception as e:
+            print(f"Could not list the vectors in the index ({e}); using the last snapshot's occupations")
+            snapshot = load_snapshot(self.snapshot_dir, self.model_name, mmap=True)
+            indexed = snapshot[1] if snapshot is not None else []
+        current = set(ids)
+        return [vector_id for vector_id in indexed if vector_id not in current]
+
+    def create_job_competency_vectors(self, incremental: bool = False, target_index=None,
+                                      progress: Optional[Callable[..., None]] = None):
+        """Create vectors for job competencies from PostgreSQL data.
+
+        With ``incremental`` only occupations whose generated description changed
+        since the last snapshot are re-embedded and upserted. In either mode,
+        vectors for occupations that have disappeared are deleted.
+        ``target_index`` writes to an index other than the one currently
+        serving queries.
+        ``progress(phase, processed, total)`` is called as the build advances
+        through the reading, embedding, upserting and profiles phases.
+        """
+        index = target_index if target_index is not None else self.index
+        report = progress or (lambda phase, processed=0, total=None: None)
+        try:
+            report('reading')
             # Query job competencies data (now includes element_type)
             query = """
             SELECT 
@@ -77,155 +698,508 @@ class CompetencyVectorDB:
             ORDER BY onet_soc_code, data_value DESC
             """
             
-            df = pd.read_sql(query, engine)
+            df = self._read_competencies(query, [
+                'onet_soc_code', 'title', 'description', 'element_name',
+                'element_type', 'scale_name', 'data_value'
+            ])
             
             # Group by job role and create comprehensive descriptions
-            job_descriptions = []
-            job_metadata = []
-            
-            for onet_code, group in df.groupby('onet_soc_code'):
-                title = group['title'].iloc[0]
-                description = group['description'].iloc[0]
-                
-                # Get top skills and abilities for this role for embedding
-                top_skills = group[group['element_type'] == 'Skill'].nlargest(5, 'data_value')
-                top_abilities = group[group['element_type'] == 'Ability'].nlargest(5, 'data_value')
-
-                skill_text = "; ".join([
-                    f"{row['element_name']} ({row['scale_name']}): {row['data_value']}"
-                    for _, row in top_skills.iterrows()
-                ])
-                ability_text = "; ".join([
-                    f"{row['element_name']} ({row['scale_name']}): {row['data_value']}"
-                    for _, row in top_abilities.iterrows()
-                ])
-                
-                # Create comprehensive job description
-                full_description = (
-                    f"Job Title: {title}. Description: {description}. "
-                    f"Key Skills: {skill_text}. "
-                    f"Key Abilities: {ability_text}"
-                )
-                
-                job_descriptions.append(full_description)
-                job_metadata.append({
-                    'onet_soc_code': onet_code,
-                    'title': title,
-                    'description': description,
-                    'competency_count': len(group)
-                })
-            
-            # Generate embeddings
-            embeddings = self.generate_embeddings(job_descriptions)
-            
-            # Prepare vectors for Pinecone
-            vectors = []
-            for i, (embedding, metadata) in enumerate(zip(embeddings, job_metadata)):
-                vectors.append({
-                    'id': f"job_{metadata['onet_soc_code']}",
-                    'values': embedding.tolist(),
-                    'metadata': {
-                        **metadata,
-                        'text': job_descriptions[i]
-                    }
-                })
-            
-            # Upsert to Pinecone in batches
+            job_descriptions, job_metadata = build_job_descriptions(df)
+            report('reading', len(job_metadata), len(job_metadata))
+
+            ids = [f"job_{metadata['onet_soc_code']}" for metadata in job_metadata]
+
+            # Work out which occupations actually need (re-)embedding
+            previous = self._load_previous_embeddings(index) if incremental else None
+            if previous is not None:
+                previous_rows, previous_matrix = previous
+                changed = [
+                    i for i, metadata in enumerate(job_metadata)
+                    if previous_rows.get(metadata['onet_soc_code'], (None, None))[1] != metadata['content_hash']
+                ]
+                current_codes = {metadata['onet_soc_code'] for metadata in job_metadata}
+                removed_ids = [f"job_{code}" for code in previous_rows if code not in current_codes]
+            else:
+                # A full build may still overwrite an index holding a previous ingest
+                changed = list(range(len(job_descriptions)))
+                removed_ids = self._stale_vector_ids(index, ids)
+
+            # Embed new or changed descriptions chunk by chunk, streaming each chunk
+            # straight into the concurrent upsert pipeline instead of building
+            # every request payload up front
+            embeddings = np.zeros((len(job_descriptions), self.embedding_dimension), dtype=np.float32)
+            report('embedding', 0, len(changed))
+            with self._upsert_pipeline(index) as pipeline:
+                embedded = 0
+                for positions, chunk in self.iter_bulk_embeddings([job_descriptions[i] for i in changed]):
+                    for position, embedding in zip(positions, chunk):
+                        i = changed[position]
+                        embeddings[i] = embedding
+                        pipeline.put({
+                            'id': ids[i],
+                            'values': embedding.tolist(),
+                            'metadata': {
+                                **job_metadata[i],
+                                'text': job_descriptions[i]
+                            }
+                        })
+                    embedded += len(positions)
+                    report('embedding', embedded, len(changed))
+                report('upserting', pipeline.vectors_upserted, len(changed))
+            self.last_upsert_stats = pipeline.stats()
+            report('upserting', pipeline.vectors_upserted, len(changed))
+
+            if previous is not None:
+                changed_set = set(changed)
+                for i, metadata in enumerate(job_metadata):
+                    if i not in changed_set:
+                        embeddings[i] = previous_matrix[previous_rows[metadata['onet_soc_code']][0]]
+
+            # Remove vectors for occupations that no longer exist
             batch_size = 100
-            for i in range(0, len(vectors), batch_size):
-                batch = vectors[i:i + batch_size]
-                self.index.upsert(vectors=batch)
-            
-            print(f"Successfully created {len(vectors)} job competency vectors")
-            return len(vectors)
+            for i in range(0, len(removed_ids), batch_size):
+                index.delete(ids=removed_ids[i:i + batch_size])
+
+            # Persist a snapshot once the index holds every vector, so an incremental
+            # run never skips occupations whose upsert failed
+            save_snapshot(self.snapshot_dir, self.model_name, ids, embeddings, job_metadata)
+
+            print(
+                f"Successfully created {len(changed)} job competency vectors "
+                f"({len(job_metadata) - len(changed)} unchanged, {len(removed_ids)} removed); "
+                f"upserts: {self.last_upsert_stats}"
+            )
+
+            # Competency data changed at ingest too; keep the profile store in step
+            report('profiles')
+            self.refresh_profile_store()
+            if target_index is None:
+                # Blue/green rebuilds refresh it when they switch indexes instead
+                self._refresh_data_generation()
+            report('done', len(job_metadata), len(job_metadata))
+            return len(job_metadata)
             
         except Exception as e:
             print(f"Error creating job competency vectors: {e}")
             raise
     
+    @staticmethod
+    def format_matches(matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Index query matches as the similar-job records returned by the API.
+
+        ``score`` is the embedding cosine similarity, or None for a job only
+        the lexical index found. ``lexical_score`` is the title trigram
+        similarity, or None when the lexical index did not score the job.
+        """
+        return [
+            {
+                'job_id': match['id'],
+                'score': match['score'],
+                'lexical_score': match.get('lexical_score'),
+                'title': match['metadata']['title'],
+                'description': match['metadata']['description'],
+                'onet_soc_code': match['metadata']['onet_soc_code'],
+                'competency_count': match['metadata']['competency_count']
+            }
+            for match in matches
+        ]
+
     def search_similar_jobs(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search for similar jobs based on query"""
+        """Search for similar jobs based on query.
+
+        A query that clearly names one occupation is answered from the lexical
+        index without encoding. Otherwise dense results are fused with the
+        lexical rankings (see ``merge_lexical``).
+        """
         try:
+            self.refresh_if_stale()
+            with span('lexical'):
+                similar_jobs = self.lexical_fast_path(query, top_k)
+            if similar_jobs is not None:
+                return similar_jobs
+
             # Generate embedding for query
-            query_embedding = self.generate_embeddings([query])[0]
+            with span('embedding'):
+                query_embedding = self.generate_embeddings([query])[0]
             
             # Search in Pinecone
-            results = self.index.query(
-                vector=query_embedding.tolist(),
-                top_k=top_k,
-                include_metadata=True
-            )
-            
-            # Format results
-            similar_jobs = []
-            for match in results['matches']:
-                similar_jobs.append({
-                    'job_id': match['id'],
-                    'score': match['score'],
-                    'title': match['metadata']['title'],
-                    'description': match['metadata']['description'],
-                    'onet_soc_code': match['metadata']['onet_soc_code'],
-                    'competency_count': match['metadata']['competency_count']
-                })
+            with span('index_query'):
+                results = self.index.query(
+                    vector=query_embedding.tolist(),
+                    top_k=self.dense_candidates(top_k),
+                    include_metadata=True
+                )
             
-            return similar_jobs
+            with span('lexical'):
+                return self.merge_lexical(query, results['matches'], top_k)
             
         except Exception as e:
             print(f"Error searching similar jobs: {e}")
             raise
+
+    def search_similar_jobs_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """``search_similar_jobs`` for many queries at once, results in query order.
+
+        Confident title matches take the lexical fast path. The remaining
+        queries are encoded together (``encode_batch``) and searched with one
+        ``query_batch`` call where the index supports it. Otherwise
+        ``batch_query_workers`` single queries run concurrently.
+        """
+        self.refresh_if_stale()
+        with span('lexical'):
+            results = [self.lexical_fast_path(query, top_k) for query in queries]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if pending:
+            with span('embedding'):
+                embeddings = self.encode_batch([queries[i] for i in pending])
+            with span('index_query'):
+                matches = self._query_index_batch(embeddings, self.dense_candidates(top_k))
+            with span('lexical'):
+                for i, dense_matches in zip(pending, matches):
+                    results[i] = self.merge_lexical(queries[i], dense_matches, top_k)
+        return results
+
+    def _query_index_batch(self, embeddings: np.ndarray, top_k: int) -> List[List[Dict[str, Any]]]:
+        index = self.index
+        if hasattr(index, 'query_batch'):
+            results = index.query_batch(embeddings, top_k=top_k, include_metadata=True)['results']
+            return [result['matches'] for result in results]
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        def query(embedding):
+            return index.query(vector=embedding.tolist(), top_k=top_k, include_metadata=True)['matches']
+
+        with ThreadPoolExecutor(self.batch_query_workers, thread_name_prefix='batch-query') as pool:
+            return list(pool.map(query, embeddings))
+
+    # Hybrid retrieval steps, shared with the async service (async_service.py)
+
+    def _count_retrieval(self, kind: str):
+        with self._retrieval_lock:
+            self.retrieval_counts[kind] += 1
+
+    def dense_candidates(self, top_k: int) -> int:
+        """How many dense matches to fetch: extra candidates give the fusion room to re-rank"""
+        return max(top_k, self.hybrid_candidates) if self.lexical_index is not None else top_k
+
+    def lexical_fast_path(self, query: str, top_k: int) -> Optional[List[Dict[str, Any]]]:
+        """Results for a query that confidently names an occupation, or None to search dense vectors.
+
+        The named occupation comes first, followed by the best other lexical
+        matches. No embedding is computed, so ``score`` is None and
+        ``lexical_score`` holds the title similarity to the query.
+        """
+        lexical = self.lexical_index
+        if lexical is None:
+            return None
+        best = lexical.confident_match(query, self.lexical_confidence)
+        if best is None:
+            return None
+
+        ranking, similarities = lexical.ranking(query, depth=top_k, rrf_k=self.rrf_k)
+        positions = [best] + [position for position in ranking if position != best][:top_k - 1]
+        matches = [lexical.match(position, float(similarities[position])) for position in positions]
+        self._count_retrieval('lexical')
+        return [{**job, 'retrieval': 'lexical'} for job in self.format_matches(matches)]
+
+    def merge_lexical(self, query: str, dense_matches: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """Fuse dense matches with the lexical ranking by reciprocal rank, both weighted equally.
+
+        ``score`` stays the cosine similarity of dense matches and is None for
+        occupations found only lexically. Every result also carries its title
+        similarity as ``lexical_score``. ``retrieval`` records which side
+        found each result: dense, lexical or hybrid (both).
+        """
+        lexical = self.lexical_index
+        if lexical is None:
+            self._count_retrieval('dense')
+            return [{**job, 'retrieval': 'dense'} for job in self.format_matches(dense_matches[:top_k])]
+
+        ranking, similarities = lexical.ranking(query, depth=self.dense_candidates(top_k), rrf_k=self.rrf_k)
+        dense_by_id = {match['id']: match for match in dense_matches}
+        lexical_ids = {lexical.ids[position]: position for position in ranking}
+        fused = reciprocal_rank_fusion(
+            [[match['id'] for match in dense_matches], list(lexical_ids)], self.rrf_k
+        )
+
+        similar_jobs = []
+        for vector_id, _ in fused[:top_k]:
+            if vector_id in dense_by_id:
+                position = lexical.positions.get(vector_id)
+                match = dense_by_id[vector_id]
+                if position is not None:
+                    match = {**match, 'lexical_score': float(similarities[position])}
+                retrieval = 'hybrid' if vector_id in lexical_ids else 'dense'
+            else:
+                position = lexical_ids[vector_id]
+                match = lexical.match(position, float(similarities[position]))
+                retrieval = 'lexical'
+            similar_jobs.append({**self.format_matches([match])[0], 'retrieval': retrieval})
+        self._count_retrieval('hybrid')
+        return similar_jobs
     
+    def get_engine(self):
+        """Return the shared, pooled SQLAlchemy engine, creating it on first use"""
+        if self._engine is None:
+            with self._engine_lock:
+                if self._engine is None:
+                    from sqlalchemy import create_engine
+                    self._engine = create_engine(
+                        self.database_url,
+                        pool_size=self.db_pool_size,
+                        max_overflow=self.db_max_overflow,
+                        pool_timeout=self.db_pool_timeout,
+                        pool_recycle=self.db_pool_recycle,
+                        pool_pre_ping=self.db_pool_pre_ping
+                    )
+        return self._engine
+
+    def ingest_generation(self) -> Optional[str]:
+        """Generation stamp of the live job_competencies data, or None for data loaded before stamping.
+
+        ``scripts/ingest_data.py`` stores it in ``ingest_metadata``, which is
+        swapped in and rolled back together with the competency tables.
+        """
+        with self.get_engine().connect() as connection:
+            if connection.exec_driver_sql("SELECT to_regclass('ingest_metadata')").scalar() is None:
+                return None
+            return connection.exec_driver_sql("SELECT generation FROM ingest_metadata LIMIT 1").scalar()
+
+    def _parquet_generation(self) -> Optional[str]:
+        """Ingest generation stamped in the Parquet cache's schema metadata, or None"""
+        import pyarrow.parquet as pq
+
+        metadata = pq.read_schema(self.competencies_parquet_path).metadata or {}
+        generation = metadata.get(b'ingest_generation')
+        return generation.decode('utf-8') if generation is not None else None
+
+    def competency_data_generation(self) -> Optional[str]:
+        """Ingest generation of the competency data the backend reads.
+
+        This is the stamp in the database, or without a database the Parquet
+        cache's stamp. It is None when the data predates stamping.
+        """
+        if self.database_url:
+            return self.ingest_generation()
+        if self.competencies_parquet_path and os.path.exists(self.competencies_parquet_path):
+            return self._parquet_generation()
+        return None
+
+    def _usable_parquet(self) -> bool:
+        """Whether the Parquet cache exists and holds the data that is live in the database.
+
+        Without a database there is nothing to diverge from, so any Parquet
+        cache is used.
+        """
+        if not self.competencies_parquet_path or not os.path.exists(self.competencies_parquet_path):
+            return False
+        if not self.database_url:
+            return True
+        parquet_generation = self._parquet_generation()
+        if parquet_generation is not None and parquet_generation == self.ingest_generation():
+            return True
+        print(
+            f"Ignoring {self.competencies_parquet_path}: its ingest generation ({parquet_generation}) "
+            f"is not the one live in the database"
+        )
+        return False
+
+    def _read_competencies(self, query: str, columns: List[str]):
+        """Read competency rows from the ingest Parquet cache if it is current, else from PostgreSQL.
+
+        Both consumers group and sort the rows themselves, so only the column
+        set (not the row order) has to match ``query``.
+        """
+        import pandas as pd
+
+        if self._usable_parquet():
+            df = pd.read_parquet(self.competencies_parquet_path, columns=columns)
+            return df[df['data_value'].notna()]
+        return pd.read_sql(query, self.get_engine())
+
+    def get_pool_stats(self) -> Optional[Dict[str, Any]]:
+        """Connection pool utilisation, or None before the engine has been created"""
+        if self._engine is None:
+            return None
+        pool = self._engine.pool
+        checked_out = pool.checkedout()
+        capacity = self.db_pool_size + self.db_max_overflow
+        return {
+            'pool_size': pool.size(),
+            'max_overflow': self.db_max_overflow,
+            'checked_in': pool.checkedin(),
+            'checked_out': checked_out,
+            'overflow': pool.overflow(),
+            'utilisation': checked_out / capacity if capacity else 0.0
+        }
+
+    def initialize_profile_store(self):
+        """Load precomputed competency profiles, building them from the database if missing or stale.
+
+        The saved profiles are rebuilt when the ingest generation they were
+        built from is not the current one. On failure the store stays unset and
+        ``get_job_competencies`` falls back to querying PostgreSQL per request.
+        """
+        try:
+            self._profile_file_version = self._file_version(self.profile_path)
+            self.profile_store = CompetencyProfileStore.load(self.profile_path)
+            if self.profile_store is None:
+                self.refresh_profile_store()
+            elif not self._profiles_current(self.profile_store):
+                print(f"Competency profiles in {self.profile_path} were built from another ingest generation; rebuilding them")
+                self.refresh_profile_store()
+            else:
+                print(f"Loaded {len(self.profile_store)} competency profiles from {self.profile_path}")
+        except Exception as e:
+            print(f"Competency profiles unavailable, falling back to per-request SQL: {e}")
+            self.profile_store = None
+            self._refresh_competency_generation()
+
+    def _reload_profiles_if_changed(self):
+        """Load the competency profiles another worker's build or refresh has saved"""
+        version = self._file_version(self.profile_path)
+        if version is None or version == self._profile_file_version:
+            return
+        try:
+            store = CompetencyProfileStore.load(self.profile_path)
+        except Exception as e:
+            print(f"Error reloading competency profiles from {self.profile_path}: {e}")
+            return
+        self._profile_file_version = version
+        if store is not None:
+            self.profile_store = store
+            print(f"Reloaded {len(store)} competency profiles from {self.profile_path}")
+
+    def _profiles_current(self, store: CompetencyProfileStore) -> bool:
+        try:
+            return store.data_generation == self.competency_data_generation()
+        except Exception as e:
+            # Without the database the saved profiles are still the best data available
+            print(f"Could not check the ingest generation of the competency profiles: {e}")
+            return True
+
+    def refresh_profile_store(self):
+        """Rebuild every competency profile with a single query and persist them"""
+        # Read the stamp first: if an ingest swaps in between, the profiles look stale, not current
+        generation = self.competency_data_generation()
+        df = self._read_competencies(PROFILE_QUERY, [
+            'onet_soc_code', 'element_name', 'element_type', 'scale_name',
+            'data_value', 'element_id', 'scale_id'
+        ])
+        store = CompetencyProfileStore.from_dataframe(df, generation)
+        store.save(self.profile_path)
+        self._profile_file_version = self._file_version(self.profile_path)
+        self.profile_store = store
+        print(f"Built {len(store)} competency profiles")
+
+    def get_job_competencies_bulk(self, onet_soc_codes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """``get_job_competencies`` for many occupations, with a single query when there is no profile store"""
+        with span('competency_fetch'):
+            if self.profile_store is not None:
+                return {code: self.profile_store.get(code) or {} for code in onet_soc_codes}
+            if not onet_soc_codes:
+                return {}
+
+            try:
+                import pandas as pd
+
+                query = """
+                SELECT
+                    onet_soc_code,
+                    element_name,
+                    element_type,
+                    scale_name,
+                    data_value,
+                    element_id,
+                    scale_id
+                FROM job_competencies
+                WHERE onet_soc_code = ANY(%s)
+                ORDER BY onet_soc_code, element_type, scale_name, data_value DESC
+                """
+                df = pd.read_sql(query, self.get_engine(), params=(list(onet_soc_codes),))
+                profiles = CompetencyProfileStore.from_dataframe(df).profiles if not df.empty else {}
+                return {code: profiles.get(code, {}) for code in onet_soc_codes}
+
+            except Exception as e:
+                print(f"Error getting job competencies in bulk: {e}")
+                raise
+
     def get_job_competencies(self, onet_soc_code: str) -> Dict[str, Any]:
         """Get detailed competencies for a specific job, structured by type and scale."""
-        try:
-            engine = create_engine(self.database_url)
-            
-            query = """
-            SELECT 
-                element_name,
-                element_type, 
-                scale_name,
-                data_value,
-                element_id,
-                scale_id
-            FROM job_competencies 
-            WHERE onet_soc_code = %s
-            ORDER BY element_type, scale_name, data_value DESC
-            """
+        with span('competency_fetch'):
+            if self.profile_store is not None:
+                return self.profile_store.get(onet_soc_code) or {}
+
+            try:
+                import pandas as pd
+
+                engine = self.get_engine()
             
-            df = pd.read_sql(query, engine, params=(onet_soc_code,))
+                query = """
+                SELECT 
+                    element_name,
+                    element_type, 
+                    scale_name,
+                    data_value,
+                    element_id,
+                    scale_id
+                FROM job_competencies 
+                WHERE onet_soc_code = %s
+                ORDER BY element_type, scale_name, data_value DESC
+                """
             
-            # Group competencies by element_type (Skill/Ability) and then by scale
-            structured_competencies = {}
-            for _, row in df.iterrows():
-                element_type = row['element_type']
-                scale = row['scale_name']
-                
-                if element_type not in structured_competencies:
-                    structured_competencies[element_type] = {}
-                
-                if scale not in structured_competencies[element_type]:
-                    structured_competencies[element_type][scale] = []
-                
-                structured_competencies[element_type][scale].append({
-                    'element_name': row['element_name'],
-                    'data_value': float(row['data_value']),
-                    'element_id': row['element_id'],
-                    'scale_id': row['scale_id']
-                })
+                df = pd.read_sql(query, engine, params=(onet_soc_code,))
             
-            return structured_competencies
+                # Group competencies by element_type (Skill/Ability) and then by scale
+                return build_structured_competencies(df)
             
-        except Exception as e:
-            print(f"Error getting job competencies: {e}")
-            raise
+            except Exception as e:
+                print(f"Error getting job competencies: {e}")
+                raise
 
 class CompetencyAnalyzer:
     def __init__(self, vector_db: CompetencyVectorDB):
         self.vector_db = vector_db
-    
+
+        # Memoised analyses (ANALYSIS_CACHE_BYTES=0 disables it)
+        cache_bytes = int(os.getenv('ANALYSIS_CACHE_BYTES', str(64 * 1024 * 1024)))
+        cache_ttl = float(os.getenv('ANALYSIS_CACHE_TTL', '3600'))
+        self.cache = None
+        if cache_bytes > 0:
+            self.cache = AnalysisCache(cache_bytes, cache_ttl, remote=self._connect_remote_cache())
+
+    @staticmethod
+    def _connect_remote_cache():
+        """Redis client for ANALYSIS_CACHE_REDIS_URL, or None to cache in-process only"""
+        url = os.getenv('ANALYSIS_CACHE_REDIS_URL')
+        if not url:
+            return None
+        try:
+            import redis
+        except ImportError:
+            print("ANALYSIS_CACHE_REDIS_URL is set but the redis package is not installed; caching in-process only")
+            return None
+        return redis.Redis.from_url(url, socket_timeout=0.05)
+
+    def get_cache_stats(self) -> Optional[Dict[str, Any]]:
+        return self.cache.stats() if self.cache else None
+
     def analyze_job_role(self, job_title: str) -> Dict[str, Any]:
-        """Analyze a job role and provide competency insights"""
+        """Analyze a job role and provide competency insights.
+
+        Results are memoised per normalised title, and the occupation-only parts
+        per matched ``onet_soc_code``, for the current data generation. The
+        returned structure may be shared with other requests and must not be
+        modified.
+        """
         try:
+            self.vector_db.refresh_if_stale()
+            generation = self.vector_db.data_generation
+            cached = self.cached_analysis(generation, job_title)
+            if cached is not None:
+                return cached
+
             # Search for similar jobs
             similar_jobs = self.vector_db.search_similar_jobs(job_title, top_k=3)
             
@@ -233,213 +1207,99 @@ class CompetencyAnalyzer:
                 return {"error": "No similar jobs found"}
             
             # Get detailed competencies for the most similar job
-            best_match = similar_jobs[0]
-            competencies = self.vector_db.get_job_competencies(best_match['onet_soc_code'])
-            
-            # Create filtered competency framework (top 3 only)
-            filtered_competencies = self._filter_top_competencies(competencies)
-            
-            # Create competency framework
-            framework = {
-                'job_analysis': {
-                    'query': job_title,
-                    'best_match': best_match,
-                    'similar_jobs': similar_jobs
-                },
-                'competency_framework': filtered_competencies,  # Now filtered to top 3
-                'recommendations': self._generate_recommendations(filtered_competencies),
-                'formatted_framework_summary': self._format_competency_framework_summary(filtered_competencies),
-                'structural_diagram': self._create_structural_data(filtered_competencies)  # Graph with top 3 only
-            }
-            
-            return framework
+            onet_soc_code = similar_jobs[0]['onet_soc_code']
+            occupation = self.cached_occupation(generation, onet_soc_code)
+            if occupation is None:
+                occupation = self.analyze_occupation(
+                    generation, onet_soc_code, self.vector_db.get_job_competencies(onet_soc_code)
+                )
+            return self.complete_analysis(generation, job_title, similar_jobs, occupation)
             
         except Exception as e:
             print(f"Error analyzing job role: {e}")
             raise
-    
-    def _filter_top_competencies(self, structured_competencies: Dict[str, Any], top_n: int = 3) -> Dict[str, Any]:
-        """Filter competencies to keep only top N by importance"""
-        filtered = {}
-        
-        for element_type, scales in structured_competencies.items():
-            filtered[element_type] = {}
-            
-            for scale_name, competencies in scales.items():
-                # Sort by data_value (importance/level) and take top N
-                sorted_competencies = sorted(
-                    competencies, 
-                    key=lambda x: x['data_value'], 
-                    reverse=True
-                )
-                filtered[element_type][scale_name] = sorted_competencies[:top_n]
-        
-        return filtered
-    
-    def _generate_recommendations(self, structured_competencies: Dict[str, Any]) -> List[str]:
-        """Generate concise recommendations (top 3 skills/abilities by importance) for the initial chat response."""
-        recommendations = []
-
-        # Get top 3 Skills by Importance
-        if 'Skill' in structured_competencies and 'Importance' in structured_competencies['Skill']:
-            top_skills_importance = sorted(
-                structured_competencies['Skill']['Importance'],
-                key=lambda x: x['data_value'],
-                reverse=True
-            )[:3]
-            for i, skill in enumerate(top_skills_importance):
-                recommendations.append(
-                    f"Skill {i+1}: {skill['element_name']} (Importance: {skill['data_value']:.1f})"
-                )
 
-        # Get top 3 Abilities by Importance
-        if 'Ability' in structured_competencies and 'Importance' in structured_competencies['Ability']:
-            top_abilities_importance = sorted(
-                structured_competencies['Ability']['Importance'],
-                key=lambda x: x['data_value'],
-                reverse=True
-            )[:3]
-            for i, ability in enumerate(top_abilities_importance):
-                recommendations.append(
-                    f"Ability {i+1}: {ability['element_name']} (Importance: {ability['data_value']:.1f})"
+    def iter_job_analysis(self, job_title: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """``analyze_job_role`` in stages, for streaming responses.
+
+        Yields ``('match', job_analysis)`` as soon as the search returns, then
+        ``('recommendations', ...)``, ``('summary', ...)`` and ``('diagram', ...)``.
+        If nothing matches, yields a single ``('error', ...)``. Caching is the
+        same as ``analyze_job_role``.
+        """
+        self.vector_db.refresh_if_stale()
+        generation = self.vector_db.data_generation
+        analysis = self.cached_analysis(generation, job_title)
+        if analysis is None:
+            similar_jobs = self.vector_db.search_similar_jobs(job_title, top_k=3)
+            if not similar_jobs:
+                yield 'error', {"error": "No similar jobs found"}
+                return
+            yield 'match', {'query': job_title, 'best_match': similar_jobs[0], 'similar_jobs': similar_jobs}
+
+            onet_soc_code = similar_jobs[0]['onet_soc_code']
+            occupation = self.cached_occupation(generation, onet_soc_code)
+            if occupation is None:
+                occupation = self.analyze_occupation(
+                    generation, onet_soc_code, self.vector_db.get_job_competencies(onet_soc_code)
                 )
-        
-        # Add a general recommendation if no specific top items found or to provide more context
-        if not recommendations:
-            recommendations.append("No specific top skills or abilities by importance found for this role.")
+            analysis = self.complete_analysis(generation, job_title, similar_jobs, occupation)
         else:
-            recommendations.insert(0, "Key competencies for this role (top 3 by Importance):") # Add a header
+            yield 'match', analysis['job_analysis']
 
-        return recommendations
+        yield from analysis_stages(analysis)
 
-    def _format_competency_framework_summary(self, structured_competencies: Dict[str, Any]) -> str:
-        """
-        Formats a detailed text summary of the competency framework,
-        including top 3 skills and abilities by importance and level.
-        This is intended for the '📊 Key Competency Framework' section.
-        """
-        framework_text = '\n📊 Key Competency Framework (Top 3 by Importance & Level):\n\n'
-
-        # Process Skills
-        if 'Skill' in structured_competencies:
-            framework_text += "--- SKILLS ---\n"
-            for scale_name in ['Importance', 'Level']: # Iterate over specific scales
-                if scale_name in structured_competencies['Skill']:
-                    competencies = structured_competencies['Skill'][scale_name]
-                    sorted_competencies = sorted(competencies, key=lambda x: x['data_value'], reverse=True)
-                    
-                    framework_text += f"  {scale_name.upper()}:\n"
-                    for i, comp in enumerate(sorted_competencies[:3]): # Take top 3
-                        score = comp['data_value'] if comp['data_value'] is not None else 'N/A';
-                        framework_text += f"    {i + 1}. {comp['element_name']} ({score:.1f})\n"
-                    framework_text += "\n"
-        
-        # Process Abilities
-        if 'Ability' in structured_competencies:
-            framework_text += "--- ABILITIES ---\n"
-            for scale_name in ['Importance', 'Level']: # Iterate over specific scales
-                if scale_name in structured_competencies['Ability']:
-                    competencies = structured_competencies['Ability'][scale_name]
-                    sorted_competencies = sorted(competencies, key=lambda x: x['data_value'], reverse=True)
-                    
-                    framework_text += f"  {scale_name.upper()}:\n"
-                    for i, comp in enumerate(sorted_competencies[:3]): # Take top 3
-                        score = comp['data_value'] if comp['data_value'] is not None else 'N/A';
-                        framework_text += f"    {i + 1}. {comp['element_name']} ({score:.1f})\n"
-                    framework_text += "\n"
-
-        return framework_text
-    
-    def _create_structural_data(self, structured_competencies: Dict[str, Any]) -> Dict[str, Any]:
-        """Create structural data for diagram generation, now with filtered competencies only."""
-        structure = {
-            'nodes': [],
-            'edges': [],
-            'categories': [] # Will be populated dynamically
+    # The steps of analyze_job_role, also driven by the async service (async_service.py)
+
+    def cached_analysis(self, generation: str, job_title: str) -> Optional[Dict[str, Any]]:
+        """Memoised analysis for ``job_title``, echoing this request's spelling of it, or None"""
+        if self.cache is None:
+            return None
+        cached = self.cache.get_query(generation, job_title)
+        if cached is None:
+            return None
+        return {**cached, 'job_analysis': {**cached['job_analysis'], 'query': job_title}}
+
+    def cached_occupation(self, generation: str, onet_soc_code: str) -> Optional[Dict[str, Any]]:
+        return self.cache.get_occupation(generation, onet_soc_code) if self.cache else None
+
+    def analyze_occupation(self, generation: str, onet_soc_code: str,
+                           competencies: Dict[str, Any]) -> Dict[str, Any]:
+        """Occupation-only parts of an analysis, memoised per ``onet_soc_code``"""
+        occupation = self._analyze_occupation(competencies)
+        if self.cache is not None:
+            self.cache.put_occupation(generation, onet_soc_code, occupation)
+        return occupation
+
+    def complete_analysis(self, generation: str, job_title: str, similar_jobs: List[Dict[str, Any]],
+                          occupation: Dict[str, Any]) -> Dict[str, Any]:
+        """Combine the search results with the occupation parts and memoise the result per title"""
+        framework = {
+            'job_analysis': {
+                'query': job_title,
+                'best_match': similar_jobs[0],
+                'similar_jobs': similar_jobs
+            },
+            **occupation
         }
-        
-        node_id_counter = 0
-        
-        # Add root node for the job
-        job_node_id = f"node_{node_id_counter}"
-        structure['nodes'].append({
-            'id': job_node_id,
-            'label': 'Job Role',
-            'type': 'job_root',
-            'level': 0,
-            'group': 'job_root'
-        })
-        node_id_counter += 1
-
-        # Add element type nodes (Skills, Abilities)
-        for element_type, scales in structured_competencies.items():
-            type_node_id = f"node_{node_id_counter}"
-            structure['nodes'].append({
-                'id': type_node_id,
-                'label': element_type,
-                'type': 'element_type',
-                'level': 1,
-                'group': 'element_type'
-            })
-            structure['edges'].append({
-                'from': job_node_id,
-                'to': type_node_id,
-                'weight': 1 # Arbitrary weight
-            })
-            node_id_counter += 1
-
-            # Add scale nodes (Importance, Level)
-            for scale_name, competencies in scales.items():
-                scale_node_id = f"node_{node_id_counter}"
-                structure['nodes'].append({
-                    'id': scale_node_id,
-                    'label': scale_name.replace('_', ' '),
-                    'type': 'scale',
-                    'level': 2,
-                    'group': 'scale'
-                })
-                structure['edges'].append({
-                    'from': type_node_id,
-                    'to': scale_node_id,
-                    'weight': 1 # Arbitrary weight
-                })
-                node_id_counter += 1
-
-                # Add competency nodes (now filtered to top 3 only)
-                for comp in competencies: # This is now already filtered to top 3
-                    comp_node_id = f"node_{node_id_counter}"
-                    structure['nodes'].append({
-                        'id': comp_node_id,
-                        'label': f"{comp['element_name']} ({comp['data_value']:.1f})",
-                        'type': 'competency',
-                        'level': 3,
-                        'importance': comp['data_value'],
-                        'element_id': comp['element_id'],
-                        'scale_id': comp['scale_id'],
-                        'element_type': element_type,
-                        'scale_name': scale_name,
-                        'group': 'competency'
-                    })
-                    structure['edges'].append({
-                        'from': scale_node_id,
-                        'to': comp_node_id,
-                        'weight': comp['data_value']
-                    })
-                    node_id_counter += 1
-        
-        # Populate categories for potential frontend filtering/display
-        structure['categories'] = list(structured_competencies.keys()) # e.g., ['Skill', 'Ability']
-        for element_type, scales in structured_competencies.items():
-            for scale_name in scales.keys():
-                structure['categories'].append(f"{element_type} - {scale_name.replace('_', ' ')}")
+        if self.cache is not None:
+            self.cache.put_query(generation, job_title, framework)
+        return framework
+    
+    def _analyze_occupation(self, competencies: Dict[str, Any]) -> Dict[str, Any]:
+        """The parts of an analysis that depend only on the matched occupation's competencies.
 
-        return structure
+        Framework (top 3 only), recommendations, summary and diagram are built
+        from a single top-N selection.
+        """
+        with span('framework'):
+            return build_competency_framework(competencies, top_n=3)
 
 # Example usage and initialization
 if __name__ == "__main__":
     # Initialize vector database
     vector_db = CompetencyVectorDB()
-    vector_db.initialize_pinecone()
+    vector_db.initialize_index()
     
     # Initialize analyzer
     analyzer = CompetencyAnalyzer(vector_db)
\ No newline at end of file
@@ -0,0 +1,405 @@
+import os
+import json
+import hashlib
+import tempfile
+import random
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+from typing import Iterator, List, Dict, Any, Optional, Tuple
+from upsert_pipeline import vector_payload_bytes
+
+SNAPSHOT_FORMAT_VERSION = 2
+# Version 1 snapshots kept the matrix in an unversioned embeddings-<hash>.npy
+READABLE_FORMAT_VERSIONS = {1, 2}
+
+
+def model_hash(model_name: str) -> str:
+    """Short, filesystem-safe hash identifying the embedding model"""
+    return hashlib.sha256(model_name.encode('utf-8')).hexdigest()[:12]
+
+
+def snapshot_paths(directory: str, model_name: str, version: Optional[str] = None) -> Tuple[str, str]:
+    """Return the (matrix, metadata) file paths of the snapshot for ``model_name``.
+
+    Each save writes its matrix under a new ``version``; without one this is
+    the unversioned matrix path of format version 1.
+    """
+    stem = os.path.join(directory, f"embeddings-{model_hash(model_name)}")
+    matrix_path = f"{stem}-{version}.npy" if version else f"{stem}.npy"
+    return matrix_path, f"{stem}.json"
+
+
+def _atomic_write(path: str, write) -> None:
+    """Write via a temporary file and rename so readers never see a partial file"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _read_snapshot_document(metadata_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_snapshot(directory: str, model_name: str, ids: List[str], embeddings: np.ndarray,
+                  metadata: List[Dict[str, Any]]) -> str:
+    """Persist L2-normalised embeddings as a raw float32 .npy plus a JSON metadata file.
+
+    The metadata is keyed by ``onet_soc_code`` and records each occupation's row
+    in the matrix. Every save writes its matrix to a new versioned file, then
+    atomically replaces the metadata file, which names that matrix. A reader
+    therefore always sees a matrix and metadata from the same save. The
+    previous matrix is kept for readers that loaded the old metadata just
+    before the swap; older ones are deleted.
+    """
+    if not ids:
+        raise ValueError("Refusing to write an empty embedding snapshot")
+
+    os.makedirs(directory, exist_ok=True)
+    version = f"{time.time_ns()}-{os.getpid()}"
+    matrix_path, metadata_path = snapshot_paths(directory, model_name, version)
+    matrix = LocalVectorIndex._normalize(embeddings)
+
+    occupations = {}
+    for row, (vector_id, meta) in enumerate(zip(ids, metadata)):
+        occupations[meta['onet_soc_code']] = {'row': row, 'id': vector_id, **meta}
+
+    document = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'model_name': model_name,
+        'model_hash': model_hash(model_name),
+        'version': version,
+        'matrix_file': os.path.basename(matrix_path),
+        'dimension': int(matrix.shape[1]),
+        'count': len(ids),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'occupations': occupations
+    }
+
+    previous = _read_snapshot_document(metadata_path)
+    _atomic_write(matrix_path, lambda f: np.save(f, matrix, allow_pickle=False))
+    _atomic_write(metadata_path, lambda f: f.write(json.dumps(document).encode('utf-8')))
+
+    keep = {os.path.basename(matrix_path)}
+    if previous is not None:
+        keep.add(_matrix_file(previous, directory, model_name))
+    prefix = f"embeddings-{model_hash(model_name)}"
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith('.npy') and name not in keep:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError as e:
+                print(f"Could not remove old snapshot matrix {name}: {e}")
+    return matrix_path
+
+
+def _matrix_file(document: Dict[str, Any], directory: str, model_name: str) -> str:
+    """File name of the matrix a metadata document belongs to"""
+    if 'matrix_file' in document:
+        return document['matrix_file']
+    return os.path.basename(snapshot_paths(directory, model_name)[0])
+
+
+def snapshot_version(directory: str, model_name: str) -> Optional[str]:
+    """Identifier of the current snapshot (its metadata file's mtime), or None if there is none.
+
+    The metadata file is replaced last on every save, so this changes exactly
+    when a new snapshot becomes visible. Processes sharing the snapshot
+    directory agree on it without coordinating.
+    """
+    _, metadata_path = snapshot_paths(directory, model_name)
+    try:
+        return str(os.stat(metadata_path).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+
+def load_snapshot(directory: str, model_name: str, mmap: bool = True):
+    """Load a snapshot written by ``save_snapshot``.
+
+    Returns ``(matrix, ids, metadata, document)``, or ``None`` if there is no
+    snapshot for this model. With ``mmap`` the matrix is opened read-only with
+    ``np.load(mmap_mode='r')`` and shared through the OS page cache. The
+    matrix is the one named by the metadata file, and its shape is checked
+    against the metadata.
+    """
+    _, metadata_path = snapshot_paths(directory, model_name)
+    # A save may replace the metadata and delete its matrix between our two
+    # reads; re-reading the metadata then finds the newer matrix
+    for attempt in range(2):
+        document = _read_snapshot_document(metadata_path)
+        if document is None:
+            return None
+
+        if document.get('format_version') not in READABLE_FORMAT_VERSIONS:
+            raise ValueError(f"Unsupported snapshot format version: {document.get('format_version')}")
+        if document.get('model_hash') != model_hash(model_name):
+            raise ValueError(f"Snapshot was built with {document.get('model_name')}, not {model_name}")
+
+        matrix_path = os.path.join(directory, _matrix_file(document, directory, model_name))
+        try:
+            matrix = np.load(matrix_path, mmap_mode='r' if mmap else None, allow_pickle=False)
+            break
+        except FileNotFoundError:
+            if attempt == 1:
+                return None
+    if matrix.shape != (document['count'], document['dimension']):
+        raise ValueError("Snapshot matrix and metadata are out of sync")
+
+    ids = [None] * document['count']
+    metadata = [None] * document['count']
+    for onet_soc_code, record in document['occupations'].items():
+        record = dict(record)
+        row = record.pop('row')
+        ids[row] = record.pop('id')
+        metadata[row] = record
+    return matrix, ids, metadata, document
+
+
+class LocalVectorIndex:
+    """In-process cosine-similarity index with a Pinecone-compatible interface.
+
+    Embeddings are kept L2-normalised in one contiguous float32 matrix, with the
+    vector IDs and metadata held in parallel lists. A query is a single
+    matrix-vector product followed by ``argpartition`` for the top-k.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        # (matrix, ids, metadata) is replaced as one tuple so that readers never
+        # see a matrix and an ID list from different generations.
+        self._state = (np.empty((0, dimension), dtype=np.float32), [], [])
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_arrays(cls, matrix: np.ndarray, ids: List[str], metadata: List[Dict[str, Any]]):
+        """Wrap already-normalised embeddings without copying them (e.g. a memory-mapped snapshot)"""
+        index = cls(dimension=int(matrix.shape[1]))
+        index._state = (matrix, list(ids), list(metadata))
+        index._positions = {vector_id: i for i, vector_id in enumerate(ids)}
+        return index
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """Return a contiguous float32 copy of ``vectors`` with unit-length rows"""
+        vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(vectors / norms)
+
+    def upsert(self, vectors: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Insert or replace vectors given as Pinecone-style ``{'id', 'values', 'metadata'}`` dicts"""
+        if not vectors:
+            return {'upserted_count': 0}
+
+        values = self._normalize([v['values'] for v in vectors])
+        if values.shape[1] != self.dimension:
+            raise ValueError(
+                f"Vector dimension {values.shape[1]} does not match index dimension {self.dimension}"
+            )
+
+        with self._lock:
+            # Build the new state on copies and swap it in
+            matrix, ids, metadata = self._state
+            ids = list(ids)
+            metadata = list(metadata)
+            positions = dict(self._positions)
+
+            new_rows = []
+            replaced = {}
+            for vector, row in zip(vectors, values):
+                vector_id = vector['id']
+                if vector_id in positions:
+                    replaced[positions[vector_id]] = row
+                    metadata[positions[vector_id]] = vector.get('metadata', {})
+                else:
+                    positions[vector_id] = len(ids)
+                    ids.append(vector_id)
+                    metadata.append(vector.get('metadata', {}))
+                    new_rows.append(row)
+
+            if replaced:
+                # Copy first: the current matrix may be a read-only memory map
+                matrix = np.array(matrix, dtype=np.float32, copy=True)
+                for position, row in replaced.items():
+                    matrix[position] = row
+            if new_rows:
+                matrix = np.ascontiguousarray(np.vstack([matrix, np.stack(new_rows)]), dtype=np.float32)
+
+            self._state = (matrix, ids, metadata)
+            self._positions = positions
+
+        return {'upserted_count': len(vectors)}
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False) -> Dict[str, Any]:
+        """Remove vectors by ID, or every vector when ``delete_all`` is set"""
+        with self._lock:
+            matrix, current_ids, metadata = self._state
+            if delete_all:
+                keep = []
+            else:
+                drop = set(ids or [])
+                keep = [i for i, vector_id in enumerate(current_ids) if vector_id not in drop]
+
+            new_ids = [current_ids[i] for i in keep]
+            self._state = (
+                np.ascontiguousarray(matrix[keep], dtype=np.float32),
+                new_ids,
+                [metadata[i] for i in keep]
+            )
+            self._positions = {vector_id: i for i, vector_id in enumerate(new_ids)}
+        return {}
+
+    def query(self, vector: List[float], top_k: int = 5, include_metadata: bool = True,
+              **kwargs) -> Dict[str, Any]:
+        """Return the ``top_k`` most similar vectors in Pinecone's response shape"""
+        matrix, ids, metadata = self._state
+        if len(ids) == 0 or top_k <= 0:
+            return {'matches': []}
+
+        query_vector = self._normalize(vector)[0]
+        scores = matrix @ query_vector
+
+        k = min(top_k, len(ids))
+        if k < len(ids):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(ids))
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        matches = []
+        for position in top:
+            match = {'id': ids[position], 'score': float(scores[position])}
+            if include_metadata:
+                match['metadata'] = metadata[position]
+            matches.append(match)
+        return {'matches': matches}
+
+    def query_batch(self, vectors: np.ndarray, top_k: int = 5, include_metadata: bool = True) -> Dict[str, Any]:
+        """``query`` for many vectors with one matrix-matrix product.
+
+        Returns ``{'results': [{'matches': [...]}, ...]}`` in the order of ``vectors``.
+        """
+        matrix, ids, metadata = self._state
+        if len(ids) == 0 or top_k <= 0 or len(vectors) == 0:
+            return {'results': [{'matches': []} for _ in range(len(vectors))]}
+
+        scores = self._normalize(vectors) @ matrix.T
+        k = min(top_k, len(ids))
+        if k < len(ids):
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(len(ids)), scores.shape)
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        results = []
+        for positions, row_scores in zip(top.tolist(), top_scores.tolist()):
+            matches = []
+            for position, score in zip(positions, row_scores):
+                match = {'id': ids[position], 'score': score}
+                if include_metadata:
+                    match['metadata'] = metadata[position]
+                matches.append(match)
+            results.append({'matches': matches})
+        return {'results': results}
+
+    def list(self, prefix: str = '', limit: int = 100) -> Iterator[List[str]]:
+        """Pages of vector IDs starting with ``prefix``, like Pinecone's ``Index.list``"""
+        ids = [vector_id for vector_id in self._state[1] if vector_id.startswith(prefix)]
+        for i in range(0, len(ids), limit):
+            yield ids[i:i + limit]
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        """Summarise the index in the shape returned by Pinecone"""
+        return {
+            'dimension': self.dimension,
+            'total_vector_count': len(self._state[1])
+        }
+
+
+class StubIndex:
+    """Offline stand-in for a remote index, for testing and benchmarking writes.
+
+    Each request sleeps ``latency_ms`` to simulate a network round-trip, a
+    ``failure_rate`` fraction of upserts raise, and requests over Pinecone's
+    limits (``max_request_bytes``, ``max_request_vectors``) are rejected. Only
+    vector IDs are kept, so memory does not grow with the vectors written.
+    """
+
+    def __init__(self, dimension: int = 384, latency_ms: float = 20.0, failure_rate: float = 0.0,
+                 max_request_bytes: int = 2 * 1024 * 1024, max_request_vectors: int = 1000,
+                 seed: Optional[int] = None):
+        self.dimension = dimension
+        self.latency = latency_ms / 1000.0
+        self.failure_rate = failure_rate
+        self.max_request_bytes = max_request_bytes
+        self.max_request_vectors = max_request_vectors
+        self._random = random.Random(seed)
+        self._ids = set()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+    def upsert(self, vectors: List[Dict[str, Any]]) -> Dict[str, int]:
+        time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+        if fail:
+            raise ConnectionError("Simulated upsert failure")
+        if len(vectors) > self.max_request_vectors:
+            raise ValueError(f"Upsert of {len(vectors)} vectors exceeds {self.max_request_vectors}")
+        size = sum(vector_payload_bytes(vector) for vector in vectors)
+        if size > self.max_request_bytes:
+            raise ValueError(f"Upsert request of {size} bytes exceeds {self.max_request_bytes}")
+        for vector in vectors:
+            if len(vector['values']) != self.dimension:
+                raise ValueError(f"Vector dimension {len(vector['values'])} does not match {self.dimension}")
+        with self._lock:
+            self._ids.update(vector['id'] for vector in vectors)
+        return {'upserted_count': len(vectors)}
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False) -> Dict[str, Any]:
+        time.sleep(self.latency)
+        with self._lock:
+            if delete_all:
+                self._ids.clear()
+            else:
+                self._ids.difference_update(ids or [])
+        return {}
+
+    def query(self, vector: List[float], top_k: int = 5, include_metadata: bool = True,
+              **kwargs) -> Dict[str, Any]:
+        time.sleep(self.latency)
+        return {'matches': []}
+
+    def list(self, prefix: str = '', limit: int = 100) -> Iterator[List[str]]:
+        time.sleep(self.latency)
+        with self._lock:
+            ids = sorted(vector_id for vector_id in self._ids if vector_id.startswith(prefix))
+        for i in range(0, len(ids), limit):
+            yield ids[i:i + limit]
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        return {
+            'dimension': self.dimension,
+            'total_vector_count': len(self._ids)
+        }
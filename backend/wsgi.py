@@ -0,0 +1,11 @@
+"""
+WSGI entry point for production servers:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Components are initialised at import (once in the master with preload_app);
+model loading is left to the hooks in gunicorn.conf.py.
+"""
+from app import app, initialize_components
+
+initialize_components(start_model=False)
@@ -0,0 +1,58 @@
+"""
+Maps a CSV of job titles onto O*NET occupations, like
+``POST /api/analyze-jobs/batch`` but without the HTTP server. One NDJSON
+line is written per input row, in input order, followed by a summary line.
+
+The title column is ``--column``, else a header named job_title/title,
+else the first column. Use ``-`` to read stdin.
+
+    python scripts/batch_analyze.py titles.csv [--column "Job Title"] [--top-k 3]
+        [--include-analysis] [-o results.ndjson]
+"""
+import os
+import sys
+import json
+import argparse
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from vector_db import CompetencyVectorDB, CompetencyAnalyzer  # noqa: E402
+from batch_analysis import BatchAnalyzer, read_titles_csv  # noqa: E402
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="CSV file of job titles, or - for stdin")
+    parser.add_argument('--column', default=None, help="name of the job-title column")
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--include-analysis', action='store_true',
+                        help="add the competency framework, recommendations, summary and diagram per title")
+    parser.add_argument('--chunk-size', type=int, default=None, help="titles processed together (BATCH_CHUNK_SIZE)")
+    parser.add_argument('-o', '--output', default='-', help="NDJSON output file (default stdout)")
+    args = parser.parse_args()
+
+    # Resolve paths before switching to the backend directory its relative settings expect
+    input_path = os.path.abspath(args.input) if args.input != '-' else None
+    output_path = os.path.abspath(args.output) if args.output != '-' else None
+    os.chdir(BACKEND_DIR)
+
+    vector_db = CompetencyVectorDB()
+    vector_db.initialize_index()
+    vector_db.initialize_profile_store()
+    analyzer = CompetencyAnalyzer(vector_db)
+
+    source = open(input_path, encoding='utf-8-sig', newline='') if input_path else sys.stdin
+    sink = open(output_path, 'w', encoding='utf-8') if output_path else sys.stdout
+    try:
+        batch = BatchAnalyzer(vector_db, analyzer, top_k=args.top_k, include_analysis=args.include_analysis,
+                              chunk_size=args.chunk_size)
+        for record in batch.run(read_titles_csv(source, args.column)):
+            sink.write(json.dumps(record, separators=(',', ':')) + '\n')
+            if record['type'] == 'summary':
+                print(f"Batch analysis: {record}", file=sys.stderr)
+    finally:
+        if input_path:
+            source.close()
+        if output_path:
+            sink.close()
@@ -0,0 +1,152 @@
+"""
+Benchmarks the vectorised competency aggregation against the original
+per-group ``iterrows`` implementation.
+
+Uses the cleaned O*NET data when a DATABASE_URL is configured, otherwise a
+synthetic frame with the full O*NET shape (about 900 occupations, 35 skills
+and 52 abilities each, on the Importance and Level scales).
+
+    python scripts/benchmark_aggregation.py [--synthetic] [--repeat 3]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from competency_profiles import CompetencyProfileStore, build_job_descriptions  # noqa: E402
+
+load_dotenv()
+
+EMBEDDING_QUERY = """
+SELECT onet_soc_code, title, description, element_name, element_type, scale_name, data_value,
+       element_id, scale_id
+FROM job_competencies
+WHERE data_value IS NOT NULL
+ORDER BY onet_soc_code, data_value DESC
+"""
+
+
+def synthetic_frame(occupations: int = 900, skills: int = 35, abilities: int = 52, seed: int = 0) -> pd.DataFrame:
+    """A frame shaped like the cleaned ``job_competencies`` table"""
+    rng = np.random.default_rng(seed)
+    elements = (
+        [('Skill', f"2.A.1.{i}", f"Skill {i}") for i in range(skills)]
+        + [('Ability', f"1.A.1.{i}", f"Ability {i}") for i in range(abilities)]
+    )
+    scales = [('IM', 'Importance'), ('LV', 'Level')]
+
+    rows = []
+    for o in range(occupations):
+        code = f"{11 + o // 100:02d}-{o % 100:04d}.00"
+        for element_type, element_id, element_name in elements:
+            for scale_id, scale_name in scales:
+                rows.append((
+                    code, f"Occupation {o}", f"Description of occupation {o}.",
+                    element_name, element_type, scale_name,
+                    round(float(rng.uniform(0, 7)), 2), element_id, scale_id
+                ))
+    df = pd.DataFrame(rows, columns=[
+        'onet_soc_code', 'title', 'description', 'element_name', 'element_type',
+        'scale_name', 'data_value', 'element_id', 'scale_id'
+    ])
+    return df.sort_values(['onet_soc_code', 'data_value'], ascending=[True, False], kind='stable')
+
+
+def legacy_job_descriptions(df: pd.DataFrame):
+    """The original per-group implementation from create_job_competency_vectors"""
+    job_descriptions = []
+    job_metadata = []
+    for onet_code, group in df.groupby('onet_soc_code'):
+        title = group['title'].iloc[0]
+        description = group['description'].iloc[0]
+        top_skills = group[group['element_type'] == 'Skill'].nlargest(5, 'data_value')
+        top_abilities = group[group['element_type'] == 'Ability'].nlargest(5, 'data_value')
+        skill_text = "; ".join([
+            f"{row['element_name']} ({row['scale_name']}): {row['data_value']}"
+            for _, row in top_skills.iterrows()
+        ])
+        ability_text = "; ".join([
+            f"{row['element_name']} ({row['scale_name']}): {row['data_value']}"
+            for _, row in top_abilities.iterrows()
+        ])
+        job_descriptions.append(
+            f"Job Title: {title}. Description: {description}. "
+            f"Key Skills: {skill_text}. "
+            f"Key Abilities: {ability_text}"
+        )
+        job_metadata.append({'onet_soc_code': onet_code, 'competency_count': len(group)})
+    return job_descriptions, job_metadata
+
+
+def legacy_profiles(df: pd.DataFrame):
+    """The original ``iterrows`` nesting from get_job_competencies, applied per occupation"""
+    profiles = {}
+    ordered = df.sort_values(['onet_soc_code', 'element_type', 'scale_name', 'data_value'],
+                             ascending=[True, True, True, False], kind='stable')
+    for onet_code, group in ordered.groupby('onet_soc_code'):
+        structured_competencies = {}
+        for _, row in group.iterrows():
+            element_type = row['element_type']
+            scale = row['scale_name']
+            if element_type not in structured_competencies:
+                structured_competencies[element_type] = {}
+            if scale not in structured_competencies[element_type]:
+                structured_competencies[element_type][scale] = []
+            structured_competencies[element_type][scale].append({
+                'element_name': row['element_name'],
+                'data_value': float(row['data_value']),
+                'element_id': row['element_id'],
+                'scale_id': row['scale_id']
+            })
+        profiles[onet_code] = structured_competencies
+    return profiles
+
+
+def best_of(fn, repeat: int):
+    """Best wall time of ``repeat`` runs, plus the last result"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def load_frame(use_synthetic: bool) -> pd.DataFrame:
+    database_url = os.getenv('DATABASE_URL')
+    if use_synthetic or not database_url:
+        print("Using synthetic O*NET-shaped data")
+        return synthetic_frame()
+
+    from sqlalchemy import create_engine
+    print("Loading job_competencies from PostgreSQL")
+    return pd.read_sql(EMBEDDING_QUERY, create_engine(database_url))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--synthetic', action='store_true', help="ignore DATABASE_URL and use synthetic data")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = load_frame(args.synthetic)
+    print(f"{df['onet_soc_code'].nunique()} occupations, {len(df)} rows\n")
+
+    legacy_time, (legacy_text, legacy_meta) = best_of(lambda: legacy_job_descriptions(df), args.repeat)
+    new_time, (new_text, new_meta) = best_of(lambda: build_job_descriptions(df), args.repeat)
+    assert legacy_text == new_text, "vectorised descriptions differ from the legacy output"
+    assert [m['competency_count'] for m in legacy_meta] == [m['competency_count'] for m in new_meta]
+    print(f"Job descriptions:    legacy {legacy_time * 1000:8.1f} ms   "
+          f"vectorised {new_time * 1000:8.1f} ms   speedup {legacy_time / new_time:5.1f}x")
+
+    legacy_time, legacy = best_of(lambda: legacy_profiles(df), args.repeat)
+    new_time, store = best_of(lambda: CompetencyProfileStore.from_dataframe(df), args.repeat)
+    assert legacy == store.profiles, "vectorised profiles differ from the legacy output"
+    print(f"Competency profiles: legacy {legacy_time * 1000:8.1f} ms   "
+          f"vectorised {new_time * 1000:8.1f} ms   speedup {legacy_time / new_time:5.1f}x")
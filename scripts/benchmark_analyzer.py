@@ -0,0 +1,304 @@
+"""
+Micro-benchmark of CompetencyAnalyzer.analyze_job_role with I/O stubbed out:
+the original implementation, which re-sorts every scale list in each helper,
+against the single-pass framework builder. Both must produce identical output.
+
+The vector search and competency lookup are replaced by in-memory stubs over
+synthetic O*NET-shaped profiles (35 skills and 52 abilities on two scales),
+and the analysis cache is disabled, so only the analyzer's own work is timed.
+
+    python scripts/benchmark_analyzer.py [--occupations 200] [--repeat 5]
+"""
+import os
+import sys
+import time
+import argparse
+from typing import List, Dict, Any
+
+os.environ['ANALYSIS_CACHE_BYTES'] = '0'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from vector_db import CompetencyAnalyzer  # noqa: E402
+from competency_profiles import CompetencyProfileStore  # noqa: E402
+from benchmark_aggregation import synthetic_frame  # noqa: E402
+
+
+class StubVectorDB:
+    """Answers searches and competency lookups from memory"""
+
+    data_generation = 'benchmark'
+
+    def __init__(self, store: CompetencyProfileStore):
+        self.store = store
+        self.next_code = None
+
+    def search_similar_jobs(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        return [{
+            'job_id': f"job_{self.next_code}",
+            'score': 0.9,
+            'title': query,
+            'description': '',
+            'onet_soc_code': self.next_code,
+            'competency_count': 174
+        }]
+
+    def get_job_competencies(self, onet_soc_code: str) -> Dict[str, Any]:
+        return self.store.get(onet_soc_code)
+
+
+class LegacyAnalyzer(CompetencyAnalyzer):
+    """analyze_job_role as it was before the single-pass builder"""
+
+    def analyze_job_role(self, job_title: str) -> Dict[str, Any]:
+        similar_jobs = self.vector_db.search_similar_jobs(job_title, top_k=3)
+        best_match = similar_jobs[0]
+        competencies = self.vector_db.get_job_competencies(best_match['onet_soc_code'])
+        filtered_competencies = self._filter_top_competencies(competencies)
+        return {
+            'job_analysis': {
+                'query': job_title,
+                'best_match': best_match,
+                'similar_jobs': similar_jobs
+            },
+            'competency_framework': filtered_competencies,
+            'recommendations': self._generate_recommendations(filtered_competencies),
+            'formatted_framework_summary': self._format_competency_framework_summary(filtered_competencies),
+            'structural_diagram': self._create_structural_data(filtered_competencies)
+        }
+
+    def _filter_top_competencies(self, structured_competencies: Dict[str, Any], top_n: int = 3) -> Dict[str, Any]:
+        """Filter competencies to keep only top N by importance"""
+        filtered = {}
+        
+        for element_type, scales in structured_competencies.items():
+            filtered[element_type] = {}
+            
+            for scale_name, competencies in scales.items():
+                # Sort by data_value (importance/level) and take top N
+                sorted_competencies = sorted(
+                    competencies, 
+                    key=lambda x: x['data_value'], 
+                    reverse=True
+                )
+                filtered[element_type][scale_name] = sorted_competencies[:top_n]
+        
+        return filtered
+    
+    def _generate_recommendations(self, structured_competencies: Dict[str, Any]) -> List[str]:
+        """Generate concise recommendations (top 3 skills/abilities by importance) for the initial chat response."""
+        recommendations = []
+
+        # Get top 3 Skills by Importance
+        if 'Skill' in structured_competencies and 'Importance' in structured_competencies['Skill']:
+            top_skills_importance = sorted(
+                structured_competencies['Skill']['Importance'],
+                key=lambda x: x['data_value'],
+                reverse=True
+            )[:3]
+            for i, skill in enumerate(top_skills_importance):
+                recommendations.append(
+                    f"Skill {i+1}: {skill['element_name']} (Importance: {skill['data_value']:.1f})"
+                )
+
+        # Get top 3 Abilities by Importance
+        if 'Ability' in structured_competencies and 'Importance' in structured_competencies['Ability']:
+            top_abilities_importance = sorted(
+                structured_competencies['Ability']['Importance'],
+                key=lambda x: x['data_value'],
+                reverse=True
+            )[:3]
+            for i, ability in enumerate(top_abilities_importance):
+                recommendations.append(
+                    f"Ability {i+1}: {ability['element_name']} (Importance: {ability['data_value']:.1f})"
+                )
+        
+        # Add a general recommendation if no specific top items found or to provide more context
+        if not recommendations:
+            recommendations.append("No specific top skills or abilities by importance found for this role.")
+        else:
+            recommendations.insert(0, "Key competencies for this role (top 3 by Importance):") # Add a header
+
+        return recommendations
+
+    def _format_competency_framework_summary(self, structured_competencies: Dict[str, Any]) -> str:
+        """
+        Formats a detailed text summary of the competency framework,
+        including top 3 skills and abilities by importance and level.
+        This is intended for the '📊 Key Competency Framework' section.
+        """
+        framework_text = '\n📊 Key Competency Framework (Top 3 by Importance & Level):\n\n'
+
+        # Process Skills
+        if 'Skill' in structured_competencies:
+            framework_text += "--- SKILLS ---\n"
+            for scale_name in ['Importance', 'Level']: # Iterate over specific scales
+                if scale_name in structured_competencies['Skill']:
+                    competencies = structured_competencies['Skill'][scale_name]
+                    sorted_competencies = sorted(competencies, key=lambda x: x['data_value'], reverse=True)
+                    
+                    framework_text += f"  {scale_name.upper()}:\n"
+                    for i, comp in enumerate(sorted_competencies[:3]): # Take top 3
+                        score = comp['data_value'] if comp['data_value'] is not None else 'N/A';
+                        framework_text += f"    {i + 1}. {comp['element_name']} ({score:.1f})\n"
+                    framework_text += "\n"
+        
+        # Process Abilities
+        if 'Ability' in structured_competencies:
+            framework_text += "--- ABILITIES ---\n"
+            for scale_name in ['Importance', 'Level']: # Iterate over specific scales
+                if scale_name in structured_competencies['Ability']:
+                    competencies = structured_competencies['Ability'][scale_name]
+                    sorted_competencies = sorted(competencies, key=lambda x: x['data_value'], reverse=True)
+                    
+                    framework_text += f"  {scale_name.upper()}:\n"
+                    for i, comp in enumerate(sorted_competencies[:3]): # Take top 3
+                        score = comp['data_value'] if comp['data_value'] is not None else 'N/A';
+                        framework_text += f"    {i + 1}. {comp['element_name']} ({score:.1f})\n"
+                    framework_text += "\n"
+
+        return framework_text
+    
+    def _create_structural_data(self, structured_competencies: Dict[str, Any]) -> Dict[str, Any]:
+        """Create structural data for diagram generation, now with filtered competencies only."""
+        structure = {
+            'nodes': [],
+            'edges': [],
+            'categories': [] # Will be populated dynamically
+        }
+        
+        node_id_counter = 0
+        
+        # Add root node for the job
+        job_node_id = f"node_{node_id_counter}"
+        structure['nodes'].append({
+            'id': job_node_id,
+            'label': 'Job Role',
+            'type': 'job_root',
+            'level': 0,
+            'group': 'job_root'
+        })
+        node_id_counter += 1
+
+        # Add element type nodes (Skills, Abilities)
+        for element_type, scales in structured_competencies.items():
+            type_node_id = f"node_{node_id_counter}"
+            structure['nodes'].append({
+                'id': type_node_id,
+                'label': element_type,
+                'type': 'element_type',
+                'level': 1,
+                'group': 'element_type'
+            })
+            structure['edges'].append({
+                'from': job_node_id,
+                'to': type_node_id,
+                'weight': 1 # Arbitrary weight
+            })
+            node_id_counter += 1
+
+            # Add scale nodes (Importance, Level)
+            for scale_name, competencies in scales.items():
+                scale_node_id = f"node_{node_id_counter}"
+                structure['nodes'].append({
+                    'id': scale_node_id,
+                    'label': scale_name.replace('_', ' '),
+                    'type': 'scale',
+                    'level': 2,
+                    'group': 'scale'
+                })
+                structure['edges'].append({
+                    'from': type_node_id,
+                    'to': scale_node_id,
+                    'weight': 1 # Arbitrary weight
+                })
+                node_id_counter += 1
+
+                # Add competency nodes (now filtered to top 3 only)
+                for comp in competencies: # This is now already filtered to top 3
+                    comp_node_id = f"node_{node_id_counter}"
+                    structure['nodes'].append({
+                        'id': comp_node_id,
+                        'label': f"{comp['element_name']} ({comp['data_value']:.1f})",
+                        'type': 'competency',
+                        'level': 3,
+                        'importance': comp['data_value'],
+                        'element_id': comp['element_id'],
+                        'scale_id': comp['scale_id'],
+                        'element_type': element_type,
+                        'scale_name': scale_name,
+                        'group': 'competency'
+                    })
+                    structure['edges'].append({
+                        'from': scale_node_id,
+                        'to': comp_node_id,
+                        'weight': comp['data_value']
+                    })
+                    node_id_counter += 1
+        
+        # Populate categories for potential frontend filtering/display
+        structure['categories'] = list(structured_competencies.keys()) # e.g., ['Skill', 'Ability']
+        for element_type, scales in structured_competencies.items():
+            for scale_name in scales.keys():
+                structure['categories'].append(f"{element_type} - {scale_name.replace('_', ' ')}")
+
+        return structure
+
+
+def run(analyzer: CompetencyAnalyzer, db: StubVectorDB, codes: List[str]) -> List[Dict[str, Any]]:
+    results = []
+    for code in codes:
+        db.next_code = code
+        results.append(analyzer.analyze_job_role(f"Occupation {code}"))
+    return results
+
+
+def interleaved_best(fns, repeat: int):
+    """Best wall time of each function, alternating runs so machine noise hits all of them alike"""
+    best = [float('inf')] * len(fns)
+    for _ in range(repeat):
+        for i, fn in enumerate(fns):
+            start = time.perf_counter()
+            fn()
+            best[i] = min(best[i], time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--occupations', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    store = CompetencyProfileStore.from_dataframe(synthetic_frame(occupations=args.occupations))
+    codes = list(store.profiles)
+    db = StubVectorDB(store)
+
+    legacy_analyzer = LegacyAnalyzer(db)
+    new_analyzer = CompetencyAnalyzer(db)
+    assert run(legacy_analyzer, db, codes) == run(new_analyzer, db, codes), \
+        "single-pass framework differs from the legacy output"
+
+    def legacy_framework():
+        for code in codes:
+            filtered = legacy_analyzer._filter_top_competencies(store.get(code))
+            legacy_analyzer._generate_recommendations(filtered)
+            legacy_analyzer._format_competency_framework_summary(filtered)
+            legacy_analyzer._create_structural_data(filtered)
+
+    def new_framework():
+        for code in codes:
+            new_analyzer._analyze_occupation(store.get(code))
+
+    legacy_call, new_call, legacy_build, new_build = interleaved_best([
+        lambda: run(legacy_analyzer, db, codes),
+        lambda: run(new_analyzer, db, codes),
+        legacy_framework,
+        new_framework
+    ], args.repeat)
+
+    per_call = lambda seconds: seconds / len(codes) * 1e6
+    print(f"{len(codes)} occupations, best of {args.repeat} interleaved runs")
+    print(f"analyze_job_role:   legacy {per_call(legacy_call):8.1f} us/call   "
+          f"single-pass {per_call(new_call):8.1f} us/call   speedup {legacy_call / new_call:5.2f}x")
+    print(f"framework building: legacy {per_call(legacy_build):8.1f} us/call   "
+          f"single-pass {per_call(new_build):8.1f} us/call   speedup {legacy_build / new_build:5.2f}x")
@@ -0,0 +1,192 @@
+"""
+Load benchmark of POST /api/chat with the original logging against the
+current one. The original printed the full reply and analysis result, then
+logged them again with f-strings, all on the request thread. The current
+route logs one lazily built summary line through the queue listener.
+
+Requests go through the Flask app in-process from ``--threads`` client
+threads, over synthetic O*NET-shaped data: random occupation vectors, a
+stand-in query encoder, and the embedding and analysis caches disabled, so every request
+builds a full analysis. Log output goes to a line-buffered file, like stdout
+under PYTHONUNBUFFERED=1 in a container. Timing for the current logging
+includes draining the log queue.
+
+    python scripts/benchmark_chat_logging.py [--requests 2000] [--threads 8] [--log-file chat.log]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+import argparse
+import threading
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--requests', type=int, default=2000, help="requests per mode")
+parser.add_argument('--threads', type=int, default=8, help="concurrent client threads")
+parser.add_argument('--occupations', type=int, default=900)
+parser.add_argument('--log-file', default=None, help="where both modes write their logs (default: a temp file)")
+args = parser.parse_args()
+
+# Point prints and the app's log handler at the log file before the app configures logging
+results_out = sys.stdout
+log_path = args.log_file or os.path.join(tempfile.mkdtemp(), 'chat.log')
+log_file = open(log_path, 'w', buffering=1)
+sys.stdout = sys.stderr = log_file
+
+os.environ.update(
+    VECTOR_INDEX_BACKEND='local',
+    EMBEDDING_SNAPSHOT_DIR=os.path.join(tempfile.mkdtemp(), 'no-snapshot'),
+    COMPETENCY_PROFILE_PATH=os.path.join(tempfile.mkdtemp(), 'no-profiles.json.gz'),
+    MODEL_LOAD='lazy',
+    ANALYSIS_CACHE_BYTES='0',
+    EMBEDDING_CACHE_SIZE='0',
+    ENCODE_BATCHING='false',
+    INDEX_REFRESH_INTERVAL='inf'
+)
+os.chdir(BACKEND_DIR)
+
+from flask import request, jsonify  # noqa: E402
+import app as flask_app  # noqa: E402
+import structured_logging  # noqa: E402
+from vector_index import LocalVectorIndex  # noqa: E402
+from competency_profiles import CompetencyProfileStore  # noqa: E402
+from chat_responses import is_job_title_message, analysis_reply, search_reply  # noqa: E402
+from benchmark_aggregation import synthetic_frame  # noqa: E402
+
+sys.stderr = sys.__stderr__
+
+logger = logging.getLogger('app')
+
+
+class StandInEncoder:
+    """Deterministic unit vectors per text, so no embedding model is needed"""
+
+    def encode(self, texts, **kwargs):
+        vectors = np.stack([
+            np.random.default_rng(abs(hash(text)) % 2 ** 32).standard_normal(384).astype(np.float32)
+            for text in texts
+        ])
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@flask_app.app.route("/api/chat-original-logging", methods=["POST"])
+def chat_original_logging():
+    """/api/chat with the logging it had before the summary line"""
+    message = request.get_json()["message"].strip()
+    if is_job_title_message(message):
+        result = flask_app.analyzer.analyze_job_role(message)
+        response = analysis_reply(message, result)
+
+        print(f"Response: {response}")
+        print(f"Result: {result}")
+        print(f"Type: job_analysis")
+
+        logger.info(f"first block ======== Chat response: {response}")
+        logger.info(f"first block ======== Analysis result: {result}")
+        logger.info(f"first block ======== Type: job_analysis")
+        return jsonify({"success": True, "data": {"response": response, "analysis": result, "type": "job_analysis"}})
+
+    similar_jobs = flask_app.vector_db.search_similar_jobs(message, 3)
+    response = search_reply(message, similar_jobs)
+
+    print(f"Response: {response}")
+    print(f"Similar Jobs: {similar_jobs}")
+    print(f"Type: search")
+    logger.info(f"Chat response: {response}")
+    logger.info(f"Similar jobs: {similar_jobs}")
+    logger.info(f"Type: search")
+    return jsonify({"success": True, "data": {"response": response, "similar_jobs": similar_jobs, "type": "search"}})
+
+
+def set_up_data(occupations: int):
+    flask_app.initialize_components(start_model=False)
+    df = synthetic_frame(occupations)
+    store = CompetencyProfileStore.from_dataframe(df)
+    jobs = df[['onet_soc_code', 'title', 'description']].drop_duplicates('onet_soc_code')
+    metadata = [
+        {'onet_soc_code': code, 'title': title, 'description': description, 'competency_count': 174}
+        for code, title, description in jobs.values
+    ]
+    vectors = StandInEncoder().encode([f"{meta['title']}. {meta['description']}" for meta in metadata])
+
+    vector_db = flask_app.vector_db
+    vector_db._model = StandInEncoder()
+    vector_db.index = LocalVectorIndex.from_arrays(vectors, [f"job_{meta['onet_soc_code']}" for meta in metadata], metadata)
+    vector_db.profile_store = store
+    return [meta['title'] for meta in metadata]
+
+
+def run_load(path: str, messages, threads: int):
+    """(requests per second, latencies in ms) for ``messages`` split across client threads"""
+    latencies = [[] for _ in range(threads)]
+
+    def client(i):
+        test_client = flask_app.app.test_client()
+        for message in messages[i::threads]:
+            start = time.perf_counter()
+            response = test_client.post(path, json={'message': message})
+            latencies[i].append(time.perf_counter() - start)
+            assert response.status_code == 200, response.get_data(as_text=True)
+
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    log_file.flush()
+    elapsed = time.perf_counter() - start
+    return len(messages) / elapsed, np.concatenate([np.array(l) for l in latencies]) * 1000
+
+
+def wait_for_log_queue():
+    listener = structured_logging._listener
+    while listener is not None and not listener.queue.empty():
+        time.sleep(0.001)
+
+
+if __name__ == "__main__":
+    titles = set_up_data(args.occupations)
+    rng = np.random.default_rng(0)
+    # Four in five messages name a job (full analysis), the rest are plain searches
+    messages = [
+        f"{titles[i]} engineer" if rng.random() < 0.8 else f"{titles[i]} work"
+        for i in rng.integers(0, len(titles), args.requests)
+    ]
+
+    queued_handlers = logging.getLogger().handlers
+    synchronous_handler = logging.StreamHandler(log_file)
+    synchronous_handler.setFormatter(logging.Formatter('%(levelname)s:%(name)s:%(message)s'))
+
+    # Warm up both routes (imports, first-request set-up)
+    run_load("/api/chat", messages[:50], args.threads)
+    run_load("/api/chat-original-logging", messages[:50], args.threads)
+
+    logging.getLogger().handlers = [synchronous_handler]
+    before = os.path.getsize(log_path)
+    original_rate, original_latency = run_load("/api/chat-original-logging", messages, args.threads)
+    original_bytes = os.path.getsize(log_path) - before
+
+    logging.getLogger().handlers = queued_handlers
+    before = os.path.getsize(log_path)
+    start = time.perf_counter()
+    current_rate, current_latency = run_load("/api/chat", messages, args.threads)
+    wait_for_log_queue()
+    current_rate = len(messages) / (time.perf_counter() - start)
+    structured_logging.stop_logging()
+    current_bytes = os.path.getsize(log_path) - before
+
+    print(f"{args.requests} requests, {args.threads} client threads, logs in {log_path}", file=results_out)
+    for name, rate, latency, size in (
+        ("original logging", original_rate, original_latency, original_bytes),
+        ("summary logging", current_rate, current_latency, current_bytes)
+    ):
+        print(f"  {name:<17} {rate:8.1f} req/s  p50 {np.percentile(latency, 50):6.2f} ms  "
+              f"p99 {np.percentile(latency, 99):6.2f} ms  log {size / len(messages):8.0f} B/request",
+              file=results_out)
+    print(f"  throughput gain: {current_rate / original_rate:.2f}x", file=results_out)
@@ -0,0 +1,91 @@
+"""
+Compares bulk-embedding backends on the occupation descriptions used for
+the vector index: sentences/sec and cosine agreement with the fp32 PyTorch
+baseline (the original single-process ``model.encode`` call).
+
+Texts come from the cleaned Parquet cache when present, otherwise from
+synthetic O*NET-shaped data. The ONNX backend is included when the quantised
+model exists (see export_onnx_encoder.py).
+
+    python scripts/benchmark_encoders.py [--processes 8] [--batch-size 64]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from sentence_transformers import SentenceTransformer  # noqa: E402
+from bulk_encoding import encode_bulk, OnnxEncoder  # noqa: E402
+from competency_profiles import build_job_descriptions  # noqa: E402
+from benchmark_aggregation import synthetic_frame  # noqa: E402
+
+PARQUET_PATH = '../data/cache/job_competencies.parquet'
+ONNX_MODEL_PATH = '../data/models/all-MiniLM-L6-v2-int8.onnx'
+
+
+def load_texts(parquet_path):
+    if os.path.exists(parquet_path):
+        print(f"Using descriptions built from {parquet_path}")
+        df = pd.read_parquet(parquet_path)
+        df = df[df['data_value'].notna()]
+    else:
+        print("Using synthetic O*NET-shaped descriptions")
+        df = synthetic_frame()
+    texts, _ = build_job_descriptions(df)
+    return texts
+
+
+def cosine_agreement(baseline, candidate):
+    """Row-wise cosine similarity between two embedding matrices"""
+    baseline = baseline / np.linalg.norm(baseline, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    return np.sum(baseline * candidate, axis=1)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, np.asarray(result, dtype=np.float32)
+
+
+def report(name, seconds, count, embeddings, baseline):
+    agreement = cosine_agreement(baseline, embeddings)
+    print(f"{name:<34} {count / seconds:10.1f} sent/s   "
+          f"cosine vs fp32 mean {agreement.mean():.5f}  min {agreement.min():.5f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--parquet', default=PARQUET_PATH)
+    parser.add_argument('--onnx-model', default=ONNX_MODEL_PATH)
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--limit', type=int, default=None, help="only encode the first N descriptions")
+    args = parser.parse_args()
+
+    texts = load_texts(args.parquet)[:args.limit]
+    model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
+    model.encode(texts[:8])  # warm-up
+    print(f"{len(texts)} descriptions, {os.cpu_count()} CPUs\n")
+
+    seconds, baseline = timed(lambda: model.encode(texts))
+    report("torch fp32 (original encode)", seconds, len(texts), baseline, baseline)
+
+    seconds, embeddings = timed(lambda: encode_bulk(model, texts, args.batch_size, processes=1))
+    report(f"torch length-sorted b={args.batch_size}", seconds, len(texts), embeddings, baseline)
+
+    if args.processes > 1:
+        seconds, embeddings = timed(lambda: encode_bulk(model, texts, args.batch_size, processes=args.processes))
+        report(f"torch {args.processes} processes", seconds, len(texts), embeddings, baseline)
+
+    if os.path.exists(args.onnx_model):
+        encoder = OnnxEncoder(args.onnx_model)
+        encoder.encode(texts[:8])  # warm-up
+        seconds, embeddings = timed(lambda: encoder.encode(texts, batch_size=args.batch_size))
+        report("onnx int8", seconds, len(texts), embeddings, baseline)
+    else:
+        print(f"(skipping ONNX: {args.onnx_model} not found; run export_onnx_encoder.py first)")
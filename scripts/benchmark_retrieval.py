@@ -0,0 +1,214 @@
+"""
+Latency and recall@k of job search with dense vectors only, the lexical
+index only, and the hybrid path used by ``search_similar_jobs``. The hybrid
+path answers confident title matches from the lexical index and fuses dense
+and lexical rankings for everything else.
+
+Occupations and their vectors come from the embedding snapshot when present
+(exactly what the service searches); otherwise titles and descriptions are
+read from data/OccupationData.xlsx and embedded here. Two labelled query
+sets are evaluated:
+
+- title-derived: exact titles, lower-case singular titles and one-typo
+  titles for a sample of occupations, generated from the index itself
+- held-out: ``--queries`` (JSON lines ``{"query", "onet_soc_code",
+  "category"}``), by default the hand-written synonyms and descriptions in
+  scripts/retrieval_queries.jsonl
+
+The run ends with a dense versus hybrid comparison of recall and latency
+per set. Without the embedding model only the lexical mode runs.
+
+    python scripts/benchmark_retrieval.py [--k 5] [--sample 300] [--queries labelled.jsonl]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from collections import defaultdict
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+# Measure uncached, unbatched request latency
+os.environ['EMBEDDING_CACHE_SIZE'] = '0'
+os.environ['ENCODE_BATCHING'] = 'false'
+os.environ.setdefault('VECTOR_INDEX_BACKEND', 'local')
+# The indexes are set up by hand below; never swap in the snapshot behind them
+os.environ['INDEX_REFRESH_INTERVAL'] = 'inf'
+
+from vector_db import CompetencyVectorDB  # noqa: E402
+from vector_index import LocalVectorIndex, load_snapshot  # noqa: E402
+from lexical_index import LexicalIndex  # noqa: E402
+
+OCCUPATIONS_PATH = '../data/OccupationData.xlsx'
+
+# Hand-written synonyms and plain-language descriptions, labelled with their O*NET code. None
+# is derived from the index's titles, so they measure retrieval on wording the index has not seen
+HELD_OUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'retrieval_queries.jsonl')
+
+
+def load_occupations(vector_db):
+    """(ids, matrix or None, metadata) from the snapshot, else from the O*NET occupation sheet"""
+    snapshot = load_snapshot(vector_db.snapshot_dir, vector_db.model_name, mmap=True)
+    if snapshot is not None:
+        matrix, ids, metadata, _ = snapshot
+        print(f"Using the embedding snapshot in {vector_db.snapshot_dir} ({len(ids)} occupations)")
+        return ids, matrix, metadata
+
+    import pandas as pd
+
+    print(f"No snapshot; using titles and descriptions from {OCCUPATIONS_PATH}")
+    df = pd.read_excel(OCCUPATIONS_PATH)
+    metadata = [
+        {'onet_soc_code': code, 'title': title, 'description': description, 'competency_count': 0}
+        for code, title, description in df[['O*NET-SOC Code', 'Title', 'Description']].values
+    ]
+    return [f"job_{meta['onet_soc_code']}" for meta in metadata], None, metadata
+
+
+def _typo(title, rng):
+    """``title`` with one character dropped or two swapped inside its longest word"""
+    words = title.split()
+    i = max(range(len(words)), key=lambda j: len(words[j]))
+    word = words[i]
+    if len(word) < 5:
+        return None
+    position = rng.randrange(1, len(word) - 2)
+    if rng.random() < 0.5:
+        word = word[:position] + word[position + 1:]
+    else:
+        word = word[:position] + word[position + 1] + word[position] + word[position + 2:]
+    return ' '.join(words[:i] + [word] + words[i + 1:])
+
+
+def generated_queries(metadata, sample, seed=7):
+    """(category, query, code) title variants for a sample of the indexed occupations"""
+    rng = random.Random(seed)
+    chosen = rng.sample(metadata, min(sample, len(metadata)))
+    queries = []
+    for meta in chosen:
+        title, code = meta['title'], meta['onet_soc_code']
+        queries.append(('exact', title, code))
+        queries.append(('lower-singular', ' '.join(
+            word[:-1] if word.endswith('s') and not word.endswith('ss') else word
+            for word in title.lower().replace(',', '').split()
+        ), code))
+        typo = _typo(title, rng)
+        if typo:
+            queries.append(('typo', typo, code))
+    return queries
+
+
+def held_out_queries(path, metadata):
+    """(category, query, code) rows of a labelled set, skipping codes the index does not hold"""
+    codes = {meta['onet_soc_code'] for meta in metadata}
+    with open(path, encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    missing = sum(row['onet_soc_code'] not in codes for row in rows)
+    if missing:
+        print(f"Skipping {missing} held-out queries labelled with occupations not in the index")
+    return [(row.get('category', 'labelled'), row['query'], row['onet_soc_code'])
+            for row in rows if row['onet_soc_code'] in codes]
+
+
+def lexical_only(vector_db, query, k):
+    """Lexical results without any dense search: the fast path, else the fused lexical ranking"""
+    fast = vector_db.lexical_fast_path(query, k)
+    if fast is not None:
+        return fast
+    lexical = vector_db.lexical_index
+    ranking, similarities = lexical.ranking(query, depth=k, rrf_k=vector_db.rrf_k)
+    return vector_db.format_matches([lexical.match(p, float(similarities[p])) for p in ranking[:k]])
+
+
+def evaluate(name, search, queries, k):
+    """Print latency and per-category recall; return the overall figures"""
+    hits_1 = defaultdict(list)
+    hits_k = defaultdict(list)
+    latencies = []
+    fast_path = 0
+    for category, query, code in queries:
+        start = time.perf_counter()
+        results = search(query, k)
+        latencies.append(time.perf_counter() - start)
+        codes = [job['onet_soc_code'] for job in results]
+        fast_path += bool(results) and results[0].get('retrieval') == 'lexical' and all(
+            job.get('retrieval') == 'lexical' for job in results)
+        for key in (category, 'all'):
+            hits_1[key].append(codes[:1] == [code])
+            hits_k[key].append(code in codes[:k])
+
+    latencies = np.array(latencies) * 1000
+    print(f"\n{name}: mean {latencies.mean():.2f} ms  p50 {np.percentile(latencies, 50):.2f} ms  "
+          f"p95 {np.percentile(latencies, 95):.2f} ms  answered lexically {fast_path / len(queries):.0%}")
+    for key in sorted(hits_1, key=lambda key: (key == 'all', key)):
+        print(f"  {key:<15} n={len(hits_1[key]):<5} recall@1 {np.mean(hits_1[key]):.3f}  "
+              f"recall@{k} {np.mean(hits_k[key]):.3f}")
+    return {
+        'recall@1': float(np.mean(hits_1['all'])),
+        'recall@k': float(np.mean(hits_k['all'])),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95))
+    }
+
+
+def compare(results, k):
+    """Dense versus hybrid, side by side for each query set"""
+    print(f"\n{'query set':<15} {'mode':<7} {'recall@1':>9} {'recall@' + str(k):>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for query_set, modes in results.items():
+        for mode, figures in modes.items():
+            print(f"{query_set:<15} {mode:<7} {figures['recall@1']:>9.3f} {figures['recall@k']:>9.3f} "
+                  f"{figures['p50_ms']:>8.2f} {figures['p95_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--sample', type=int, default=300, help="occupations to generate title queries for")
+    parser.add_argument('--queries', default=HELD_OUT_PATH, help="held-out labelled JSON-lines query set")
+    args = parser.parse_args()
+    os.chdir(BACKEND_DIR)
+
+    hybrid = CompetencyVectorDB()
+    ids, matrix, metadata = load_occupations(hybrid)
+    start = time.perf_counter()
+    hybrid.lexical_index = LexicalIndex(ids, metadata)
+    print(f"Lexical index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    query_sets = {
+        'title-derived': generated_queries(metadata, args.sample),
+        'held-out': held_out_queries(args.queries, metadata)
+    }
+    for query_set, queries in query_sets.items():
+        print(f"{query_set}: {len(queries)} labelled queries, k={args.k}")
+
+    for query_set, queries in query_sets.items():
+        evaluate(f"[{query_set}] lexical only", lambda query, k: lexical_only(hybrid, query, k),
+                 queries, args.k)
+
+    try:
+        model = hybrid.model
+    except Exception as e:
+        print(f"\nEmbedding model unavailable ({e}); skipping dense and hybrid modes")
+        sys.exit(0)
+
+    if matrix is None:
+        texts = [f"{meta['title']}. {meta['description']}" for meta in metadata]
+        matrix = model.encode(texts, batch_size=64)
+    hybrid.index = LocalVectorIndex.from_arrays(LocalVectorIndex._normalize(matrix), ids, metadata)
+    dense = CompetencyVectorDB()
+    dense._model = model
+    dense.index = hybrid.index
+    model.encode(['warm-up'])
+
+    results = {}
+    for query_set, queries in query_sets.items():
+        results[query_set] = {
+            'dense': evaluate(f"[{query_set}] dense only", dense.search_similar_jobs, queries, args.k),
+            'hybrid': evaluate(f"[{query_set}] hybrid (lexical fast path + RRF)", hybrid.search_similar_jobs,
+                               queries, args.k)
+        }
+    compare(results, args.k)
@@ -0,0 +1,94 @@
+"""
+Benchmarks index writes against the offline StubIndex: the original
+build-everything-then-upsert-serially approach versus the streaming
+UpsertPipeline at several concurrency levels.
+
+Reports wall time and peak Python memory (tracemalloc) per corpus size, to
+check that pipeline memory stays flat as the corpus grows and that wall time
+falls as workers are added.
+
+    python scripts/benchmark_upserts.py [--sizes 1000 5000 20000] [--workers 1 4 8] [--latency-ms 50]
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from vector_index import StubIndex  # noqa: E402
+from upsert_pipeline import UpsertPipeline  # noqa: E402
+
+DIMENSION = 384
+CHUNK_SIZE = 512
+DESCRIPTION = "Job Title: Occupation. Description: " + "Performs duties of the occupation. " * 12
+
+
+def embedding_chunks(count: int, seed: int = 0):
+    """Yield (start, embeddings) chunks, as the bulk encoder does"""
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, CHUNK_SIZE):
+        yield start, rng.random((min(CHUNK_SIZE, count - start), DIMENSION), dtype=np.float32)
+
+
+def make_vector(i: int, embedding: np.ndarray):
+    return {
+        'id': f"job_{i:06d}",
+        'values': embedding.tolist(),
+        'metadata': {'onet_soc_code': f"{i:06d}", 'title': f"Occupation {i}", 'text': DESCRIPTION}
+    }
+
+
+def legacy_upsert(index, count: int):
+    """The original approach: materialise every vector, then upsert serial batches of 100"""
+    vectors = []
+    for start, chunk in embedding_chunks(count):
+        for offset, embedding in enumerate(chunk):
+            vectors.append(make_vector(start + offset, embedding))
+    for i in range(0, len(vectors), 100):
+        index.upsert(vectors=vectors[i:i + 100])
+
+
+def pipeline_upsert(index, count: int, workers: int):
+    with UpsertPipeline(index, workers=workers) as pipeline:
+        for start, chunk in embedding_chunks(count):
+            for offset, embedding in enumerate(chunk):
+                pipeline.put(make_vector(start + offset, embedding))
+    return pipeline.stats()
+
+
+def measure(fn):
+    """Wall time of one run, and peak traced memory of a second (tracemalloc slows allocation)"""
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--latency-ms', type=float, default=50.0, help="simulated round-trip per request")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="fraction of upserts that fail")
+    args = parser.parse_args()
+
+    print(f"{'vectors':>8}  {'writer':<14} {'wall s':>8} {'peak MB':>9} {'retries':>8}")
+    for size in args.sizes:
+        elapsed, peak, _ = measure(lambda: legacy_upsert(StubIndex(DIMENSION, latency_ms=args.latency_ms), size))
+        print(f"{size:>8}  {'serial (old)':<14} {elapsed:>8.2f} {peak:>9.1f} {'-':>8}")
+
+        for workers in args.workers:
+            def run():
+                index = StubIndex(DIMENSION, latency_ms=args.latency_ms, failure_rate=args.failure_rate, seed=0)
+                stats = pipeline_upsert(index, size, workers)
+                assert index.describe_index_stats()['total_vector_count'] == size
+                return stats
+            elapsed, peak, stats = measure(run)
+            print(f"{size:>8}  {f'pipeline x{workers}':<14} {elapsed:>8.2f} {peak:>9.1f} {stats['retries']:>8}")
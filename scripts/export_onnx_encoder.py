@@ -0,0 +1,58 @@
+"""
+Exports all-MiniLM-L6-v2 to ONNX and quantises its weights to int8 for the
+ONNX Runtime bulk encoder (BULK_ENCODER=onnx).
+
+    python scripts/export_onnx_encoder.py --output ../data/models/all-MiniLM-L6-v2-int8.onnx
+"""
+import os
+import argparse
+import torch
+from sentence_transformers import SentenceTransformer
+from onnxruntime.quantization import quantize_dynamic, QuantType
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+DEFAULT_OUTPUT = '../data/models/all-MiniLM-L6-v2-int8.onnx'
+
+
+def export_onnx(model_name, fp32_path):
+    """Export the model's transformer (without pooling) to ONNX with dynamic batch and sequence axes"""
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0].auto_model.eval()
+    dummy = model.tokenizer(['Job Title: Software Developers.'], return_tensors='pt')
+
+    axes = {0: 'batch', 1: 'sequence'}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            (dummy['input_ids'], dummy['attention_mask'], dummy['token_type_ids']),
+            fp32_path,
+            input_names=['input_ids', 'attention_mask', 'token_type_ids'],
+            output_names=['last_hidden_state', 'pooler_output'],
+            dynamic_axes={
+                'input_ids': axes,
+                'attention_mask': axes,
+                'token_type_ids': axes,
+                'last_hidden_state': axes,
+                'pooler_output': {0: 'batch'}
+            },
+            opset_version=14
+        )
+    print(f"Exported fp32 ONNX model to {fp32_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export an int8-quantised ONNX encoder.")
+    parser.add_argument('--model', default=MODEL_NAME)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="path of the quantised model")
+    parser.add_argument('--keep-fp32', action='store_true', help="keep the unquantised export next to it")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    fp32_path = os.path.splitext(args.output)[0] + '-fp32.onnx'
+
+    export_onnx(args.model, fp32_path)
+    quantize_dynamic(fp32_path, args.output, weight_type=QuantType.QInt8)
+    print(f"Wrote int8-quantised model to {args.output}")
+
+    if not args.keep_fp32:
+        os.remove(fp32_path)
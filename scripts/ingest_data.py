@@ -1,7 +1,13 @@
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 from dotenv import load_dotenv
+import argparse
+import hashlib
+import json
+import csv
+import io
 import os
+from datetime import datetime, timezone
 
 # Load environment variables from .env file
 load_dotenv()
@@ -10,19 +16,192 @@ OCCUPATION_DATA_PATH = '../data/OccupationData.xlsx'
 SKILLS_DATA_PATH = '../data/Skills.xlsx'
 ABILITIES_DATA_PATH = '../data/Abilities.xlsx' # New: Path for Abilities data
 DATABASE_URL = os.getenv('DATABASE_URL')
+CACHE_DIR = os.getenv('INGEST_CACHE_DIR', '../data/cache') # Parquet cache of parsed workbooks
+COMPETENCIES_PARQUET_NAME = 'job_competencies.parquet' # Cleaned output, readable by the backend
 
 ROW_LIMIT = 2200 # Limit for processing rows, adjust as needed for your 80k+ line file
+CHUNK_SIZE = 10000 # Rows per chunk in streaming mode (no row limit applies there)
+
+# Common expected columns for skills and abilities
+ELEMENT_COLUMNS = [
+    'onet_soc_code', 'element_id', 'element_name', 'scale_id', 'scale_name',
+    'data_value', 'n', 'standard_error', 'lower_ci_bound', 'upper_ci_bound',
+    'recommend_suppress', 'not_relevant', 'date', 'domain_source'
+]
+ELEMENT_TYPES = {'Skills': 'Skill', 'Abilities': 'Ability'}
+
+# Normalised schema: occupations and categorical lookups in their own tables,
+# compact numeric types for the values, and a job_competencies view for readers
+NORMALIZED_TABLES = [
+    'competency_values', 'occupations', 'element_types',
+    'competency_elements', 'competency_scales', 'domain_sources'
+]
+
+CREATE_NORMALIZED_SQL = """
+CREATE TABLE occupations (
+    occupation_id SMALLINT PRIMARY KEY,
+    onet_soc_code VARCHAR(10) NOT NULL,
+    title VARCHAR(255),
+    description TEXT
+);
+CREATE TABLE element_types (
+    element_type_id SMALLINT PRIMARY KEY,
+    element_type VARCHAR(50) NOT NULL
+);
+CREATE TABLE competency_elements (
+    element_key SMALLINT PRIMARY KEY,
+    element_id VARCHAR(20) NOT NULL,
+    element_name VARCHAR(255),
+    element_type_id SMALLINT NOT NULL
+);
+CREATE TABLE competency_scales (
+    scale_key SMALLINT PRIMARY KEY,
+    scale_id VARCHAR(10) NOT NULL,
+    scale_name VARCHAR(255)
+);
+CREATE TABLE domain_sources (
+    domain_source_id SMALLINT PRIMARY KEY,
+    domain_source VARCHAR(255) NOT NULL
+);
+CREATE TABLE competency_values (
+    occupation_id SMALLINT NOT NULL,
+    element_type_id SMALLINT NOT NULL,
+    scale_key SMALLINT NOT NULL,
+    element_key SMALLINT NOT NULL,
+    data_value REAL,
+    n SMALLINT,
+    standard_error REAL,
+    lower_ci_bound REAL,
+    upper_ci_bound REAL,
+    recommend_suppress VARCHAR(10),
+    not_relevant VARCHAR(10),
+    date DATE,
+    domain_source_id SMALLINT
+);
+"""
+
+COMPETENCY_VALUE_COLUMNS = [
+    'occupation_id', 'element_type_id', 'scale_key', 'element_key', 'data_value', 'n',
+    'standard_error', 'lower_ci_bound', 'upper_ci_bound', 'recommend_suppress',
+    'not_relevant', 'date', 'domain_source_id'
+]
+
+# Same columns the wide table exposes, so backend queries work unchanged
+CREATE_JOB_COMPETENCIES_VIEW_SQL = """
+CREATE VIEW job_competencies AS
+SELECT
+    o.onet_soc_code,
+    o.title,
+    o.description,
+    e.element_id,
+    e.element_name,
+    t.element_type,
+    s.scale_id,
+    s.scale_name,
+    v.data_value::NUMERIC AS data_value,
+    v.n::INTEGER AS n,
+    v.standard_error::NUMERIC AS standard_error,
+    v.lower_ci_bound::NUMERIC AS lower_ci_bound,
+    v.upper_ci_bound::NUMERIC AS upper_ci_bound,
+    v.recommend_suppress,
+    v.not_relevant,
+    v.date,
+    d.domain_source
+FROM competency_values v
+JOIN occupations o ON o.occupation_id = v.occupation_id
+JOIN element_types t ON t.element_type_id = v.element_type_id
+JOIN competency_scales s ON s.scale_key = v.scale_key
+JOIN competency_elements e ON e.element_key = v.element_key
+LEFT JOIN domain_sources d ON d.domain_source_id = v.domain_source_id;
+"""
+
+# Ingest loads into a staging schema and swaps it into the live one; the
+# replaced generation is kept for rollback
+LIVE_SCHEMA = 'public'
+STAGING_SCHEMA = 'ingest_staging'
+PREVIOUS_SCHEMA = 'ingest_previous'
+# One row stamping the data with its ingest generation; it moves with the tables it describes,
+# and the backend only uses the cleaned Parquet copy when the stamps agree
+INGEST_METADATA_TABLE = 'ingest_metadata'
+MANAGED_RELATIONS = ['job_competencies', INGEST_METADATA_TABLE] + NORMALIZED_TABLES
+MIN_COVERAGE = 0.9 # Staged occupations must be at least this fraction of the live ones
+SWAP_LOCK_TIMEOUT = '10s'
+
+# Built after the bulk load (cheaper than maintaining them row by row), then ANALYZE
+POST_LOAD_SQL = {
+    'wide': [
+        "CREATE INDEX job_competencies_lookup_idx "
+        "ON job_competencies (onet_soc_code, element_type, scale_name, data_value DESC);",
+        "ANALYZE job_competencies;"
+    ],
+    'normalized': [
+        "CREATE UNIQUE INDEX occupations_onet_soc_code_idx ON occupations (onet_soc_code);",
+        "CREATE INDEX competency_values_lookup_idx "
+        "ON competency_values (occupation_id, element_type_id, scale_key, data_value DESC);",
+    ] + [f"ANALYZE {table};" for table in NORMALIZED_TABLES]
+}
+
+# Raw columns worth caching (after name standardisation); everything else is pruned
+ONET_CODE_VARIANTS = ['onet-soc-code', 'onet-soc_code', 'o_net-soc-code', 'o_net-soc_code', 'o_net_soc_code']
+SOURCE_COLUMNS = set(ELEMENT_COLUMNS) | {'title', 'description'} | set(ONET_CODE_VARIANTS)
+
+# Columns of job_competencies in table order (excluding the serial id)
+JOB_COMPETENCY_COLUMNS = [
+    'onet_soc_code', 'title', 'description', 'element_id', 'element_name', 'element_type',
+    'scale_id', 'scale_name', 'data_value', 'n', 'standard_error', 'lower_ci_bound',
+    'upper_ci_bound', 'recommend_suppress', 'not_relevant', 'date', 'domain_source'
+]
+
+CREATE_INGEST_METADATA_SQL = f"""
+CREATE TABLE {INGEST_METADATA_TABLE} (
+    generation VARCHAR(64) NOT NULL,
+    row_count BIGINT NOT NULL,
+    loaded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+CREATE_JOB_COMPETENCIES_SQL = """
+CREATE TABLE job_competencies (
+    id SERIAL PRIMARY KEY,
+    onet_soc_code VARCHAR(255) NOT NULL,
+    title VARCHAR(255),
+    description TEXT,
+    element_id VARCHAR(255),
+    element_name VARCHAR(255),
+    element_type VARCHAR(50), 
+    scale_id VARCHAR(255),
+    scale_name VARCHAR(255),
+    data_value NUMERIC,
+    n INTEGER,
+    standard_error NUMERIC,
+    lower_ci_bound NUMERIC,
+    upper_ci_bound NUMERIC,
+    recommend_suppress VARCHAR(10),
+    not_relevant VARCHAR(10),
+    date DATE,
+    domain_source VARCHAR(255)
+);
+"""
 
 # --- 1. Data Extraction --- #
-def extract_data(occupation_path, skills_path, abilities_path, row_limit=None):
+def extract_data(occupation_path, skills_path, abilities_path, row_limit=None, cache_dir=None):
     """
     Extracts data from Occupation, Skills, and Abilities Excel files.
+    With a cache_dir, parsed workbooks are cached as Parquet and reused until the files change.
     """
     print(f"Extracting data from {occupation_path}, {skills_path}, and {abilities_path}...")
     try:
-        df_occupation = pd.read_excel(occupation_path, nrows=row_limit)
-        df_skills = pd.read_excel(skills_path, nrows=row_limit)
-        df_abilities = pd.read_excel(abilities_path, nrows=row_limit)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            manifest = _load_manifest(cache_dir)
+            df_occupation = read_source_cached(occupation_path, cache_dir, manifest, row_limit)
+            df_skills = read_source_cached(skills_path, cache_dir, manifest, row_limit)
+            df_abilities = read_source_cached(abilities_path, cache_dir, manifest, row_limit)
+            _save_manifest(cache_dir, manifest)
+        else:
+            df_occupation = pd.read_excel(occupation_path, nrows=row_limit)
+            df_skills = pd.read_excel(skills_path, nrows=row_limit)
+            df_abilities = pd.read_excel(abilities_path, nrows=row_limit)
         print("Data extracted successfully.")
         return df_occupation, df_skills, df_abilities
     except FileNotFoundError as e:
@@ -32,12 +211,88 @@ def extract_data(occupation_path, skills_path, abilities_path, row_limit=None):
         print(f"An error occurred during data extraction: {e}")
         exit()
 
+def _standardized_names(columns):
+    """Column names as the cleaning steps will see them"""
+    return (
+        pd.Index(columns).astype(str)
+        .str.strip()
+        .str.replace(" ", "_")
+        .str.replace("*", "", regex=False)
+        .str.lower()
+    )
+
+def _load_manifest(cache_dir):
+    path = os.path.join(cache_dir, 'manifest.json')
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {'sources': {}, 'outputs': {}}
+
+def _save_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, 'manifest.json')
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def source_fingerprint(path, manifest):
+    """
+    SHA-256 of a source file. The hash is only recomputed when the file's
+    mtime or size differ from the values recorded in the cache manifest.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    entry = manifest['sources'].get(key)
+    if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+        return entry['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    manifest['sources'][key] = {
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': digest.hexdigest()
+    }
+    return digest.hexdigest()
+
+def read_source_cached(path, cache_dir, manifest, row_limit=None):
+    """
+    Reads a source workbook through a typed, column-pruned Parquet cache.
+    The cache file is keyed on the source's content hash (and row limit), so
+    openpyxl only parses a workbook again after it has changed.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    cache_key = source_fingerprint(path, manifest)[:16] + (f"-n{row_limit}" if row_limit else "")
+    cache_path = os.path.join(cache_dir, f"{stem}-{cache_key}.parquet")
+
+    if os.path.exists(cache_path):
+        print(f"Using cached {cache_path}")
+        df = pd.read_parquet(cache_path)
+    else:
+        df = pd.read_excel(path, nrows=row_limit)
+        df = df.loc[:, _standardized_names(df.columns).isin(SOURCE_COLUMNS)]
+        # Text columns as pandas strings so mixed-type cells still serialise
+        for column in df.columns[df.dtypes == object]:
+            df[column] = df[column].astype('string')
+
+        # Drop caches of older versions of this file before writing the new one
+        for name in os.listdir(cache_dir):
+            if name.startswith(f"{stem}-") and name.endswith('.parquet'):
+                os.remove(os.path.join(cache_dir, name))
+        df.to_parquet(cache_path, index=False)
+        print(f"Cached parsed {path} as {cache_path}")
+
+    df.attrs['cache_key'] = cache_key
+    return df
+
 # --- 2. Data Cleaning and Transformation --- #
-def clean_and_standardize_element_df(df, type_name):
+def clean_and_standardize_element_df(df, type_name, verbose=True):
     """
     Cleans and standardizes column names and values in the skills or abilities DataFrame.
     """
-    print(f"Cleaning and standardizing {type_name} data...")
+    if verbose:
+        print(f"Cleaning and standardizing {type_name} data...")
 
     # Standardize column names
     df.columns = (
@@ -48,7 +303,8 @@ def clean_and_standardize_element_df(df, type_name):
         .str.lower()
     )
 
-    print(f"{type_name} DataFrame columns before renaming: {df.columns.tolist()}")
+    if verbose:
+        print(f"{type_name} DataFrame columns before renaming: {df.columns.tolist()}")
 
     # Rename all known variants of onet_soc_code
     df = df.rename(columns={
@@ -75,15 +331,14 @@ def clean_and_standardize_element_df(df, type_name):
     if 'date' in df.columns:
         df['date'] = pd.to_datetime(df['date'], format='%m/%Y', errors='coerce')
 
-    print(f"{type_name} DataFrame columns after cleaning: {df.columns.tolist()}")
+    if verbose:
+        print(f"{type_name} DataFrame columns after cleaning: {df.columns.tolist()}")
     return df
-def transform_data(df_occupation, df_skills, df_abilities):
+
+def clean_occupation_df(df_occupation):
     """
-    Cleans, transforms, and combines occupation, skills, and abilities data.
+    Cleans occupation data and returns the columns needed to enrich competency rows.
     """
-    print("Cleaning and transforming data...")
-
-    # 1. Clean and standardize occupation data
     df_occupation.columns = (
         df_occupation.columns
         .str.strip()
@@ -109,92 +364,523 @@ def transform_data(df_occupation, df_skills, df_abilities):
     df_occupation['description'] = df_occupation['description'].fillna('')
     print(f"Occupation DataFrame columns after cleaning: {df_occupation.columns.tolist()}")
 
-    # 2. Clean and standardize skills and abilities
-    df_skills_cleaned = clean_and_standardize_element_df(df_skills.copy(), "Skills")
-    df_abilities_cleaned = clean_and_standardize_element_df(df_abilities.copy(), "Abilities")
+    required_cols = ['onet_soc_code', 'title', 'description']
+    missing_cols = [col for col in required_cols if col not in df_occupation.columns]
+    if missing_cols:
+        raise KeyError(f"Missing columns in occupation data for merge: {missing_cols}")
 
-    # Common expected columns
-    columns_for_elements = [
-        'onet_soc_code', 'element_id', 'element_name', 'scale_id', 'scale_name',
-        'data_value', 'n', 'standard_error', 'lower_ci_bound', 'upper_ci_bound',
-        'recommend_suppress', 'not_relevant', 'date', 'domain_source'
-    ]
+    return df_occupation[required_cols]
 
-    # Filter and label
-    df_skills_filtered = df_skills_cleaned[df_skills_cleaned.columns.intersection(columns_for_elements)].copy()
-    df_abilities_filtered = df_abilities_cleaned[df_abilities_cleaned.columns.intersection(columns_for_elements)].copy()
+def transform_element_chunk(df, type_name, df_occupation_for_merge, verbose=True):
+    """
+    Cleans one skills or abilities frame (or chunk of one), labels its element type
+    and merges in the occupation title and description.
+    """
+    df_cleaned = clean_and_standardize_element_df(df, type_name, verbose=verbose)
+    df_filtered = df_cleaned[df_cleaned.columns.intersection(ELEMENT_COLUMNS)].copy()
+    df_filtered['element_type'] = ELEMENT_TYPES[type_name]
+    df_filtered = df_filtered.drop_duplicates()
+    return pd.merge(df_filtered, df_occupation_for_merge, on='onet_soc_code', how='left')
 
-    df_skills_filtered['element_type'] = 'Skill'
-    df_abilities_filtered['element_type'] = 'Ability'
+def transform_data(df_occupation, df_skills, df_abilities, cache_dir=None):
+    """
+    Cleans, transforms, and combines occupation, skills, and abilities data.
+    With a cache_dir, the cleaned frame published by the last successful load
+    (see publish_competencies_parquet) is reused while the cached sources it
+    was built from are unchanged.
+    """
+    keys = source_keys(df_occupation, df_skills, df_abilities)
+    output_path = os.path.join(cache_dir, COMPETENCIES_PARQUET_NAME) if cache_dir else None
+    if output_path and all(keys):
+        manifest = _load_manifest(cache_dir)
+        if manifest['outputs'].get(COMPETENCIES_PARQUET_NAME) == keys and os.path.exists(output_path):
+            print(f"Using cached cleaned data {output_path}")
+            return pd.read_parquet(output_path)
 
-    # 3. Combine skills and abilities
-    df_elements = pd.concat([df_skills_filtered, df_abilities_filtered], ignore_index=True)
-    df_elements = df_elements.drop_duplicates()
+    print("Cleaning and transforming data...")
 
-    # 4. Merge with occupation metadata
-    required_cols = ['onet_soc_code', 'title', 'description']
-    missing_cols = [col for col in required_cols if col not in df_occupation.columns]
-    if missing_cols:
-        raise KeyError(f"Missing columns in occupation data for merge: {missing_cols}")
+    # 1. Clean and standardize occupation data
+    df_occupation_for_merge = clean_occupation_df(df_occupation)
 
-    df_occupation_for_merge = df_occupation[required_cols]
-    df_combined = pd.merge(df_elements, df_occupation_for_merge, on='onet_soc_code', how='left')
+    # 2. Clean and standardize skills and abilities, merged with occupation metadata
+    df_skills_combined = transform_element_chunk(df_skills.copy(), "Skills", df_occupation_for_merge)
+    df_abilities_combined = transform_element_chunk(df_abilities.copy(), "Abilities", df_occupation_for_merge)
+
+    # 3. Combine skills and abilities
+    df_combined = pd.concat([df_skills_combined, df_abilities_combined], ignore_index=True)
 
     print("Data cleaned and transformed successfully.")
     return df_combined
+
+def source_keys(*frames):
+    """
+    Cache keys of the sources a cleaned frame is built from (None where uncached).
+    """
+    return [df.attrs.get('cache_key') for df in frames]
+
+def new_ingest_generation():
+    """
+    Identifier stamped on one ingest run's data in the database and the Parquet copy.
+    """
+    return datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+
+def competencies_arrow_schema(generation=None):
+    """
+    Explicit Arrow schema for the cleaned job_competencies frame, so chunks with
+    all-null columns still produce one consistent Parquet file. The ingest
+    generation, if given, is stored in the schema metadata.
+    """
+    import pyarrow as pa
+    types = {
+        'data_value': pa.float64(), 'n': pa.int64(), 'standard_error': pa.float64(),
+        'lower_ci_bound': pa.float64(), 'upper_ci_bound': pa.float64(), 'date': pa.date32()
+    }
+    schema = pa.schema([(column, types.get(column, pa.string())) for column in JOB_COMPETENCY_COLUMNS])
+    return schema.with_metadata({'ingest_generation': generation}) if generation else schema
+
+def write_competencies_parquet(df, path, generation=None):
+    """
+    Writes a prepared (see prepare_for_copy) cleaned frame as Parquet.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    table = pa.Table.from_pandas(df, schema=competencies_arrow_schema(generation), preserve_index=False)
+    pq.write_table(table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+    print(f"Cached cleaned data as {path}")
+
+def _record_competencies_output(cache_dir, keys):
+    manifest = _load_manifest(cache_dir)
+    if keys and all(keys):
+        manifest['outputs'][COMPETENCIES_PARQUET_NAME] = keys
+    else:
+        manifest['outputs'].pop(COMPETENCIES_PARQUET_NAME, None)
+    _save_manifest(cache_dir, manifest)
+
+def publish_competencies_parquet(df, cache_dir, generation, keys=None):
+    """
+    Writes the cleaned frame the database now serves as Parquet, stamped with
+    its ingest generation. Call only after the staging swap has committed.
+    """
+    write_competencies_parquet(prepare_for_copy(df), os.path.join(cache_dir, COMPETENCIES_PARQUET_NAME), generation)
+    _record_competencies_output(cache_dir, keys)
+
+def discard_competencies_parquet(cache_dir):
+    """
+    Deletes the Parquet copy of job_competencies once it no longer matches the
+    live data (after a rollback, or a load that did not write the cache).
+    """
+    path = os.path.join(cache_dir, COMPETENCIES_PARQUET_NAME)
+    if os.path.exists(path):
+        os.remove(path)
+        print(f"Removed {path}, which no longer matches the live data")
+    if os.path.isdir(cache_dir):
+        _record_competencies_output(cache_dir, None)
 # --- 3. Data Loading to PostgreSQL --- #
-def load_data_to_db(df, db_url):
+def _move_relations(cursor, source_schema, target_schema):
+    """
+    Moves the managed tables and views (with their indexes) between schemas.
+    """
+    cursor.execute(
+        "SELECT c.relname, c.relkind FROM pg_class c "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = %s AND c.relkind IN ('r', 'v') AND c.relname = ANY(%s);",
+        (source_schema, MANAGED_RELATIONS)
+    )
+    for relname, relkind in cursor.fetchall():
+        kind = 'VIEW' if relkind == 'v' else 'TABLE'
+        cursor.execute(f"ALTER {kind} {source_schema}.{relname} SET SCHEMA {target_schema};")
+
+def validate_staging(cursor, expected_rows, min_coverage=MIN_COVERAGE):
+    """
+    Checks the staged data before it goes live: the row count must match what
+    was loaded, and it must cover at least min_coverage of the occupations
+    currently being served.
+    """
+    cursor.execute(
+        f"SELECT COUNT(*), COUNT(DISTINCT onet_soc_code) FROM {STAGING_SCHEMA}.job_competencies;"
+    )
+    staged_rows, staged_occupations = cursor.fetchone()
+    if staged_rows == 0 or staged_rows != expected_rows:
+        raise ValueError(f"Staging has {staged_rows} rows, expected {expected_rows}")
+
+    cursor.execute(f"SELECT to_regclass('{LIVE_SCHEMA}.job_competencies');")
+    if cursor.fetchone()[0] is not None:
+        cursor.execute(f"SELECT COUNT(DISTINCT onet_soc_code) FROM {LIVE_SCHEMA}.job_competencies;")
+        live_occupations = cursor.fetchone()[0]
+        if staged_occupations < min_coverage * live_occupations:
+            raise ValueError(
+                f"Staging covers {staged_occupations} occupations, fewer than {min_coverage:.0%} "
+                f"of the {live_occupations} currently live"
+            )
+    print(f"Validated staging: {staged_rows} rows covering {staged_occupations} occupations.")
+
+def swap_in_staging(cursor):
+    """
+    Atomically replaces the live tables with the staged ones. The replaced
+    generation is kept in the previous-generation schema for rollback.
+    Readers block only for the duration of the catalog update.
+    """
+    cursor.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}';")
+    cursor.execute(f"DROP SCHEMA IF EXISTS {PREVIOUS_SCHEMA} CASCADE;")
+    cursor.execute(f"CREATE SCHEMA {PREVIOUS_SCHEMA};")
+    _move_relations(cursor, LIVE_SCHEMA, PREVIOUS_SCHEMA)
+    _move_relations(cursor, STAGING_SCHEMA, LIVE_SCHEMA)
+    cursor.execute(f"DROP SCHEMA {STAGING_SCHEMA};")
+
+def rollback_to_previous(db_url, cache_dir=CACHE_DIR):
+    """
+    Swaps the previous generation back in; the generation it replaces becomes
+    the new previous one, so a rollback can itself be undone. The Parquet copy
+    in cache_dir held the replaced data and is deleted.
+    """
+    engine = create_engine(db_url)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT to_regclass('{PREVIOUS_SCHEMA}.job_competencies');")
+        if cursor.fetchone()[0] is None:
+            raise ValueError("No previous generation of job_competencies to roll back to")
+
+        cursor.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}';")
+        cursor.execute(f"DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE;")
+        cursor.execute(f"CREATE SCHEMA {STAGING_SCHEMA};")
+        _move_relations(cursor, LIVE_SCHEMA, STAGING_SCHEMA)
+        _move_relations(cursor, PREVIOUS_SCHEMA, LIVE_SCHEMA)
+        cursor.execute(f"DROP SCHEMA {PREVIOUS_SCHEMA};")
+        cursor.execute(f"ALTER SCHEMA {STAGING_SCHEMA} RENAME TO {PREVIOUS_SCHEMA};")
+        connection.commit()
+        print("Rolled back job_competencies to the previous generation.")
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    if cache_dir:
+        discard_competencies_parquet(cache_dir)
+
+def new_lookups(df_occupation_for_merge=None):
+    """
+    Empty ID mappings for the normalised schema, seeded with the occupation table.
+    """
+    lookups = {
+        'occupations': {}, 'occupation_details': {},
+        'element_types': {},
+        'elements': {}, 'element_details': {},
+        'scales': {}, 'scale_names': {},
+        'domain_sources': {}
+    }
+    if df_occupation_for_merge is not None:
+        for code, title, description in df_occupation_for_merge.itertuples(index=False):
+            lookups['occupations'].setdefault(code, len(lookups['occupations']) + 1)
+            lookups['occupation_details'].setdefault(code, (title, description))
+    return lookups
+
+def _assign_ids(keys, mapping):
+    """
+    Maps categorical values to small integer IDs, allocating IDs for unseen values.
+    """
+    for key in pd.unique(keys.dropna()):
+        if key not in mapping:
+            mapping[key] = len(mapping) + 1
+    return keys.map(mapping).astype('Int64')
+
+def normalize_chunk(df, lookups):
+    """
+    Converts a prepared job_competencies chunk into competency_values rows,
+    updating the lookup mappings with any new occupations, elements or scales.
+    """
+    for row in df.drop_duplicates('onet_soc_code').itertuples(index=False):
+        lookups['occupation_details'].setdefault(row.onet_soc_code, (row.title, row.description))
+    for row in df.drop_duplicates('element_id').itertuples(index=False):
+        lookups['element_details'].setdefault(row.element_id, (row.element_name, row.element_type))
+    for row in df.drop_duplicates('scale_id').itertuples(index=False):
+        lookups['scale_names'].setdefault(row.scale_id, row.scale_name)
+
+    values = pd.DataFrame({
+        'occupation_id': _assign_ids(df['onet_soc_code'], lookups['occupations']),
+        'element_type_id': _assign_ids(df['element_type'], lookups['element_types']),
+        'scale_key': _assign_ids(df['scale_id'], lookups['scales']),
+        'element_key': _assign_ids(df['element_id'], lookups['elements']),
+        'domain_source_id': _assign_ids(df['domain_source'], lookups['domain_sources'])
+    })
+    for column in ['data_value', 'n', 'standard_error', 'lower_ci_bound', 'upper_ci_bound',
+                   'recommend_suppress', 'not_relevant', 'date']:
+        values[column] = df[column].values
+    return values[COMPETENCY_VALUE_COLUMNS]
+
+def copy_lookups(cursor, lookups):
+    """
+    Bulk-loads the lookup tables collected while normalising.
+    """
+    occupations = pd.DataFrame(
+        [(i, code) + tuple(lookups['occupation_details'].get(code, (None, None)))
+         for code, i in lookups['occupations'].items()],
+        columns=['occupation_id', 'onet_soc_code', 'title', 'description']
+    )
+    element_types = pd.DataFrame(
+        [(i, element_type) for element_type, i in lookups['element_types'].items()],
+        columns=['element_type_id', 'element_type']
+    )
+    elements = pd.DataFrame(
+        [(i, element_id, lookups['element_details'][element_id][0],
+          lookups['element_types'][lookups['element_details'][element_id][1]])
+         for element_id, i in lookups['elements'].items()],
+        columns=['element_key', 'element_id', 'element_name', 'element_type_id']
+    )
+    scales = pd.DataFrame(
+        [(i, scale_id, lookups['scale_names'][scale_id]) for scale_id, i in lookups['scales'].items()],
+        columns=['scale_key', 'scale_id', 'scale_name']
+    )
+    domain_sources = pd.DataFrame(
+        [(i, source) for source, i in lookups['domain_sources'].items()],
+        columns=['domain_source_id', 'domain_source']
+    )
+    for table, df in [('occupations', occupations), ('element_types', element_types),
+                      ('competency_elements', elements), ('competency_scales', scales),
+                      ('domain_sources', domain_sources)]:
+        copy_chunk(cursor, df, table, list(df.columns))
+
+def bulk_load(db_url, chunks, schema='wide', df_occupation_for_merge=None, min_coverage=MIN_COVERAGE,
+              generation=None):
+    """
+    Loads prepared chunks (see prepare_for_copy) into a staging schema using
+    COPY, builds indexes and runs ANALYZE there, validates the result and then
+    swaps it in atomically, so the API keeps serving the old data throughout.
+    schema='normalized' stores occupations and categorical lookups in their
+    own tables and exposes them through a job_competencies view. The staged
+    data is stamped with generation (a new one if not given) in ingest_metadata.
+    Returns the number of competency rows loaded.
+    """
+    engine = create_engine(db_url)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE;")
+        cursor.execute(f"CREATE SCHEMA {STAGING_SCHEMA};")
+        cursor.execute(f"SET LOCAL search_path TO {STAGING_SCHEMA};")
+        if schema == 'normalized':
+            cursor.execute(CREATE_NORMALIZED_SQL)
+            lookups = new_lookups(df_occupation_for_merge)
+        else:
+            cursor.execute(CREATE_JOB_COMPETENCIES_SQL)
+
+        total_rows = 0
+        for df_chunk in chunks:
+            if schema == 'normalized':
+                copy_chunk(cursor, normalize_chunk(df_chunk, lookups), 'competency_values', COMPETENCY_VALUE_COLUMNS)
+            else:
+                copy_chunk(cursor, df_chunk)
+            total_rows += len(df_chunk)
+
+        if schema == 'normalized':
+            copy_lookups(cursor, lookups)
+            cursor.execute(CREATE_JOB_COMPETENCIES_VIEW_SQL)
+
+        cursor.execute(CREATE_INGEST_METADATA_SQL)
+        cursor.execute(
+            f"INSERT INTO {INGEST_METADATA_TABLE} (generation, row_count) VALUES (%s, %s);",
+            (generation or new_ingest_generation(), total_rows)
+        )
+
+        print("Building indexes and analyzing tables...")
+        for statement in POST_LOAD_SQL[schema]:
+            cursor.execute(statement)
+        connection.commit() # Staged data is durable; live tables are untouched so far
+
+        validate_staging(cursor, total_rows, min_coverage)
+        swap_in_staging(cursor)
+        connection.commit()
+        return total_rows
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+def load_data_to_db(df, db_url, schema='wide', min_coverage=MIN_COVERAGE, generation=None):
     """
-    Loads the combined DataFrame into the PostgreSQL 'job_competencies' table.
+    Loads the combined DataFrame into the PostgreSQL 'job_competencies' table
+    (or the normalised tables behind the 'job_competencies' view).
     """
     print("Loading data to PostgreSQL database...")
     try:
-        engine = create_engine(db_url)
-        with engine.connect() as connection:
-            # NEW: Drop the table if it exists to ensure schema updates
-            connection.execute(text("DROP TABLE IF EXISTS job_competencies;"))
-            connection.commit() # Commit the drop operation
-
-            # Create table with the latest schema (including element_type)
-            connection.execute(text("""
-CREATE TABLE job_competencies (
-    id SERIAL PRIMARY KEY,
-    onet_soc_code VARCHAR(255) NOT NULL,
-    title VARCHAR(255),
-    description TEXT,
-    element_id VARCHAR(255),
-    element_name VARCHAR(255),
-    element_type VARCHAR(50), 
-    scale_id VARCHAR(255),
-    scale_name VARCHAR(255),
-    data_value NUMERIC,
-    n INTEGER,
-    standard_error NUMERIC,
-    lower_ci_bound NUMERIC,
-    upper_ci_bound NUMERIC,
-    recommend_suppress VARCHAR(10),
-    not_relevant VARCHAR(10),
-    date DATE,
-    domain_source VARCHAR(255)
-);
-"""))
-            connection.commit() # Commit the create operation
-            
-            # Load data into the table
-            df.to_sql('job_competencies', engine, if_exists='append', index=False)
-            print("Data loaded to job_competencies table successfully.")
+        total_rows = bulk_load(db_url, [prepare_for_copy(df)], schema, min_coverage=min_coverage,
+                               generation=generation)
+        print(f"Loaded {total_rows} rows to job_competencies ({schema} schema) successfully.")
     except Exception as e:
         print(f"An error occurred during database loading: {e}")
         exit()
 
+# --- 4. Streaming Ingestion --- #
+def iter_source_chunks(path, chunk_size=CHUNK_SIZE):
+    """
+    Yields a source file as DataFrame chunks without loading it all into memory.
+    Supports .xlsx (openpyxl read-only iteration), .csv and .parquet sources.
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.csv':
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+    elif extension == '.parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+    elif extension in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(column) for column in next(rows)]
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    yield pd.DataFrame(chunk, columns=header)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=header)
+        finally:
+            workbook.close()
+
+    else:
+        raise ValueError(f"Unsupported source file type: {path}")
+
+def prepare_for_copy(df):
+    """
+    Aligns a transformed chunk with the job_competencies columns and types for COPY.
+    """
+    df = df.reindex(columns=JOB_COMPETENCY_COLUMNS)
+    # COPY rejects '12.0' for an INTEGER column, so use a nullable integer type
+    df['n'] = pd.to_numeric(df['n'], errors='coerce').round().astype('Int64')
+    df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.date
+    return df
+
+def copy_chunk(cursor, df, table='job_competencies', columns=JOB_COMPETENCY_COLUMNS):
+    """
+    Bulk-loads one chunk into PostgreSQL with COPY FROM STDIN.
+    """
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, na_rep='\\N', quoting=csv.QUOTE_MINIMAL)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buffer
+    )
+
+def stream_data_to_db(occupation_path, element_paths, db_url, chunk_size=CHUNK_SIZE, cache_dir=None,
+                      schema='wide', min_coverage=MIN_COVERAGE, generation=None):
+    """
+    Streams skills and abilities into job_competencies chunk by chunk.
+    Only the small occupation table is held in memory; each chunk is cleaned,
+    merged against it and loaded with COPY, so peak memory is bounded by the
+    chunk size and the full dataset loads with no row cap. With a cache_dir the
+    cleaned chunks are also appended to a Parquet copy of the table, which
+    replaces the published one only once the staging swap has committed.
+    """
+    print("Streaming data to PostgreSQL database...")
+    generation = generation or new_ingest_generation()
+    df_occupation_for_merge = clean_occupation_df(pd.concat(iter_source_chunks(occupation_path, chunk_size)))
+
+    parquet_writer = None
+    if cache_dir:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        os.makedirs(cache_dir, exist_ok=True)
+        parquet_path = os.path.join(cache_dir, COMPETENCIES_PARQUET_NAME)
+        arrow_schema = competencies_arrow_schema(generation)
+        parquet_writer = pq.ParquetWriter(parquet_path + '.tmp', arrow_schema)
+
+    def chunks():
+        total_rows = 0
+        for type_name, path in element_paths.items():
+            print(f"Streaming {type_name} from {path}...")
+            for i, chunk in enumerate(iter_source_chunks(path, chunk_size)):
+                df_chunk = prepare_for_copy(
+                    transform_element_chunk(chunk, type_name, df_occupation_for_merge, verbose=(i == 0))
+                )
+                if parquet_writer:
+                    parquet_writer.write_table(pa.Table.from_pandas(df_chunk, schema=arrow_schema, preserve_index=False))
+                total_rows += len(df_chunk)
+                print(f"  {type_name}: loaded {total_rows} rows so far")
+                yield df_chunk
+
+    try:
+        total_rows = bulk_load(db_url, chunks(), schema, df_occupation_for_merge, min_coverage, generation)
+        print(f"Streamed {total_rows} rows to job_competencies ({schema} schema) successfully.")
+        if parquet_writer:
+            parquet_writer.close()
+            parquet_writer = None
+            os.replace(parquet_path + '.tmp', parquet_path)
+            _record_competencies_output(cache_dir, None)
+            print(f"Cached cleaned data as {parquet_path}")
+    except Exception as e:
+        print(f"An error occurred during streaming ingestion: {e}")
+        exit()
+    finally:
+        if parquet_writer:
+            parquet_writer.close()
+
 # --- Main Execution --- #
 if __name__ == "__main__":
-    # Extract data from all three sources
-    df_occ, df_sk, df_ab = extract_data(OCCUPATION_DATA_PATH, SKILLS_DATA_PATH, ABILITIES_DATA_PATH, ROW_LIMIT)
-    
-    # Transform and combine the data
-    df_combined = transform_data(df_occ, df_sk, df_ab)
-    
-    # Load the combined data to the database
-    load_data_to_db(df_combined, DATABASE_URL)
-    print("Data ingestion process completed.")
+    parser = argparse.ArgumentParser(description="Load O*NET occupations, skills and abilities into PostgreSQL.")
+    parser.add_argument('--stream', action='store_true',
+                        help="stream sources in chunks and bulk-load with COPY (no row limit)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help="rows per chunk in streaming mode")
+    parser.add_argument('--occupations', default=OCCUPATION_DATA_PATH, help="occupation data (.xlsx/.csv/.parquet)")
+    parser.add_argument('--skills', default=SKILLS_DATA_PATH, help="skills data (.xlsx/.csv/.parquet)")
+    parser.add_argument('--abilities', default=ABILITIES_DATA_PATH, help="abilities data (.xlsx/.csv/.parquet)")
+    parser.add_argument('--schema', choices=['wide', 'normalized'], default='wide',
+                        help="'normalized' loads occupations and lookups into separate compact tables "
+                             "behind a job_competencies view")
+    parser.add_argument('--min-coverage', type=float, default=MIN_COVERAGE,
+                        help="minimum fraction of currently live occupations the new data must cover")
+    parser.add_argument('--rollback', action='store_true',
+                        help="swap the previous generation of job_competencies back in and exit")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="do not read or write the Parquet cache in INGEST_CACHE_DIR "
+                             "(its cleaned job_competencies copy is deleted after the load)")
+    args = parser.parse_args()
+    cache_dir = None if args.no_cache else CACHE_DIR
+
+    if args.rollback:
+        try:
+            rollback_to_previous(DATABASE_URL)
+        except Exception as e:
+            print(f"An error occurred during rollback: {e}")
+            exit()
+    elif args.stream:
+        stream_data_to_db(
+            args.occupations,
+            {'Skills': args.skills, 'Abilities': args.abilities},
+            DATABASE_URL,
+            args.chunk_size,
+            cache_dir,
+            args.schema,
+            args.min_coverage
+        )
+        if not cache_dir:
+            discard_competencies_parquet(CACHE_DIR)
+        print("Data ingestion process completed.")
+    else:
+        generation = new_ingest_generation()
+
+        # Extract data from all three sources
+        df_occ, df_sk, df_ab = extract_data(args.occupations, args.skills, args.abilities, ROW_LIMIT, cache_dir)
+        
+        # Transform and combine the data
+        df_combined = transform_data(df_occ, df_sk, df_ab, cache_dir)
+        
+        # Load the combined data to the database
+        load_data_to_db(df_combined, DATABASE_URL, args.schema, args.min_coverage, generation)
+
+        # The swap has committed: publish the cleaned copy the backend reads, stamped to match
+        if cache_dir:
+            publish_competencies_parquet(df_combined, cache_dir, generation, source_keys(df_occ, df_sk, df_ab))
+        else:
+            discard_competencies_parquet(CACHE_DIR)
+        print("Data ingestion process completed.")
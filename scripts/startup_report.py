@@ -0,0 +1,70 @@
+"""
+Cold-start report for the backend: where ``import app`` spends its time
+(from ``python -X importtime``, summed per top-level package) and how long
+each start-up phase takes (imports, vector_db, index, profile_store, model).
+
+Run it before and after a change to catch cold-start regressions:
+
+    python scripts/startup_report.py [--top 15] [--skip-model] [--json]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from collections import defaultdict
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+
+def import_times(module: str = 'app'):
+    """Cumulative import time in ms per top-level package imported by ``module``"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    totals = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested imports are indented further; count top-level ones only so nothing is double counted
+        if name.startswith('  '):
+            continue
+        totals[name.strip().split('.')[0]] += int(cumulative_us) / 1000
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def startup_phases(skip_model: bool):
+    """Import the app in this process, initialise it and return its StartupTimer report"""
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+    import app
+
+    app.initialize_components(start_model=False)
+    if not skip_model:
+        app.load_model()
+    return app.startup_timer.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top', type=int, default=15, help="number of packages to list")
+    parser.add_argument('--skip-model', action='store_true', help="do not load the embedding model")
+    parser.add_argument('--json', action='store_true', help="print a machine-readable report")
+    args = parser.parse_args()
+
+    imports = import_times()
+    phases = startup_phases(args.skip_model)
+
+    if args.json:
+        print(json.dumps({'imports_ms': imports, **phases}, indent=2))
+    else:
+        print(f"import app: {sum(imports.values()):.1f} ms (by top-level package)")
+        for name, ms in list(imports.items())[:args.top]:
+            print(f"  {name:<30} {ms:9.1f} ms")
+        print("\nStart-up phases:")
+        for name, ms in phases['phases_ms'].items():
+            print(f"  {name:<30} {ms:9.1f} ms")
+        print(f"  {'total since import':<30} {phases['since_start_ms']:9.1f} ms")